@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+QUESTION_COLUMN = "question"
+DATATYPES = ["input_data", "output_data"]
+EXPLANATION_FIELDS = ["rulebased", "generative", "dataset", "prompt"]
+
+
+# Reads the questions of an uploaded CSV or JSONL file, the CSV column or JSON key "question" is used if it exists
+def parse_questions(filename, content):
+    text = content.decode("utf-8-sig") if isinstance(content, bytes) else content
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        questions = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            questions.append(item[QUESTION_COLUMN] if isinstance(item, dict) else str(item))
+    else:
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        if rows and QUESTION_COLUMN in [column.strip().lower() for column in rows[0]]:
+            index = [column.strip().lower() for column in rows[0]].index(QUESTION_COLUMN)
+            questions = [row[index] for row in rows[1:] if len(row) > index]
+        else:
+            questions = [row[0] for row in rows]
+    return [question.strip() for question in questions if question.strip()]
+
+
+# Flattens the explanations of one question and model to one row per component
+def explanation_rows(question, gptModel, model, shots, explanations):
+    rows = []
+    for component, componentExplanations in explanations["components"].items():
+        row = {
+            "question": question,
+            "gpt_model": gptModel,
+            "model": model,
+            "shots": shots,
+            "graph": explanations["meta_information"]["graphUri"],
+            "question_uri": explanations["meta_information"]["questionUri"],
+            "component": component,
+            "error": "",
+        }
+        for datatype in DATATYPES:
+            for field in EXPLANATION_FIELDS:
+                row[f"{datatype}_{field}"] = componentExplanations[datatype][field]
+        rows.append(row)
+    return rows
+
+
+def error_row(question, gptModel, model, shots, error):
+    return {"question": question, "gpt_model": gptModel, "model": model, "shots": shots, "error": str(error)}
+
+
+SKIPPED = object()
+
+
+# Runs run(question) for every question with at most max_workers questions at a time
+# on_result(question, result, error) is called as soon as a question is finished, stop() is checked before a question starts
+# and the questions that are skipped once it is true aren't passed to on_result
+def run_batch(questions, run, max_workers=2, on_result=None, stop=None):
+    def run_question(question):
+        if stop is not None and stop():
+            return SKIPPED
+        return run(question)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(run_question, question): question for question in questions}
+        for future in as_completed(futures):
+            question = futures[future]
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+            if on_result is not None and result is not SKIPPED:
+                on_result(question, result, error)
+
+
+# pandas is only imported when results are exported
+def rows_to_csv(rows):
+    import pandas as pd
+    return pd.DataFrame(rows).to_csv(index=False)
+
+
+def rows_to_parquet(rows):
+    import pandas as pd
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_parquet(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,49 @@
+"""Compares two benchmark result files and fails if a percentile regressed beyond the threshold.
+
+Usage: python benchmarks/compare.py <baseline.json> <candidate.json> [--threshold 0.2]
+"""
+import argparse
+import json
+import sys
+
+COMPARED = ("p50", "p95", "p99")
+
+
+def compare(baseline, candidate, threshold):
+    regressions = []
+    lines = []
+    for name, stats in candidate["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+        for percentile in COMPARED:
+            if percentile not in stats or not previous.get(percentile):
+                continue
+            change = stats[percentile] / previous[percentile] - 1
+            lines.append(f"{name:32} {percentile}: {previous[percentile]:10.4f} -> {stats[percentile]:10.4f} ({change:+.1%})")
+            if change > threshold:
+                regressions.append(f"{name} {percentile}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default: 0.2)")
+    args = parser.parse_args(argv)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{baseline['commit']} -> {candidate['commit']}")
+    print("\n".join(lines))
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Fixtures of the benchmark suites: stub backends, an in-memory MongoDB and app sessions."""
+import os
+
+import pymongo
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from harness import APP, REPO_ROOT
+from stub_backends import InMemoryMongoClient, StubBackends, StubConfig
+
+
+def _latency(name, default):
+    return float(os.environ.get(name, default))
+
+
+@pytest.fixture(scope="session")
+def stub_config():
+    return StubConfig(
+        components_latency=_latency("STUB_COMPONENTS_LATENCY", 0.0),
+        pipeline_latency=_latency("STUB_PIPELINE_LATENCY", 0.05),
+        explanation_latency=_latency("STUB_EXPLANATION_LATENCY", 0.1),
+        explanation_latency_per_component=_latency("STUB_EXPLANATION_LATENCY_PER_COMPONENT", 0.05),
+        template_latency=_latency("STUB_TEMPLATE_LATENCY", 0.02),
+        triples_per_component=int(os.environ.get("STUB_TRIPLES", 50)),
+    )
+
+
+@pytest.fixture(scope="session")
+def stubs(stub_config):
+    backends = StubBackends(stub_config).start()
+    yield backends
+    backends.stop()
+
+
+@pytest.fixture
+def app_factory(stubs, monkeypatch, tmp_path):
+    for key, value in stubs.env().items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setenv("FEEDBACK_SPOOL_PATH", str(tmp_path / "feedback_spool.jsonl"))
+    monkeypatch.setattr(pymongo, "MongoClient", InMemoryMongoClient)
+    monkeypatch.chdir(REPO_ROOT)
+
+    def create():
+        return AppTest.from_file(str(REPO_ROOT / APP), default_timeout=60).run()
+
+    return create
@@ -0,0 +1,70 @@
+"""Shared helpers of the benchmark suites: percentiles, result files and app sessions against stub backends."""
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(os.environ.get("BENCHMARK_RESULTS_DIR", REPO_ROOT / "benchmarks" / "results"))
+APP = "explanation_frontend.py"
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+
+    def rank(q):
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+    return {
+        "n": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "max": ordered[-1],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(suite, results, parameters=None):
+    """Writes ``results`` to ``<RESULTS_DIR>/<suite>-<commit>.json`` and returns the path."""
+    commit = git_commit()
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{suite}-{commit}.json"
+    path.write_text(json.dumps({
+        "suite": suite,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "parameters": parameters or {},
+        "results": results,
+    }, indent=2), encoding="utf-8")
+    return path
+
+
+def run_until(at, condition, timeout=60, interval=0.01):
+    """Reruns the app until ``condition()`` holds, like the polling fragment does in the browser."""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("the app did not reach the expected state in time")
+        time.sleep(interval)
+        at.run()
+    return at
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
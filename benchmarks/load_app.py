@@ -0,0 +1,10 @@
+"""The app as the load test runs it with ``streamlit run``: feedback is written to the in-memory MongoDB of the stubs."""
+import runpy
+
+import pymongo
+
+from harness import APP, REPO_ROOT
+from stub_backends import InMemoryMongoClient
+
+pymongo.MongoClient = InMemoryMongoClient
+runpy.run_path(str(REPO_ROOT / APP), run_name="__main__")
@@ -0,0 +1,146 @@
+"""A minimal Streamlit websocket client to measure reruns the way a browser triggers them.
+
+``AppTest`` always reruns the whole script, so fragment reruns and the websocket payload of a
+rerun can only be measured against a real ``streamlit run`` server.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+from harness import APP, REPO_ROOT
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+class StreamlitServer:
+    """Runs the app with ``streamlit run`` in a subprocess."""
+
+    def __init__(self, env=None, app=APP):
+        self.port = _free_port()
+        self.env = {**os.environ, **(env or {})}
+        self.app = app
+        self.process = None
+
+    def start(self, timeout=30):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.app, "--server.headless", "true",
+             "--server.port", str(self.port), "--browser.gatherUsageStats", "false"],
+            cwd=REPO_ROOT, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                socket.create_connection(("localhost", self.port), 0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise TimeoutError("streamlit did not start in time")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(10)
+
+    def session(self):
+        return StreamlitSession(f"ws://localhost:{self.port}/_stcore/stream")
+
+
+class RunResult:
+    def __init__(self, seconds, payload_bytes, messages, deltas):
+        self.seconds = seconds
+        self.payload_bytes = payload_bytes
+        self.messages = messages
+        self.deltas = deltas
+
+
+class StreamlitSession:
+    """One browser tab: keeps the widget states and the fragment of every widget it has seen."""
+
+    def __init__(self, url):
+        self.exit_stack = ExitStack()
+        self.websocket = self.exit_stack.enter_context(connect(url, max_size=None))
+        self.widget_states = {}
+        self.widgets = {}
+        self.rendered = []
+
+    def close(self):
+        self.exit_stack.close()
+
+    def widget(self, key=None, label=None):
+        """Returns ``(widget_id, fragment_id)`` of the widget with the given user key or label."""
+        for widget_id, (widget_label, fragment_id) in self.widgets.items():
+            if (key is not None and widget_id.endswith("-" + key)) or (label is not None and widget_label == label):
+                return widget_id, fragment_id
+        raise KeyError(key or label)
+
+    def has_widget(self, key):
+        """Whether the last full run rendered the widget with the given user key."""
+        return any(widget_id.endswith("-" + key) for widget_id in self.rendered)
+
+    def rendered_widgets(self, label):
+        """Ids of the widgets with the given label that the last full run rendered, in the rendered order."""
+        return [widget_id for widget_id in self.rendered if self.widgets[widget_id][0] == label]
+
+    def rerun(self, fragment_id="", timeout=60, **states):
+        """Sends a rerun like the browser does and waits until the script run, and a rerun it requested, is finished.
+
+        ``states`` maps widget ids to ``(field, value)`` of the WidgetState, e.g. ``("trigger_value", True)``.
+        """
+        message = BackMsg()
+        message.rerun_script.fragment_id = fragment_id
+        for widget_id, state in {**self.widget_states, **states}.items():
+            widget_state = message.rerun_script.widget_states.widgets.add()
+            widget_state.id = widget_id
+            setattr(widget_state, *state)
+        for widget_id, (field, value) in states.items():
+            if field != "trigger_value":
+                self.widget_states[widget_id] = (field, value)
+
+        start = time.perf_counter()
+        self.websocket.send(message.SerializeToString())
+        payload_bytes = messages = deltas = 0
+        full_run = not fragment_id
+        rendered = []
+        while True:
+            raw = self.websocket.recv(timeout=timeout)
+            forward_message = ForwardMsg()
+            forward_message.ParseFromString(raw)
+            payload_bytes += len(raw)
+            messages += 1
+            kind = forward_message.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                widget_id = self._track_widget(forward_message.delta)
+                if widget_id:
+                    rendered.append(widget_id)
+            elif kind == "script_finished" and forward_message.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                # st.rerun() in a fragment requests a full run
+                full_run = True
+                rendered = []
+            elif kind == "script_finished":
+                if full_run:
+                    self.rendered = rendered
+                return RunResult(time.perf_counter() - start, payload_bytes, messages, deltas)
+
+    def _track_widget(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return None
+        element_type = delta.new_element.WhichOneof("type")
+        element = getattr(delta.new_element, element_type, None) if element_type else None
+        widget_id = getattr(element, "id", "")
+        if widget_id.startswith("$$ID"):
+            self.widgets[widget_id] = (getattr(element, "label", ""), delta.fragment_id)
+            return widget_id
+        return None
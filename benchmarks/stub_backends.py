@@ -0,0 +1,248 @@
+"""Local stand-ins for the Qanary pipeline, the explanation service and MongoDB.
+
+The HTTP stub serves ``/components`` (with an ETag), ``/questionanswering`` and
+``/composedexplanations/inputdata|outputdata`` with configurable latency and
+payload size, so the frontend can be driven end-to-end without any live backend.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_COMPONENTS = [
+    "NED-DBpediaSpotlight",
+    "KG2KG-TranslateAnnotationsOfInstanceToDBpediaOrWikidata",
+    "QB-BirthDataWikidata",
+    "QE-SparqlQueryExecutedAutomaticallyOnWikidataOrDBpedia",
+]
+
+
+@dataclass
+class StubConfig:
+    """Latencies in seconds and payload size of the stub backends."""
+
+    components_latency: float = 0.0
+    pipeline_latency: float = 0.0
+    explanation_latency: float = 0.0
+    explanation_latency_per_component: float = 0.0
+    template_latency: float = 0.0
+    triples_per_component: int = 20
+    components: list = field(default_factory=lambda: list(DEFAULT_COMPONENTS))
+
+
+def _dataset(component, side, triples):
+    return "\n".join(
+        f"<urn:{component}:{side}:{i}> <http://www.w3.org/ns/oa#hasTarget> \"annotation {i} of {component}\" ."
+        for i in range(triples)
+    )
+
+
+def _explanation_items(components, side, generative_request, triples):
+    model = generative_request.get("gptModel", "")
+    shots = generative_request.get("shots", 0)
+    return {
+        component: {
+            "templatebased": f"The component {component} created {triples} annotations ({side}).",
+            "generative": f"\n{model} ({shots}-shot) explains the {side} data of {component}." if generative_request else "",
+            "dataset": _dataset(component, side, triples),
+            "prompt": f"Explain the following {side} data of {component} with {shots} examples.",
+        }
+        for component in components
+    }
+
+
+class StubBackends:
+    """Runs the stub HTTP backends on a free local port until ``stop`` is called."""
+
+    def __init__(self, config=None):
+        self.config = config or StubConfig()
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                stub._record("GET", path)
+                if path == "/components":
+                    time.sleep(stub.config.components_latency)
+                    components = [{"name": name} for name in stub.config.components]
+                    etag = '"%s"' % hashlib.sha1(json.dumps(components).encode("utf-8")).hexdigest()
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                    else:
+                        self._json(components, headers={"ETag": etag})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                stub._record("POST", url.path)
+                if url.path == "/questionanswering":
+                    time.sleep(stub.config.pipeline_latency)
+                    query = parse_qs(url.query)
+                    self._json({
+                        "outGraph": f"urn:graph:{uuid.uuid4()}",
+                        "question": f"urn:question:{uuid.uuid4()}",
+                        "textquestion": query.get("textquestion", [""])[0],
+                        "components": query.get("componentlist[]", []),
+                    })
+                elif url.path in ("/composedexplanations/inputdata", "/composedexplanations/outputdata"):
+                    request = json.loads(body or b"{}")
+                    generative_request = request.get("generativeExplanationRequest", {})
+                    side = "input" if url.path.endswith("inputdata") else "output"
+                    components = (generative_request or request).get("qanaryComponents")
+                    if not components:
+                        self.send_error(400, "qanaryComponents is missing")
+                        return
+                    if generative_request:
+                        time.sleep(stub.config.explanation_latency + stub.config.explanation_latency_per_component * len(components))
+                    else:
+                        time.sleep(stub.config.template_latency)
+                    self._json({
+                        "graphUri": request.get("graphUri"),
+                        "explanationItems": _explanation_items(components, side, generative_request, stub.config.triples_per_component),
+                    })
+                else:
+                    self.send_error(404)
+
+            def _json(self, data, headers=None):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-backends", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, path):
+        with self.lock:
+            return sum(1 for _, recorded in self.requests if recorded == path)
+
+    def _record(self, method, path):
+        with self.lock:
+            self.requests.append((method, path))
+
+    def env(self):
+        """Environment variables that point the frontend at these stubs."""
+        return {
+            "QANARY_PIPELINE_URL": self.url,
+            "QANARY_EXPLANATION_SERVICE_URL": self.url,
+            "QANARY_PIPELINE_COMPONENTS": self.url + "/components",
+            "GITHUB_REPO": "https://github.com/WSE-research/qanary-explainability-frontend",
+            "FEEDBACK_URL": "mongodb://stub",
+            "MONGO_USER": "stub",
+            "MONGO_PASSWORD": "stub",
+            "MONGO_AUTHSOURCE": "admin",
+        }
+
+
+class InMemoryCollection:
+    """The subset of a pymongo collection that the frontend uses, with optional write latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = []
+        self.lock = threading.Lock()
+
+    def insert_one(self, document):
+        self.insert_many([document])
+
+    def insert_many(self, documents, ordered=True):
+        time.sleep(self.latency)
+        with self.lock:
+            self.documents.extend(dict(document) for document in documents)
+
+    def count_documents(self, filter):
+        with self.lock:
+            return sum(1 for document in self.documents if all(document.get(key) == value for key, value in filter.items()))
+
+    def estimated_document_count(self):
+        with self.lock:
+            return len(self.documents)
+
+    def create_index(self, keys, **kwargs):
+        return kwargs.get("name", "_".join(f"{key}_{direction}" for key, direction in keys))
+
+    def bulk_write(self, operations, ordered=True):
+        """Supports the ``$inc`` upserts of the feedback summary."""
+        time.sleep(self.latency)
+        with self.lock:
+            for operation in operations:
+                document = next((document for document in self.documents if _matches(document, operation._filter)), None)
+                if document is None:
+                    document = dict(operation._filter)
+                    self.documents.append(document)
+                for key, amount in operation._doc.get("$inc", {}).items():
+                    document[key] = document.get(key, 0) + amount
+
+    def find(self, filter=None, projection=None):
+        with self.lock:
+            return [dict(document) for document in self.documents if _matches(document, filter or {})]
+
+
+def _matches(document, filter):
+    for key, condition in filter.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if "$gte" in condition and not (value is not None and value >= condition["$gte"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class InMemoryMongoClient:
+    """Drop-in replacement for ``pymongo.MongoClient`` that keeps all collections in memory."""
+
+    databases = {}
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getitem__(self, database):
+        return _InMemoryDatabase(self.databases.setdefault(database, {}), self.latency)
+
+    def close(self):
+        pass
+
+
+class _InMemoryDatabase:
+    def __init__(self, collections, latency):
+        self.collections = collections
+        self.latency = latency
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, InMemoryCollection(self.latency))
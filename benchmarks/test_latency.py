@@ -0,0 +1,102 @@
+"""End-to-end latency benchmark of the explanation workflow against the stub backends.
+
+Run with ``pytest benchmarks -m benchmark``; results are written to
+``benchmarks/results/latency-<commit>.json`` and can be compared with
+``python benchmarks/compare.py <old.json> <new.json>``.
+"""
+import os
+import time
+
+import pytest
+
+from harness import percentiles, run_until, save_results, timed
+from stub_backends import InMemoryMongoClient
+
+pytestmark = pytest.mark.benchmark
+
+ITERATIONS = int(os.environ.get("BENCHMARK_ITERATIONS", 10))
+
+
+def _send(at):
+    next(button for button in at.button if button.label == "Send").click().run()
+    run_until(at, lambda: at.session_state["explanations_generated"])
+
+
+def _generated(at):
+    return list(at.session_state["currentQaProcessExplanations"].get("generated", []))
+
+
+def test_explanation_workflow_latency(app_factory, stubs, stub_config):
+    at = app_factory()
+    assert not at.exception
+
+    samples = {"submit_to_render": [], "cached_submit_to_render": [], "rerun": [], "feedback_click": []}
+    for i in range(ITERATIONS):
+        at.text_input(key="text_question").set_value(f"When was Albert Einstein born? ({i})").run()
+        samples["submit_to_render"].append(timed(lambda: _send(at)))
+        samples["cached_submit_to_render"].append(timed(lambda: _send(at)))
+        samples["rerun"].append(timed(at.run))
+        samples["feedback_click"].append(timed(lambda: at.button(key="inputtemplatecorrect").click().run()))
+        assert not at.exception
+
+    assert stubs.count("/questionanswering") >= ITERATIONS
+    results = {name: percentiles(values) for name, values in samples.items()}
+    save_results("latency", results, parameters={
+        "iterations": ITERATIONS,
+        "pipeline_latency": stub_config.pipeline_latency,
+        "explanation_latency": stub_config.explanation_latency,
+        "triples_per_component": stub_config.triples_per_component,
+    })
+    assert results["cached_submit_to_render"]["p50"] < results["submit_to_render"]["p50"]
+
+
+def test_explanations_are_shown_before_every_component_is_fetched(app_factory, stubs, stub_config):
+    at = app_factory()
+    samples = {"submit_to_template_explanations": [], "submit_to_first_component": [], "submit_to_all_components": []}
+    for i in range(ITERATIONS):
+        at.text_input(key="text_question").set_value(f"When was Albert Einstein born? (components {i})").run()
+        start = time.perf_counter()
+        next(button for button in at.button if button.label == "Send").click().run()
+        run_until(at, lambda: at.session_state["explanations_generated"])
+        samples["submit_to_template_explanations"].append(time.perf_counter() - start)
+        run_until(at, lambda: _generated(at))
+        samples["submit_to_first_component"].append(time.perf_counter() - start)
+        run_until(at, lambda: at.session_state["active_job"] is None)
+        samples["submit_to_all_components"].append(time.perf_counter() - start)
+        assert len(at.session_state["currentQaProcessExplanations"]["components"]) == len(stub_config.components)
+        assert not at.exception
+
+    results = {name: percentiles(values) for name, values in samples.items()}
+    save_results("component_loading", results, parameters={
+        "iterations": ITERATIONS,
+        "components": len(stub_config.components),
+        "explanation_latency": stub_config.explanation_latency,
+        "explanation_latency_per_component": stub_config.explanation_latency_per_component,
+        "template_latency": stub_config.template_latency,
+    })
+    assert results["submit_to_template_explanations"]["p50"] < results["submit_to_first_component"]["p50"] < results["submit_to_all_components"]["p50"]
+
+
+def test_switching_to_a_pending_component_moves_it_to_the_front(app_factory, stubs, stub_config, monkeypatch):
+    monkeypatch.setattr(stubs.config, "explanation_latency_per_component", 0.5)
+    at = app_factory()
+    at.text_input(key="text_question").set_value("When was Albert Einstein born? (switch)").run()
+    next(button for button in at.button if button.label == "Send").click().run()
+    run_until(at, lambda: at.session_state["explanations_generated"])
+    last = stub_config.components[-1]
+    next(radio for radio in at.radio if radio.label == "Component").set_value(last).run()
+    run_until(at, lambda: last in _generated(at))
+    assert len(_generated(at)) < len(stub_config.components)
+    run_until(at, lambda: at.session_state["active_job"] is None)
+    assert not at.exception
+
+
+def test_feedback_reaches_the_mongo_substitute(app_factory):
+    at = app_factory()
+    _send(at)
+    run_until(at, lambda: _generated(at))
+    collection = InMemoryMongoClient()["explanations"]["explanation"]
+    before = collection.count_documents({})
+    at.button(key="outputgenerativewrong").click().run()
+    run_until(at, lambda: collection.count_documents({}) > before, timeout=10)
+    assert collection.count_documents({"datatype": "output", "explanation_type": "generative", "feedback": 0}) >= 1
@@ -0,0 +1,167 @@
+"""Load benchmark: N concurrent browser sessions against one ``streamlit run`` replica and the stub backends.
+
+Every session runs the flow of a user: it loads the app, picks the configuration, takes an example
+question, sends it, polls the job's progress until every component is shown, switches the component
+and sends feedback. For every number of sessions in ``LOAD_SESSIONS`` the throughput, the latency
+percentiles of every step and the thread count and RSS of the server are written to
+``benchmarks/results/load-<commit>.json``.
+
+    LOAD_SESSIONS=1,4,16,32 LOAD_ITERATIONS=3 python -m pytest benchmarks -m benchmark -k load_levels
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from harness import percentiles, save_results
+from streamlit_client import StreamlitServer
+
+pytestmark = pytest.mark.benchmark
+
+SESSIONS = [int(n) for n in os.environ.get("LOAD_SESSIONS", "1,2,4").split(",")]
+ITERATIONS = int(os.environ.get("LOAD_ITERATIONS", 2))
+POLL_INTERVAL = float(os.environ.get("LOAD_POLL_INTERVAL", 0.5))
+# distinct questions run the Qanary pipeline and the explanation service for every flow, otherwise most flows are cache hits
+UNIQUE_QUESTIONS = os.environ.get("LOAD_UNIQUE_QUESTIONS", "1") == "1"
+STEPS = ["load", "configure", "example_question", "send", "first_explanation", "all_explanations", "component_switch", "feedback"]
+
+
+class ProcessSampler:
+    """Samples the RSS and the thread count of a process from ``/proc`` until it is stopped."""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="process-sampler", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            sample = process_status(self.pid)
+            if sample:
+                self.samples.append(sample)
+            if self.stopped.wait(self.interval):
+                return
+
+    def peak(self, field):
+        return max((sample[field] for sample in self.samples), default=None)
+
+
+def process_status(pid):
+    """``{"rss_bytes", "threads"}`` of a process, ``None`` where ``/proc`` isn't available."""
+    try:
+        lines = Path(f"/proc/{pid}/status").read_text().splitlines()
+    except OSError:
+        return None
+    fields = dict(line.split(":", 1) for line in lines if ":" in line)
+    return {"rss_bytes": int(fields["VmRSS"].split()[0]) * 1024, "threads": int(fields["Threads"])}
+
+
+def _user_flow(server, run, index, iterations):
+    """One session; returns the seconds of every step and the number of failed flows."""
+    steps = {step: [] for step in STEPS}
+    session = server.session()
+    try:
+        steps["load"].append(session.rerun().seconds)
+        configuration, _ = session.widget(label="Select a configuration:")
+        steps["configure"].append(session.rerun(**{configuration: ("int_value", 0)}).seconds)
+        for iteration in range(iterations):
+            examples = session.rendered_widgets(":heavy_plus_sign:")
+            steps["example_question"].append(session.rerun(**{examples[(index + iteration) % len(examples)]: ("trigger_value", True)}).seconds)
+            if UNIQUE_QUESTIONS:
+                text_question, _ = session.widget(key="text_question")
+                session.rerun(**{text_question: ("string_value", f"When was Albert Einstein born? ({run}, session {index}, question {iteration})")})
+            send = session.rendered_widgets("Send")[0]
+            start = time.perf_counter()
+            steps["send"].append(session.rerun(**{send: ("trigger_value", True)}).seconds)
+            _wait_for_explanations(session, start, steps)
+
+            radio, radio_fragment = session.widget(label="Component")
+            steps["component_switch"].append(session.rerun(fragment_id=radio_fragment, **{radio: ("int_value", iteration % 2 + 1)}).seconds)
+            button, button_fragment = session.widget(key="inputtemplatecorrect")
+            steps["feedback"].append(session.rerun(fragment_id=button_fragment, **{button: ("trigger_value", True)}).seconds)
+            # the next question starts on the first component again
+            session.rerun(**{radio: ("int_value", 0)})
+        return steps, 0
+    except (AssertionError, KeyError, IndexError, TimeoutError):
+        return steps, 1
+    finally:
+        session.close()
+
+
+def _wait_for_explanations(session, start, steps, timeout=120):
+    """Polls the job's progress fragment like the browser does until every component is shown."""
+    first = None
+    while True:
+        shown = session.has_widget("inputtemplatecorrect")
+        if shown and first is None:
+            first = time.perf_counter() - start
+            steps["first_explanation"].append(first)
+        if shown and not session.has_widget("cancel_job"):
+            steps["all_explanations"].append(time.perf_counter() - start)
+            return
+        assert time.perf_counter() - start < timeout, "the explanations were not shown in time"
+        time.sleep(POLL_INTERVAL)
+        if session.has_widget("cancel_job"):
+            _, progress_fragment = session.widget(key="cancel_job")
+            session.rerun(fragment_id=progress_fragment)
+        else:
+            session.rerun()
+
+
+def _load_level(server, sessions, iterations):
+    baseline = process_status(server.process.pid)
+    with ProcessSampler(server.process.pid) as sampler, ThreadPoolExecutor(sessions) as executor:
+        start = time.perf_counter()
+        outcomes = list(executor.map(lambda index: _user_flow(server, f"level {sessions}", index, iterations), range(sessions)))
+        elapsed = time.perf_counter() - start
+    failed = sum(errors for _, errors in outcomes)
+    flows = sum(len(steps["feedback"]) for steps, _ in outcomes)
+    interactions = sum(len(seconds) for steps, _ in outcomes for name, seconds in steps.items() if name not in ("first_explanation", "all_explanations"))
+    peak_rss = sampler.peak("rss_bytes")
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "failed_sessions": failed,
+        "flows_per_second": flows / elapsed,
+        "interactions_per_second": interactions / elapsed,
+        "latency_seconds": {step: percentiles([value for steps, _ in outcomes for value in steps[step]]) for step in STEPS},
+        "server_threads_peak": sampler.peak("threads"),
+        "server_rss_bytes_baseline": baseline and baseline["rss_bytes"],
+        "server_rss_bytes_peak": peak_rss,
+        "server_rss_bytes_per_session": baseline and peak_rss and (peak_rss - baseline["rss_bytes"]) / sessions,
+    }
+
+
+def test_load_levels(stubs, stub_config, tmp_path):
+    server = StreamlitServer(env={**stubs.env(), "FEEDBACK_SPOOL_PATH": str(tmp_path / "feedback_spool.jsonl")}, app="benchmarks/load_app.py").start()
+    try:
+        # imports and shared resources are created once per process, they don't count towards the sessions
+        _, failed = _user_flow(server, "warm-up", 0, 1)
+        assert not failed
+        levels = [_load_level(server, sessions, ITERATIONS) for sessions in SESSIONS]
+    finally:
+        server.stop()
+
+    save_results("load", {f"sessions_{level['sessions']}": level for level in levels}, parameters={
+        "sessions": SESSIONS,
+        "iterations": ITERATIONS,
+        "poll_interval": POLL_INTERVAL,
+        "unique_questions": UNIQUE_QUESTIONS,
+        "triples_per_component": stub_config.triples_per_component,
+        "explanation_latency": stub_config.explanation_latency,
+    })
+    for level in levels:
+        assert level["failed_sessions"] == 0, f"{level['failed_sessions']} of {level['sessions']} sessions failed"
@@ -0,0 +1,80 @@
+"""Rerun scope benchmark: a feedback click and a component switch as full reruns and as fragment reruns.
+
+Runs the app with ``streamlit run`` and measures the time until the run is finished and the
+websocket payload the server sends for it. Results are written to
+``benchmarks/results/rerun_scope-<commit>.json``.
+"""
+import os
+import time
+
+import pytest
+
+from harness import percentiles, save_results
+from streamlit_client import StreamlitServer
+
+pytestmark = pytest.mark.benchmark
+
+ITERATIONS = int(os.environ.get("BENCHMARK_ITERATIONS", 10))
+
+
+@pytest.fixture
+def session(stubs, tmp_path):
+    server = StreamlitServer(env={**stubs.env(), "FEEDBACK_SPOOL_PATH": str(tmp_path / "feedback_spool.jsonl")}).start()
+    session = server.session()
+    yield session
+    session.close()
+    server.stop()
+
+
+def _generate_explanations(session, question=None):
+    session.rerun()
+    if question is not None:
+        text_question, _ = session.widget(key="text_question")
+        session.rerun(**{text_question: ("string_value", question)})
+    send, _ = session.widget(label="Send")
+    session.rerun(**{send: ("trigger_value", True)})
+    deadline = time.perf_counter() + 60
+    # waits until every component is fetched, the job's progress isn't shown anymore then
+    while not session.has_widget("inputtemplatecorrect") or session.has_widget("cancel_job"):
+        assert time.perf_counter() < deadline, "the explanations were not shown in time"
+        time.sleep(0.05)
+        session.rerun()
+
+
+def test_fragment_reruns_send_less_than_full_reruns(session, stub_config):
+    _generate_explanations(session)
+    button, button_fragment = session.widget(key="inputtemplatecorrect")
+    radio, radio_fragment = session.widget(label="Component")
+    assert button_fragment and radio_fragment
+
+    samples = {name: {"seconds": [], "payload_bytes": [], "deltas": []} for name in
+               ["feedback_click_full", "feedback_click_fragment", "component_switch_full", "component_switch_fragment"]}
+
+    def record(name, result):
+        samples[name]["seconds"].append(result.seconds)
+        samples[name]["payload_bytes"].append(result.payload_bytes)
+        samples[name]["deltas"].append(result.deltas)
+
+    for i in range(ITERATIONS):
+        record("feedback_click_full", session.rerun(**{button: ("trigger_value", True)}))
+        record("feedback_click_fragment", session.rerun(fragment_id=button_fragment, **{button: ("trigger_value", True)}))
+        record("component_switch_full", session.rerun(**{radio: ("int_value", (2 * i + 1) % 2)}))
+        record("component_switch_fragment", session.rerun(fragment_id=radio_fragment, **{radio: ("int_value", (2 * i) % 2)}))
+
+    results = {name: {metric: percentiles(values) for metric, values in metrics.items()} for name, metrics in samples.items()}
+    save_results("rerun_scope", results, parameters={
+        "iterations": ITERATIONS,
+        "triples_per_component": stub_config.triples_per_component,
+    })
+    for interaction in ["feedback_click", "component_switch"]:
+        assert results[f"{interaction}_fragment"]["payload_bytes"]["p50"] < results[f"{interaction}_full"]["payload_bytes"]["p50"]
+
+
+def test_page_payload_does_not_grow_with_the_dataset(session, stubs, monkeypatch):
+    payload = {}
+    for triples in (500, 5000):
+        monkeypatch.setattr(stubs.config, "triples_per_component", triples)
+        _generate_explanations(session, question=f"When was Albert Einstein born? ({triples} triples)")
+        payload[triples] = session.rerun().payload_bytes
+    save_results("dataset_payload", {f"full_rerun_bytes_{triples}_triples": value for triples, value in payload.items()})
+    assert payload[5000] < 1.2 * payload[500]
@@ -0,0 +1,58 @@
+"""Startup benchmark: cold start of a fresh process and the cost of a rerun of a warm session.
+
+Run with ``pytest benchmarks -m benchmark``; results are written to
+``benchmarks/results/startup-<commit>.json``.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from harness import REPO_ROOT, percentiles, save_results, timed
+
+pytestmark = pytest.mark.benchmark
+
+ITERATIONS = int(os.environ.get("BENCHMARK_ITERATIONS", 10))
+
+# Runs in a fresh interpreter so that no module is imported yet
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import explanation_backend  # noqa: F401
+imported = time.perf_counter() - start
+sys.path.insert(0, "benchmarks")
+import pymongo
+from stub_backends import InMemoryMongoClient
+pymongo.MongoClient = InMemoryMongoClient
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("explanation_frontend.py", default_timeout=60)
+start = time.perf_counter()
+at.run()
+first_run = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+second_run = time.perf_counter() - start
+print(json.dumps({"import_backend": imported, "first_run": first_run, "second_run": second_run, "exception": bool(at.exception)}))
+"""
+
+
+def test_cold_start_and_rerun_cost(app_factory, stubs):
+    env = {**os.environ, **stubs.env()}
+    cold = {"import_backend": [], "first_run": [], "second_run": []}
+    for _ in range(max(1, ITERATIONS // 2)):
+        output = subprocess.run([sys.executable, "-c", COLD_START], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+        sample = json.loads(output.stdout.strip().splitlines()[-1])
+        assert not sample.pop("exception")
+        for name, value in sample.items():
+            cold[name].append(value)
+
+    at = app_factory()
+    reruns = [timed(at.run) for _ in range(ITERATIONS)]
+    assert not at.exception
+
+    results = {name: percentiles(values) for name, values in cold.items()}
+    results["warm_rerun"] = percentiles(reruns)
+    save_results("startup", results, parameters={"iterations": ITERATIONS})
+    assert results["warm_rerun"]["p50"] < results["first_run"]["p50"]
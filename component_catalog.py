@@ -0,0 +1,100 @@
+import json
+import logging
+import threading
+import time
+
+
+# Process-wide catalog of the components of the Qanary pipeline (stale-while-revalidate): the last fetched list is served right away
+# and refreshed in the background every refresh_interval seconds, only the very first request waits for the pipeline
+# Refreshes are conditional (ETag/Last-Modified), so an unchanged list isn't transferred again, and a failed refresh keeps the last good list
+# fetch(headers) sends the request with the passed additional headers and returns the response
+class ComponentCatalog:
+    def __init__(self, fetch, refresh_interval=300, clock=time.monotonic, on_refresh=None):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.on_refresh = on_refresh
+        self.items = None
+        self.etag = None
+        self.last_modified = None
+        self.checked_at = None
+        self.changed_at = None
+        self.last_error = None
+        self.refresh_lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # The metadata of all components (at least "name"), raises the error of the first fetch if no list was fetched yet
+    def components(self):
+        if self.items is None:
+            with self.refresh_lock:
+                if self.items is None:
+                    self.refresh()
+        if self.items is None:
+            raise self.last_error
+        return self.items
+
+    def names(self):
+        return [component["name"] for component in self.components()]
+
+    # Fetches the list unless it is unchanged, returns whether the list changed
+    def refresh(self):
+        with self.refresh_lock:
+            headers = {}
+            if self.etag and self.items is not None:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified and self.items is not None:
+                headers["If-Modified-Since"] = self.last_modified
+            try:
+                response = self.fetch(headers)
+                if response.status_code == 304 and self.items is not None:
+                    self.checked_at = self.clock()
+                    self.last_error = None
+                    self._report("not_modified")
+                    return False
+                response.raise_for_status()
+                items = [item if isinstance(item, dict) else {"name": item} for item in json.loads(response.text)]
+            except Exception as e:
+                self.checked_at = self.clock()
+                self.last_error = e
+                logging.warning("Error while refreshing the components, the last fetched list is kept: " + str(e))
+                self._report("failed")
+                return False
+            changed = items != self.items
+            self.items = items
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            self.checked_at = self.clock()
+            self.last_error = None
+            if changed:
+                self.changed_at = self.checked_at
+            self._report("modified" if changed else "unchanged")
+            return changed
+
+    # Refreshes the list every refresh_interval seconds in a daemon thread until stop is called
+    def start(self):
+        if self.thread is None and self.refresh_interval > 0:
+            self.thread = threading.Thread(target=self._run, name="component-catalog", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def status(self):
+        now = self.clock()
+        return {
+            "components": len(self.items) if self.items is not None else None,
+            "checked_seconds_ago": now - self.checked_at if self.checked_at is not None else None,
+            "changed_seconds_ago": now - self.changed_at if self.changed_at is not None else None,
+            "etag": self.etag,
+            "last_error": str(self.last_error) if self.last_error is not None else None,
+        }
+
+    def _run(self):
+        while not self.stopped.wait(self.refresh_interval):
+            self.refresh()
+
+    def _report(self, result):
+        if self.on_refresh is not None:
+            self.on_refresh(result)
@@ -0,0 +1,54 @@
+import json
+import math
+import re
+import zlib
+
+# One N-Triples/Turtle statement per line: subject, predicate, object and the closing dot
+TRIPLE_PATTERN = re.compile(r'^\s*(<[^>]*>|_:\S+)\s+(<[^>]*>|a)\s+(.+?)\s*\.\s*$')
+FILE_EXTENSIONS = {"sparql": "rq", "turtle": "ttl"}
+
+
+def page_count(total_lines, page_lines):
+    return max(1, math.ceil(total_lines / page_lines))
+
+
+# Returns the lines of one page, the window ends early once it exceeds max_bytes but contains at least one line
+def dataset_window(lines, page, page_lines, max_bytes):
+    start = (page - 1) * page_lines
+    window = []
+    size = 0
+    for line in lines[start:start + page_lines]:
+        size += len(line.encode("utf-8")) + 1
+        if window and size > max_bytes:
+            break
+        window.append(line if len(line) <= max_bytes else line[:max_bytes] + " …")
+    return window, start, start + len(window)
+
+
+# Rows of the triple table, lines that aren't a single statement (prefixes, multi-line statements) are skipped
+def parse_triples(lines):
+    rows = []
+    for line in lines:
+        match = TRIPLE_PATTERN.match(line)
+        if match:
+            rows.append({"subject": match.group(1), "predicate": match.group(2), "object": match.group(3)})
+    return rows
+
+
+def dataset_file_name(component, datatype, lang):
+    return f"{component}-{datatype}.{FILE_EXTENSIONS.get(lang, 'txt')}"
+
+
+# Data of a deferred download button: the dataset is only loaded from the payload store on click
+# Streamlit reads any download into bytes (and seeks a stream first), so the text itself is returned
+def deferred_dataset(load, ref, explanationDatatype, field):
+    return lambda: load(ref)[explanationDatatype][field]
+
+
+# Gzip-compressed JSONL of records, compressed record by record, so only the compressed bundle is kept in memory
+# Streamlit reads every download into bytes before it is served, a download can't be streamed
+def gzip_jsonl(records):
+    compressor = zlib.compressobj(wbits=31)
+    chunks = [compressor.compress((json.dumps(record) + "\n").encode("utf-8")) for record in records]
+    chunks.append(compressor.flush())
+    return b"".join(chunks)
@@ -0,0 +1,836 @@
+# Configuration, shared resources and the explanation workflow of the explanation frontend
+# Imported once per process, so nothing here is rebuilt when Streamlit reruns explanation_frontend.py
+# Functions in this module don't render Streamlit elements, they can be used by jobs without a script context
+import atexit
+import json
+import logging
+import threading
+import time
+import pymongo
+import streamlit as st
+from urllib.parse import urlencode
+from decouple import config
+from util import run_concurrently
+from http_client import BackendClient
+from traffic_archive import RecordingClient, ReplayClient
+from explanation_cache import ExplanationCache, explanation_cache_key, pipeline_cache_key, run_cache_key
+from shared_cache import create_shared_cache
+from component_catalog import ComponentCatalog
+from graph_inspector import GraphInspector
+from feedback import FeedbackWriter
+from feedback_analytics import FeedbackAnalytics
+from metrics import MetricsRegistry, start_metrics_server, start_metrics_file_exporter, SIZE_BUCKETS
+from batch import explanation_rows, error_row, run_batch
+from jobs import JobManager, JobQueueFull, SingleFlight, PrefetchQueue, DONE, FAILED
+from payload_store import PayloadStore
+
+### Qanary components for pre-defined configurations
+NED_DBPEDIA = "NED-DBpediaSpotlight"
+KG2KG = "KG2KG-TranslateAnnotationsOfInstanceToDBpediaOrWikidata"
+QB_BIRTHDATA = "QB-BirthDataWikidata"
+QB_SINA = "SINA"
+QB_QANSWER = "QAnswerQueryBuilderAndQueryCandidateFetcher"
+QB_PLATYPUS = "PlatypusQueryBuilder"
+QE_SPARQLEXECUTER = "QE-SparqlQueryExecutedAutomaticallyOnWikidataOrDBpedia"
+QBE_QANSWER = "QAnswerQueryBuilderAndExecutor"
+FEEDBACK_BAD = 0
+FEEDBACK_GOOD = 1
+
+QANARY_PIPELINE_URL = config('QANARY_PIPELINE_URL')
+QANARY_EXPLANATION_SERVICE_URL = config('QANARY_EXPLANATION_SERVICE_URL')
+QANARY_PIPELINE_COMPONENTS = config('QANARY_PIPELINE_COMPONENTS')
+GITHUB_REPO = config('GITHUB_REPO')
+FEEDBACK_URL = config('FEEDBACK_URL')
+MONGO_USER = config('MONGO_USER')
+MONGO_PASSWORD = config('MONGO_PASSWORD')
+MONGO_AUTHSOURCE = config('MONGO_AUTHSOURCE')
+EXPLANATION_REQUEST_WORKERS = config('EXPLANATION_REQUEST_WORKERS', default=2, cast=int)
+COMPARE_MODELS_WORKERS = config('COMPARE_MODELS_WORKERS', default=3, cast=int)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=20, cast=int)
+HTTP_RETRIES = config('HTTP_RETRIES', default=3, cast=int)
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=5, cast=float)
+COMPONENTS_READ_TIMEOUT = config('COMPONENTS_READ_TIMEOUT', default=30, cast=float)
+PIPELINE_READ_TIMEOUT = config('PIPELINE_READ_TIMEOUT', default=300, cast=float)
+EXPLANATION_READ_TIMEOUT = config('EXPLANATION_READ_TIMEOUT', default=300, cast=float)
+CIRCUIT_BREAKER_THRESHOLD = config('CIRCUIT_BREAKER_THRESHOLD', default=5, cast=int)
+CIRCUIT_BREAKER_RESET = config('CIRCUIT_BREAKER_RESET', default=30, cast=float)
+COMPONENTS_REFRESH_INTERVAL = config('COMPONENTS_REFRESH_INTERVAL', default=300, cast=float)
+PIPELINE_CACHE_MAX_ENTRIES = config('PIPELINE_CACHE_MAX_ENTRIES', default=512, cast=int)
+PIPELINE_CACHE_TTL = config('PIPELINE_CACHE_TTL', default=86400, cast=int)
+EXPLANATION_CACHE_MAX_ENTRIES = config('EXPLANATION_CACHE_MAX_ENTRIES', default=256, cast=int)
+EXPLANATION_CACHE_TTL = config('EXPLANATION_CACHE_TTL', default=86400, cast=int)
+EXPLANATION_CACHE_MAX_BYTES = config('EXPLANATION_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+EXPLANATION_CACHE_PATH = config('EXPLANATION_CACHE_PATH', default="")
+SHARED_CACHE_URL = config('SHARED_CACHE_URL', default="")
+SHARED_LOCK_TTL = config('SHARED_LOCK_TTL', default=600, cast=float)
+SHARED_LOCK_WAIT = config('SHARED_LOCK_WAIT', default=600, cast=float)
+JOB_WORKERS = config('JOB_WORKERS', default=4, cast=int)
+PIPELINE_MAX_CONCURRENT = config('PIPELINE_MAX_CONCURRENT', default=JOB_WORKERS, cast=int)
+EXPLANATION_MAX_CONCURRENT = config('EXPLANATION_MAX_CONCURRENT', default=JOB_WORKERS * EXPLANATION_REQUEST_WORKERS, cast=int)
+JOB_QUEUE_SIZE = config('JOB_QUEUE_SIZE', default=32, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+FEEDBACK_BATCH_SIZE = config('FEEDBACK_BATCH_SIZE', default=50, cast=int)
+FEEDBACK_FLUSH_INTERVAL = config('FEEDBACK_FLUSH_INTERVAL', default=1.0, cast=float)
+FEEDBACK_BUFFER_SIZE = config('FEEDBACK_BUFFER_SIZE', default=1000, cast=int)
+FEEDBACK_SPOOL_PATH = config('FEEDBACK_SPOOL_PATH', default="feedback_spool.jsonl")
+MONGO_TIMEOUT_MS = config('MONGO_TIMEOUT_MS', default=5000, cast=int)
+FEEDBACK_BACKFILL_GRACE = config('FEEDBACK_BACKFILL_GRACE', default=300, cast=float)
+METRICS_PORT = config('METRICS_PORT', default=0, cast=int)
+METRICS_FILE = config('METRICS_FILE', default="")
+METRICS_FILE_INTERVAL = config('METRICS_FILE_INTERVAL', default=15, cast=float)
+DEBUG_PANEL = config('DEBUG_PANEL', default=False, cast=bool)
+BATCH_WORKERS = config('BATCH_WORKERS', default=2, cast=int)
+COMPONENT_PREFETCH_WORKERS = config('COMPONENT_PREFETCH_WORKERS', default=1, cast=int)
+DATASET_PAGE_LINES = config('DATASET_PAGE_LINES', default=200, cast=int)
+DATASET_WINDOW_MAX_BYTES = config('DATASET_WINDOW_MAX_BYTES', default=64 * 1024, cast=int)
+PAYLOAD_COMPRESS_THRESHOLD = config('PAYLOAD_COMPRESS_THRESHOLD', default=16 * 1024, cast=int)
+PAYLOAD_DECODED_ENTRIES = config('PAYLOAD_DECODED_ENTRIES', default=8, cast=int)
+BACKEND_TRAFFIC_MODE = config('BACKEND_TRAFFIC_MODE', default="")
+BACKEND_TRAFFIC_ARCHIVE = config('BACKEND_TRAFFIC_ARCHIVE', default="backend_traffic.jsonl.gz")
+BACKEND_REPLAY_LATENCY_SCALE = config('BACKEND_REPLAY_LATENCY_SCALE', default=1.0, cast=float)
+WARMUP = config('WARMUP', default=False, cast=bool)
+WARMUP_WORKERS = config('WARMUP_WORKERS', default=2, cast=int)
+WARMUP_INTERVAL = config('WARMUP_INTERVAL', default=3600, cast=float)
+WARMUP_REFRESH_MARGIN = config('WARMUP_REFRESH_MARGIN', default=2 * WARMUP_INTERVAL, cast=float)
+SPARQL_READ_TIMEOUT = config('SPARQL_READ_TIMEOUT', default=20, cast=float)
+GRAPH_INSPECTOR_PAGE_SIZE = config('GRAPH_INSPECTOR_PAGE_SIZE', default=50, cast=int)
+GRAPH_INSPECTOR_SUMMARY_LIMIT = config('GRAPH_INSPECTOR_SUMMARY_LIMIT', default=1000, cast=int)
+GRAPH_CACHE_MAX_ENTRIES = config('GRAPH_CACHE_MAX_ENTRIES', default=512, cast=int)
+GRAPH_CACHE_TTL = config('GRAPH_CACHE_TTL', default=86400, cast=int)
+GRAPH_CACHE_MAX_BYTES = config('GRAPH_CACHE_MAX_BYTES', default=32 * 1024 * 1024, cast=int)
+
+### Pre-defined configurations
+explanation_configurations_dict = {
+    "Configuration 1": {
+        "components": [NED_DBPEDIA, KG2KG, QB_BIRTHDATA, QE_SPARQLEXECUTER],
+        "exampleQuestions": [
+            "What is the birth date of Albert Einstein?",
+            "When was Albert Einstein born?",
+            "What is the birth date of Jesus Christ?",
+        ]
+    },
+#    "Configuration 2": {
+#        "components": [NED_DBPEDIA, KG2KG, QB_BIRTHDATA, QE_SPARQLEXECUTER],
+#        "exampleQuestions": ""
+#    },
+#    "Configuration 3": {
+#        "components": [],
+#        "exampleQuestions": ""
+#    }
+}
+explanation_configurations = explanation_configurations_dict.keys()
+explanation_configurations_captions = [
+    "Komponenten: " + NED_DBPEDIA + ", " + KG2KG + ", " + QB_BIRTHDATA + ", " + QE_SPARQLEXECUTER#,
+#    "", 
+#    ""
+]
+
+### Constants
+GPT3_5_TURBO = "GPT-3.5 (from OpenAI)"
+GPT3_5_MODEL = "GPT_3_5"
+GPT3_5_CONCRETE = "Concrete models: gpt-3.5-turbo-instruct / gpt-3.5-turbo-16k"
+GPT4_CONCRETE = "Concrete model: gpt-4-0613"
+CONCRETE_MODEL = "concrete_model"
+GPT4 = "GPT-4 (from OpenAI)"
+GPT4_MODEL = "GPT_4"
+MODEL_KEY = "model"
+SHOTS_KEY = "shots"
+SHOT = "-shot"
+ZEROSHOT = "0"
+ONESHOT = "1"  # "One-shot"
+TWOSHOT = "2"
+THREESHOT = "3"
+BATCH_STAGE = "Batch evaluation"
+EXAMPLE_QUESTIONS_SOURCE = "Example questions of the configuration"
+UPLOAD_SOURCE = "Upload a CSV/JSONL file"
+PIPELINE_STAGE = "Qanary pipeline"
+INPUT_EXPLANATIONS_STAGE = "Input data explanations"
+OUTPUT_EXPLANATIONS_STAGE = "Output data explanations"
+TEMPLATE_STAGE = "Template-based explanations"
+WARMUP_STAGE = "Cache warm-up"
+WARMUP_OWNER = "warmup"
+ANALYTICS_DIMENSIONS = {"component": "Component", "explanation_type": "Explanation type", "datatype": "Data", "gpt_model": "GPT model", "shots": "Shots"}
+EXPLANATION_STAGES = [PIPELINE_STAGE, INPUT_EXPLANATIONS_STAGE, OUTPUT_EXPLANATIONS_STAGE]
+STAGE_ICONS = {"queued": ":hourglass:", "running": ":arrows_counterclockwise:", "done": ":white_check_mark:", "failed": ":x:", "cancelled": ":no_entry_sign:"}
+GPT_MODEL_HELP = "The examples for the prompts are generated randomly by executing several QA processes with Qanary. The selection of the Annotation-Type and Component for these examples are automated to reduce complexity."
+
+### MODEL MAPPINGS
+GPT_3_5_ZERO_SHOT = GPT3_5_TURBO + ", " + ZEROSHOT + SHOT
+GPT3_5_ONE_SHOT = GPT3_5_TURBO + ", " + ONESHOT + SHOT
+GPT3_5_TWO_SHOT = GPT3_5_TURBO + ", " + TWOSHOT + SHOT
+GPT3_5_THREE_SHOT = GPT3_5_TURBO + "," + THREESHOT + SHOT
+GPT4_ZERO_SHOT = GPT4 + ", " + ZEROSHOT + SHOT
+GPT4_ONE_SHOT = GPT4 + ", " + ONESHOT + SHOT + ":star:"
+
+### Selectable GPT models
+gptModels_dic = {
+    GPT_3_5_ZERO_SHOT: {
+        MODEL_KEY: GPT3_5_MODEL,
+        SHOTS_KEY: 0,
+        CONCRETE_MODEL: GPT3_5_CONCRETE
+    },    
+    GPT3_5_ONE_SHOT: {
+        MODEL_KEY: GPT3_5_MODEL,
+        SHOTS_KEY: 1,
+        CONCRETE_MODEL: GPT3_5_CONCRETE
+    },
+    GPT3_5_TWO_SHOT: {
+        MODEL_KEY: GPT3_5_MODEL,
+        SHOTS_KEY: 2,
+        CONCRETE_MODEL: GPT3_5_CONCRETE
+    },
+    GPT3_5_THREE_SHOT: {
+        MODEL_KEY: GPT3_5_MODEL,
+        SHOTS_KEY: 3,
+        CONCRETE_MODEL: GPT3_5_CONCRETE
+    },
+    GPT4_ZERO_SHOT: {
+        MODEL_KEY: GPT4_MODEL,
+        SHOTS_KEY: 0,
+        CONCRETE_MODEL: GPT4_CONCRETE
+    },
+    GPT4_ONE_SHOT: {
+        MODEL_KEY: GPT4_MODEL,
+        SHOTS_KEY: 1,
+        CONCRETE_MODEL: GPT4_CONCRETE
+    }
+
+}
+gptModels = gptModels_dic.keys()
+concrete_models = [value[CONCRETE_MODEL] for value in gptModels_dic.values()]
+
+###### SHARED RESOURCES
+
+# One pooled HTTP client per process, shared by all sessions and worker threads
+# BACKEND_TRAFFIC_MODE "record" appends all backend traffic to BACKEND_TRAFFIC_ARCHIVE, "replay" serves the recorded responses
+# without any backend, delayed by the recorded durations times BACKEND_REPLAY_LATENCY_SCALE
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    if BACKEND_TRAFFIC_MODE == "replay":
+        return ReplayClient(BACKEND_TRAFFIC_ARCHIVE, latency_scale=BACKEND_REPLAY_LATENCY_SCALE)
+    client = create_backend_client()
+    if BACKEND_TRAFFIC_MODE == "record":
+        client = RecordingClient(client, BACKEND_TRAFFIC_ARCHIVE)
+        atexit.register(client.close)
+    return client
+
+def create_backend_client():
+    return BackendClient(
+        pool_size=HTTP_POOL_SIZE,
+        retries=HTTP_RETRIES,
+        timeouts={
+            "components": (HTTP_CONNECT_TIMEOUT, COMPONENTS_READ_TIMEOUT),
+            "pipeline": (HTTP_CONNECT_TIMEOUT, PIPELINE_READ_TIMEOUT),
+            "explanations": (HTTP_CONNECT_TIMEOUT, EXPLANATION_READ_TIMEOUT),
+            "sparql": (HTTP_CONNECT_TIMEOUT, SPARQL_READ_TIMEOUT)
+        },
+        failure_threshold=CIRCUIT_BREAKER_THRESHOLD,
+        reset_timeout=CIRCUIT_BREAKER_RESET,
+        max_concurrent={"pipeline": PIPELINE_MAX_CONCURRENT, "explanations": EXPLANATION_MAX_CONCURRENT}
+    )
+
+# Cache and lock backend of all replicas: SHARED_CACHE_URL (sqlite:///file or redis://host:port/db), otherwise the SQLite file
+# EXPLANATION_CACHE_PATH that only persists the caches of this replica; None if the caches are only kept in memory
+@st.cache_resource(show_spinner=False)
+def get_shared_cache():
+    url = SHARED_CACHE_URL or (f"sqlite:///{EXPLANATION_CACHE_PATH}" if EXPLANATION_CACHE_PATH else "")
+    if not url:
+        return None
+    shared = create_shared_cache(url)
+    atexit.register(shared.close)
+    return shared
+
+# Bounded explanation cache per process, backed by the shared cache if there is one
+@st.cache_resource(show_spinner=False)
+def get_explanation_cache():
+    return ExplanationCache(
+        max_entries=EXPLANATION_CACHE_MAX_ENTRIES,
+        ttl=EXPLANATION_CACHE_TTL,
+        max_bytes=EXPLANATION_CACHE_MAX_BYTES,
+        shared=get_shared_cache()
+    )
+
+# Results of the Qanary pipeline, the results of failed executions aren't cached
+@st.cache_resource(show_spinner=False)
+def get_pipeline_cache():
+    return ExplanationCache(max_entries=PIPELINE_CACHE_MAX_ENTRIES, ttl=PIPELINE_CACHE_TTL, shared=get_shared_cache())
+
+# Graph inspector of the QA process graphs, its query results are cached per process as the graphs don't change after a run
+@st.cache_resource(show_spinner=False)
+def get_graph_inspector():
+    cache = ExplanationCache(max_entries=GRAPH_CACHE_MAX_ENTRIES, ttl=GRAPH_CACHE_TTL, max_bytes=GRAPH_CACHE_MAX_BYTES)
+    return GraphInspector(query_sparql, cache, page_size=GRAPH_INSPECTOR_PAGE_SIZE, summary_limit=GRAPH_INSPECTOR_SUMMARY_LIMIT)
+
+# Bounded worker pool per process for the explanation workflow, JOB_WORKERS limits the concurrent jobs
+# A job fans out into several requests, the requests to the backends are limited by PIPELINE_MAX_CONCURRENT and
+# EXPLANATION_MAX_CONCURRENT in the HTTP client
+@st.cache_resource
+def get_job_manager():
+    return JobManager(max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE)
+
+# Latency histograms and counters of this process, exposed on METRICS_PORT and/or written to METRICS_FILE
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    registry = MetricsRegistry()
+    if METRICS_PORT:
+        start_metrics_server(registry, METRICS_PORT)
+    if METRICS_FILE:
+        start_metrics_file_exporter(registry, METRICS_FILE, METRICS_FILE_INTERVAL)
+    return registry
+
+# Labels of the latency histograms for one explanation request
+def metric_labels(components, gptModel=None):
+    labels = {"components": ",".join(components)}
+    if gptModel is not None:
+        labels["model"] = gptModels_dic[gptModel][MODEL_KEY]
+        labels["shots"] = gptModels_dic[gptModel][SHOTS_KEY]
+    return labels
+
+# One MongoClient per process, it manages its own connection pool
+@st.cache_resource(show_spinner=False)
+def get_mongo_client():
+    return pymongo.MongoClient(FEEDBACK_URL,
+        username=MONGO_USER,
+        password=MONGO_PASSWORD,
+        authSource=MONGO_AUTHSOURCE,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS
+    )
+
+# Approval rates of the feedback from the summary collection feedback_summary, the indexes are created and feedback written
+# before the summary existed is added in the background (retried until it succeeds), feedback written by this process is added by get_feedback_writer
+@st.cache_resource(show_spinner=False)
+def get_feedback_analytics():
+    database = get_mongo_client()["explanations"]
+    analytics = FeedbackAnalytics(database["explanation"], database["feedback_summary"], grace_period=FEEDBACK_BACKFILL_GRACE)
+    threading.Thread(target=analytics.prepare_until_done, name="feedback-analytics", daemon=True).start()
+    return analytics
+
+# Background writer for the feedback, buffered feedback is flushed when the process exits
+@st.cache_resource(show_spinner=False)
+def get_feedback_writer():
+    explanationsCol = get_mongo_client()["explanations"]["explanation"]
+    analytics = get_feedback_analytics()
+    writer = FeedbackWriter(explanationsCol,
+        batch_size=FEEDBACK_BATCH_SIZE,
+        flush_interval=FEEDBACK_FLUSH_INTERVAL,
+        max_buffer=FEEDBACK_BUFFER_SIZE,
+        spool_path=FEEDBACK_SPOOL_PATH or None,
+        on_batch_written=lambda seconds, documents: get_metrics().observe("stage_seconds", seconds, stage="feedback_write"),
+        on_documents_written=analytics.record
+    )
+    atexit.register(writer.close)
+    return writer
+
+# Identical pipeline and explanation requests of all sessions of this process are coalesced, see compute_once
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    return SingleFlight()
+
+# Computes a missing cache entry once across all sessions and replicas: SingleFlight coalesces the sessions of this process and
+# the lock of the shared cache the replicas, a replica that waited for the lock takes over the entry cached by the other one
+# Without the lock after SHARED_LOCK_WAIT seconds (e.g. the other replica hangs) the entry is computed anyway
+# With refresh, an existing entry is only taken over if it was written while waiting for the lock
+# Returns the value and whether it was shared instead of computed by this caller
+def compute_once(cache, key, compute, refresh=False):
+    def locked():
+        shared = get_shared_cache()
+        if shared is None:
+            return compute(), False
+        requested_at = cache.clock()
+        with shared.lock(key, ttl=SHARED_LOCK_TTL, timeout=SHARED_LOCK_WAIT) as acquired:
+            if not acquired:
+                logging.warning("Waited %s seconds for another replica, computing the entry anyway", SHARED_LOCK_WAIT)
+            remaining = cache.ttl_remaining(key)
+            if remaining is not None and (not refresh or cache.ttl - remaining <= cache.clock() - requested_at):
+                cached = cache.get(key)
+                if cached is not None:
+                    get_metrics().increment("shared_cache_takeovers")
+                    return cached, True
+            return compute(), False
+    (value, taken_over), shared = get_single_flight().do(key, locked)
+    return value, shared or taken_over
+
+# Explanation payloads of all sessions, a session only keeps references, so sessions asking the same question share one copy
+@st.cache_resource(show_spinner=False)
+def get_payload_store():
+    return PayloadStore(compress_threshold=PAYLOAD_COMPRESS_THRESHOLD, max_decoded=PAYLOAD_DECODED_ENTRIES)
+
+# The components of the associated Qanary pipeline, served from memory and refreshed every COMPONENTS_REFRESH_INTERVAL seconds
+@st.cache_resource(show_spinner=False)
+def get_component_catalog():
+    def fetch(headers):
+        with get_metrics().timed("stage", stage="components"):
+            return get_http_client().get("components", QANARY_PIPELINE_COMPONENTS, headers={"Accept":"application/json", **headers})
+    return ComponentCatalog(fetch,
+        refresh_interval=COMPONENTS_REFRESH_INTERVAL,
+        on_refresh=lambda result: get_metrics().increment("component_refreshes", result=result)
+    ).start()
+
+# Returns the metadata (at least "name") of the available components of the associated Qanary pipeline
+def request_components_list():
+    try:
+        return get_component_catalog().components()
+    except Exception as e:
+        raise Exception("Error while fetching the components: " + str(e))
+
+# Executes the Qanary pipeline with the passed components, the result only depends on the question and the ordered components and is shared by all GPT models
+def execute_qanary_pipeline(question, components):
+    component_list = ""
+    for component in components:
+        component_list += "&componentlist[]=" + component
+    custom_pipeline_url = f"{QANARY_PIPELINE_URL}/questionanswering?textquestion=" + question + component_list
+    get_metrics().increment("cache_misses", cache="pipeline")
+    with get_metrics().timed("stage", stage="pipeline", **metric_labels(components)):
+        response = get_http_client().post("pipeline", custom_pipeline_url, {})
+    get_metrics().observe("payload_bytes", len(response.content), buckets=SIZE_BUCKETS, stage="pipeline")
+    if(200 <= response.status_code < 300):
+        return response.json()
+    else:
+        raise Exception("The Qanary pipeline threw an error: " + response.text)
+
+# Runs a read-only query on the SPARQL endpoint of the Qanary pipeline, the timeout is passed to the triplestore as well
+# (in ms, as understood by e.g. Stardog and Virtuoso), so it stops evaluating queries nobody waits for anymore
+def query_sparql(query):
+    url = f"{QANARY_PIPELINE_URL}/sparql?" + urlencode({"query": query, "timeout": int(SPARQL_READ_TIMEOUT * 1000)})
+    with get_metrics().timed("stage", stage="sparql"):
+        response = get_http_client().get("sparql", url, headers={"Accept": "application/sparql-results+json"})
+    if(200 <= response.status_code < 300):
+        return response.json()
+    else:
+        raise Exception("The SPARQL endpoint threw an error: " + response.text)
+
+# Fetches the explanations for the input data
+def input_data_explanation(json):
+    input_explanation_url = f"{QANARY_EXPLANATION_SERVICE_URL}/composedexplanations/inputdata"
+    response = get_http_client().post("explanations", input_explanation_url, json, headers={"Accept":"application/json","Content-Type":"application/json"})
+    if(200 <= response.status_code < 300):
+        return response.text
+    else:
+        raise Exception("Error while fetching the input data explanations: " + response.text)
+
+# Fetches the explanations for the output data
+def output_data_explanation(json):
+    output_explanation_url = f"{QANARY_EXPLANATION_SERVICE_URL}/composedexplanations/outputdata"
+    response = get_http_client().post("explanations", output_explanation_url, json, headers={"Accept":"application/json","Content-Type":"application/json"})
+    if(response.status_code != 200):
+        raise Exception("Error while fetching the output data explanations: " + response.text)
+    elif(200 <= response.status_code < 300):
+        return response.text
+
+# Helper function to convert the dict to a array of components # TODO: Needed!?
+def convert_component_dir_to_list(componentDir):
+    component_list = []
+    for component in componentDir:
+        component_list.append(component)
+    return component_list
+
+###### EXPLANATION WORKFLOW
+
+# Outsourced method to create a new dict
+def createExplanationDict(input, output):
+    return {
+                "input_data": {
+                "rulebased": input["templatebased"],
+                "generative": input["generative"].lstrip("\n"),
+                "dataset": input["dataset"],
+                "prompt": input["prompt"]
+            },
+            "output_data": {
+                "rulebased": output["templatebased"],
+                "generative": output["generative"].lstrip("\n"),
+                "dataset" : output["dataset"],
+                "prompt": output["prompt"]
+            }
+    }
+
+# Template-based explanations of a component whose generative explanations aren't finished yet, generative is None until then
+def createTemplateExplanationDict(input, output):
+    explanation = createExplanationDict({**input, "generative": ""}, {**output, "generative": ""})
+    explanation["input_data"]["generative"] = None
+    explanation["output_data"]["generative"] = None
+    return explanation
+
+# Session form of an explanation dict: the components are references into the payload store (keyed by graphUri/component),
+# "generated" lists the components whose generative explanations are finished and "failed" those of the passed failed
+# components whose generative explanations couldn't be fetched
+# Components that didn't change since previous (same session form) keep their reference and aren't serialized again
+def store_explanations(explanation, previous=None, failed=()):
+    graph = explanation["meta_information"]["graphUri"]
+    previous = previous or {}
+    previousRefs = previous.get("components", {})
+    previousGenerated = previous.get("generated", [])
+    components = {}
+    generated = []
+    for component, value in explanation["components"].items():
+        finished = value["input_data"]["generative"] is not None
+        if component in previousRefs and (component in previousGenerated) == finished and previous.get("meta_information") == explanation["meta_information"]:
+            components[component] = previousRefs[component]
+        else:
+            components[component] = get_payload_store().put(f"{graph}/{component}", value)
+        if finished:
+            generated.append(component)
+    return {"components": components, "meta_information": explanation["meta_information"], "generated": generated,
+            "failed": [component for component in components if component in failed and component not in generated]}
+
+# The explanations of one component, shared by all sessions and must not be modified
+def load_explanation(ref):
+    return get_payload_store().load(ref)
+
+# Records of the explanation bundle of a run in session form: the run and then every component with its datasets, prompts and explanations
+# Components are loaded one after another while the bundle is written
+def explanation_bundle(explanations, gptModel):
+    yield {"type": "run", **explanations["meta_information"], "gptModel": gptModel, "components": list(explanations["components"])}
+    for component, ref in explanations["components"].items():
+        yield {"type": "component", "component": component, **load_explanation(ref)}
+
+# Caches the explanation of a finished run and, for its permalink, a pointer from the run (graph, components, model, shots) to it
+def cache_run(question, components, model, shots, explanation):
+    cache = get_explanation_cache()
+    cache.put(explanation_cache_key(question, components, model, shots), explanation)
+    cache.put(run_cache_key(explanation["meta_information"]["graphUri"], components, model, shots), {"question": question})
+
+# The question and explanation of a run linked by a permalink, None if it isn't cached (anymore); no backend is called
+def load_run(graph, components, model, shots):
+    cache = get_explanation_cache()
+    pointer = cache.get(run_cache_key(graph, components, model, shots))
+    if pointer is None:
+        return None
+    explanation = cache.get(explanation_cache_key(pointer["question"], components, model, shots))
+    if explanation is None or explanation["meta_information"]["graphUri"] != graph:
+        return None
+    return pointer["question"], explanation
+
+# Fetches the template-based explanations of the passed components of a graph, they are requested without a generative explanation
+# request and are available long before the GPT model has finished; the components are passed as in a generative request
+def fetch_template_explanations(graph, components):
+    json_data = json.dumps({"graphUri": graph, "qanaryComponents": components})
+    with get_metrics().timed("stage", stage="template_explanations", **metric_labels(components)):
+        explanations, explanation_errors = run_concurrently({
+            "input": lambda: input_data_explanation(json_data),
+            "output": lambda: output_data_explanation(json_data)
+        }, max_workers=EXPLANATION_REQUEST_WORKERS)
+    if explanation_errors:
+        raise Exception("; ".join(f"{side} data explanations: {error}" for side, error in explanation_errors.items()))
+    input_items = json.loads(explanations["input"])["explanationItems"]
+    output_items = json.loads(explanations["output"])["explanationItems"]
+    return {component: createTemplateExplanationDict(input_items[component], output_items[component])
+            for component in components if component in input_items and component in output_items}
+
+# Fetches the input and output explanations of one graph for the passed GPT model, both requests are independent and sent at the same time
+# The finished sides are reported to the job if one is passed
+def fetch_explanations(graph, components, gptModel, job=None):
+    json_data = json.dumps({
+    "graphUri": graph,
+    "generativeExplanationRequest": {
+        "shots": gptModels_dic[gptModel][SHOTS_KEY], #Rename gpt models dict as it contains the shots value
+        "gptModel": gptModels_dic[gptModel][MODEL_KEY],
+        "qanaryComponents": components
+    }})
+
+    def fetch_side(fetch, stage):
+        side = "input_explanations" if stage == INPUT_EXPLANATIONS_STAGE else "output_explanations"
+        try:
+            with get_metrics().timed("stage", stage=side, **metric_labels(components, gptModel)):
+                response = fetch(json_data)
+            get_metrics().observe("payload_bytes", len(response), buckets=SIZE_BUCKETS, stage=side)
+        except Exception:
+            if job is not None:
+                job.finish_stage(stage, FAILED)
+            raise
+        if job is not None:
+            job.finish_stage(stage)
+        return response
+
+    explanations, explanation_errors = run_concurrently({
+        "input": lambda: fetch_side(input_data_explanation, INPUT_EXPLANATIONS_STAGE),
+        "output": lambda: fetch_side(output_data_explanation, OUTPUT_EXPLANATIONS_STAGE)
+    }, max_workers=EXPLANATION_REQUEST_WORKERS)
+    if explanation_errors:
+        for side, error in explanation_errors.items():
+            logging.error(f"Error while fetching the {side} data explanations: " + str(error))
+        raise Exception("; ".join(f"{side} data explanations: {error}" for side, error in explanation_errors.items()))
+    input_data_explanations = json.loads(explanations["input"])
+    output_data_explanations = json.loads(explanations["output"])
+
+    componentExplanations = {}
+    for component in components:
+        input = input_data_explanations["explanationItems"][component]
+        output = output_data_explanations["explanationItems"][component]
+        componentExplanations[component] = createExplanationDict(input, output)
+    return componentExplanations
+
+# Executes the (cached) Qanary pipeline as the first stage of a job, a failed execution isn't cached
+def run_pipeline(question, components, job=None):
+    if job is not None:
+        job.start_stage(PIPELINE_STAGE)
+    cache = get_pipeline_cache()
+    key = pipeline_cache_key(question, components)
+
+    def execute_and_cache():
+        qa_process_information = execute_qanary_pipeline(question, components)
+        cache.put(key, qa_process_information)
+        return qa_process_information
+    try:
+        get_metrics().increment("cache_lookups", cache="pipeline")
+        qa_process_information = cache.get(key)
+        if qa_process_information is None:
+            qa_process_information = compute_once(cache, key, execute_and_cache)[0]
+    except Exception:
+        if job is not None:
+            job.finish_stage(PIPELINE_STAGE, FAILED)
+        raise
+    if job is not None:
+        job.finish_stage(PIPELINE_STAGE)
+    return qa_process_information
+
+# Returns the explanations of a question for each passed GPT model and the errors of the models that failed
+# Cached results are reused and the Qanary pipeline is only executed if one of the models is missing
+# Runs without a script context (e.g. in a job), therefore, no Streamlit elements are used here
+# With refresh, cached results are ignored and replaced by the fetched ones
+def explanations_for_models(question, components, models, job=None, refresh=False):
+    with get_metrics().timed("stage", stage="workflow", **metric_labels(components)):
+        return fetch_explanations_for_models(question, components, models, job, refresh)
+
+def fetch_explanations_for_models(question, components, models, job=None, refresh=False):
+    metrics = get_metrics()
+    cache = get_explanation_cache()
+    keys = {gptModel: explanation_cache_key(question, components, gptModels_dic[gptModel][MODEL_KEY], gptModels_dic[gptModel][SHOTS_KEY]) for gptModel in models}
+    results = {}
+    for gptModel in models if not refresh else []:
+        cached = cache.get(keys[gptModel])
+        metrics.increment("cache_lookups", cache="explanations")
+        if cached is not None:
+            results[gptModel] = cached
+        else:
+            metrics.increment("cache_misses", cache="explanations")
+    missing = [gptModel for gptModel in models if gptModel not in results]
+    if not missing:
+        if job is not None:
+            for stage in EXPLANATION_STAGES:
+                job.finish_stage(stage)
+        return results, {}
+
+    qa_process_information = run_pipeline(question, components, job)
+    graph = qa_process_information["outGraph"]
+    if job is not None:
+        job.start_stage(INPUT_EXPLANATIONS_STAGE, parts=len(missing))
+        job.start_stage(OUTPUT_EXPLANATIONS_STAGE, parts=len(missing))
+
+    # the first session requesting a key fetches and caches the explanations, sessions requesting the same key meanwhile wait for that result
+    def fetch_model(gptModel):
+        def fetch_and_cache():
+            explanation = {
+                "components": fetch_explanations(graph, components, gptModel, job),
+                "meta_information": {
+                    "graphUri": graph,
+                    "questionUri": qa_process_information["question"]
+                }
+            }
+            cache_run(question, components, gptModels_dic[gptModel][MODEL_KEY], gptModels_dic[gptModel][SHOTS_KEY], explanation)
+            return explanation
+        explanation, shared = compute_once(cache, keys[gptModel], fetch_and_cache, refresh)
+        if shared and job is not None:
+            job.finish_stage(INPUT_EXPLANATIONS_STAGE)
+            job.finish_stage(OUTPUT_EXPLANATIONS_STAGE)
+        return explanation
+
+    explanations, explanation_errors = run_concurrently(
+        {gptModel: (lambda gptModel=gptModel: fetch_model(gptModel)) for gptModel in missing},
+        max_workers=COMPARE_MODELS_WORKERS
+    )
+    for gptModel, error in explanation_errors.items():
+        logging.error(f"Error while fetching the explanations for {gptModel}: " + str(error))
+        if job is not None:
+            job.finish_stage(INPUT_EXPLANATIONS_STAGE, FAILED)
+            job.finish_stage(OUTPUT_EXPLANATIONS_STAGE, FAILED)
+    results.update(explanations)
+    return {gptModel: results[gptModel] for gptModel in models if gptModel in results}, explanation_errors
+
+# Work function of a single-model job: the explanations are fetched component by component in the order of job.queue
+# Every finished component is published as the partial result "components" of the job, so a session can show the
+# selected component while the others are still prefetched, and move a component it waits for to the front of the queue
+# Meanwhile the template-based explanations of all components are fetched and published first, generative is None in them
+# Components whose generative explanations failed are published as the partial result "failed"
+# Returns the explanation of all fetched components, the template-based one for components that failed, and their errors
+def explanations_by_component(question, components, gptModel, job):
+    with get_metrics().timed("stage", stage="workflow", **metric_labels(components, gptModel)):
+        return fetch_explanations_by_component(question, components, gptModel, job)
+
+def fetch_explanations_by_component(question, components, gptModel, job):
+    metrics = get_metrics()
+    cache = get_explanation_cache()
+    model, shots = gptModels_dic[gptModel][MODEL_KEY], gptModels_dic[gptModel][SHOTS_KEY]
+    job.queue = PrefetchQueue(components)
+    key = explanation_cache_key(question, components, model, shots)
+    metrics.increment("cache_lookups", cache="explanations")
+    cached = cache.get(key)
+    if cached is not None:
+        job.set_partial("meta_information", cached["meta_information"])
+        job.set_partial("components", cached["components"])
+        for stage in list(job.stages):
+            job.finish_stage(stage)
+        return cached, {}
+    metrics.increment("cache_misses", cache="explanations")
+
+    start = time.perf_counter()
+    qa_process_information = run_pipeline(question, components, job)
+    graph = qa_process_information["outGraph"]
+    meta_information = {"graphUri": graph, "questionUri": qa_process_information["question"]}
+    job.set_partial("meta_information", meta_information)
+
+    def fetch_component(component):
+        component_key = explanation_cache_key(question, components, model, shots, component)
+        metrics.increment("cache_lookups", cache="component_explanations")
+        explanation = cache.get(component_key)
+        if explanation is not None:
+            return explanation
+        metrics.increment("cache_misses", cache="component_explanations")
+
+        def fetch_and_cache():
+            explanation = fetch_explanations(graph, [component], gptModel)[component]
+            cache.put(component_key, explanation)
+            return explanation
+        return compute_once(cache, component_key, fetch_and_cache)[0]
+
+    loaded, templates, errors = {}, {}, {}
+    lock = threading.Lock()
+
+    # finished components replace their template-based explanations
+    def publish():
+        job.set_partial("components", {component: loaded.get(component) or templates[component] for component in components if component in loaded or component in templates})
+
+    def fetch_templates():
+        job.start_stage(TEMPLATE_STAGE)
+        try:
+            fetched = fetch_template_explanations(graph, components)
+        except Exception as e:
+            logging.error("Error while fetching the template-based explanations: " + str(e))
+            job.finish_stage(TEMPLATE_STAGE, FAILED)
+            return
+        with lock:
+            templates.update(fetched)
+            publish()
+        job.finish_stage(TEMPLATE_STAGE)
+
+    def prefetch():
+        while (component := job.queue.pop()) is not None:
+            job.start_stage(component)
+            try:
+                explanation = fetch_component(component)
+            except Exception as e:
+                logging.error(f"Error while fetching the explanations of {component}: " + str(e))
+                with lock:
+                    errors[component] = e
+                    job.set_partial("failed", list(errors))
+                job.finish_stage(component, FAILED)
+                continue
+            with lock:
+                loaded[component] = explanation
+                publish()
+                if len(loaded) == 1:
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="first_component", **metric_labels(components, gptModel))
+            job.finish_stage(component)
+
+    tasks = {worker: prefetch for worker in range(max(1, COMPONENT_PREFETCH_WORKERS))}
+    tasks[TEMPLATE_STAGE] = fetch_templates
+    _, prefetch_errors = run_concurrently(tasks, max_workers=len(tasks))
+    job.check_cancelled()
+    if prefetch_errors:
+        raise next(iter(prefetch_errors.values()))
+    if not loaded and not templates:
+        raise Exception("; ".join(f"{component}: {error}" for component, error in errors.items()))
+    # like the published ones, failed components keep their template-based explanations
+    explanation = {"components": {component: loaded.get(component) or templates[component] for component in components if component in loaded or component in templates},
+                   "meta_information": meta_information}
+    if not errors:
+        cache_run(question, components, model, shots, explanation)
+    return explanation, errors
+
+# Work function of a batch job, the rows of every finished question are added to the job right away
+def run_batch_job(job, questions, components, models):
+    job.start_stage(BATCH_STAGE)
+    job.total = len(questions)
+
+    def on_result(question, result, error):
+        rows = []
+        explanations, explanation_errors = result if error is None else ({}, {})
+        for gptModel in models:
+            model, shots = gptModels_dic[gptModel][MODEL_KEY], gptModels_dic[gptModel][SHOTS_KEY]
+            if gptModel in explanations:
+                rows += explanation_rows(question, gptModel, model, shots, explanations[gptModel])
+            else:
+                rows.append(error_row(question, gptModel, model, shots, error or explanation_errors.get(gptModel, "")))
+        job.add_items(rows)
+
+    run_batch(questions, lambda question: explanations_for_models(question, components, models), BATCH_WORKERS, on_result, stop=lambda: job.cancelled)
+    job.check_cancelled()
+    job.finish_stage(BATCH_STAGE)
+    return job.items_snapshot()
+
+# Work function of the cache warm-up: fetches the explanations of every example question of the passed configurations for every
+# passed GPT model, explanations that are cached for more than refresh_margin seconds are skipped, all others are fetched again
+# One row per question is added to the job, failed questions and models are listed there and logged
+def run_warmup_job(job, configurations, models, refresh_margin):
+    job.start_stage(WARMUP_STAGE)
+    cache = get_explanation_cache()
+    questions = [(configuration, question) for configuration in configurations for question in explanation_configurations_dict[configuration]["exampleQuestions"]]
+    job.total = len(questions)
+
+    def warm(item):
+        configuration, question = item
+        components = convert_component_dir_to_list(explanation_configurations_dict[configuration]["components"])
+        due = []
+        for gptModel in models:
+            remaining = cache.ttl_remaining(explanation_cache_key(question, components, gptModels_dic[gptModel][MODEL_KEY], gptModels_dic[gptModel][SHOTS_KEY]))
+            if remaining is None or remaining <= refresh_margin:
+                due.append(gptModel)
+        if not due:
+            return due, {}
+        _, errors = explanations_for_models(question, components, due, refresh=True)
+        return due, errors
+
+    def on_result(item, result, error):
+        configuration, question = item
+        due, errors = result if error is None else (list(models), {gptModel: error for gptModel in models})
+        for gptModel, e in errors.items():
+            logging.error(f"Cache warm-up of '{question}' with {gptModel} failed: " + str(e))
+        get_metrics().increment("warmup_requests", len(due) - len(errors), result="fetched")
+        get_metrics().increment("warmup_requests", len(errors), result="failed")
+        job.add_items([{
+            "configuration": configuration,
+            "question": question,
+            "fetched": len(due) - len(errors),
+            "fresh": len(models) - len(due),
+            "failed": ", ".join(errors),
+            "error": "; ".join(str(e) for e in errors.values())
+        }])
+
+    run_batch(questions, warm, WARMUP_WORKERS, on_result, stop=lambda: job.cancelled)
+    job.check_cancelled()
+    items = job.items_snapshot()
+    failed = sum(1 for item in items if item["failed"])
+    logging.info(f"Cache warm-up finished: {sum(item['fetched'] for item in items)} explanations fetched, {failed} of {len(items)} questions failed")
+    job.finish_stage(WARMUP_STAGE, FAILED if failed else DONE)
+    return items
+
+# Runs the cache warm-up of all pre-defined configurations and GPT models once per process and then every WARMUP_INTERVAL seconds
+# (0: only once), the warm-up jobs share the job workers with the sessions and are listed with the owner WARMUP_OWNER
+@st.cache_resource(show_spinner=False)
+def get_warmup_scheduler():
+    def schedule():
+        while True:
+            try:
+                job = get_job_manager().submit(WARMUP_STAGE, [WARMUP_STAGE],
+                    lambda job: run_warmup_job(job, list(explanation_configurations), list(gptModels), WARMUP_REFRESH_MARGIN), owner=WARMUP_OWNER)
+                job.future.result()
+                if job.state == FAILED:
+                    logging.error("Cache warm-up failed: " + str(job.error))
+            except JobQueueFull:
+                logging.warning("Cache warm-up skipped: the job queue is full")
+            if WARMUP_INTERVAL <= 0:
+                return
+            time.sleep(WARMUP_INTERVAL)
+
+    thread = threading.Thread(target=schedule, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
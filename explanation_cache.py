@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from shared_cache import SqliteSharedCache
+
+
+# Builds the cache key of one explanation request, components are kept in pipeline order
+# The key of a single component's explanations also contains the pipeline components, as they determine the graph
+def explanation_cache_key(question, components, model, shots, component=None):
+    key = [question, list(components), model, shots]
+    if component is not None:
+        key.append(component)
+    return json.dumps(key)
+
+
+# Key of the result of a Qanary pipeline run, it doesn't depend on the GPT model
+def pipeline_cache_key(question, components):
+    return json.dumps(["pipeline", question, list(components)])
+
+
+# Key of the pointer from a run (as linked by a permalink) to the explanation cache key of its question
+def run_cache_key(graph, components, model, shots):
+    return json.dumps(["run", graph, list(components), model, shots])
+
+
+# Process-wide cache for parsed explanation dicts with LRU and TTL eviction and a memory cap
+# An optional SharedCache (e.g. an SQLite file at path) is the second level: entries survive restarts and are shared by all replicas
+class ExplanationCache:
+    def __init__(self, max_entries=256, ttl=86400, max_bytes=64 * 1024 * 1024, path=None, clock=time.time, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.shared = shared
+        if path and shared is None:
+            self.shared = SqliteSharedCache(path, clock=clock)
+
+    def get(self, key):
+        entry = self._local(key)
+        # the shared cache is read without the lock, so a slow shared cache doesn't hold up the hits of other sessions
+        if entry is None:
+            entry = self._load(key)
+        if entry is None or self._expired(entry):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(entry["value"])
+
+    def put(self, key, value):
+        serialized = json.dumps(value)
+        if len(serialized) > self.max_bytes:
+            return
+        entry = {"value": serialized, "created_at": self.clock()}
+        with self.lock:
+            self._remove(key)
+            self._insert(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, serialized, entry["created_at"], self.ttl)
+
+    # Seconds until an entry expires, None if there is no valid entry; doesn't count as a hit or miss
+    def ttl_remaining(self, key):
+        entry = self._local(key)
+        if entry is None:
+            entry = self._load(key)
+        if entry is None or self._expired(entry):
+            return None
+        return self.ttl - (self.clock() - entry["created_at"])
+
+    # Removes one entry without touching any other entry
+    def invalidate(self, key):
+        with self.lock:
+            self._remove(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    # Also clears the shared cache, i.e. the entries of every cache on it
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _expired(self, entry):
+        return self.clock() - entry["created_at"] > self.ttl
+
+    # An expired local copy is only dropped here, the shared cache may meanwhile hold a fresh entry written by another replica
+    def _local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                return None
+            return entry
+
+    def _load(self, key):
+        if self.shared is None:
+            return None
+        row = self.shared.get(key)
+        if row is None:
+            return None
+        entry = {"value": row[0], "created_at": row[1]}
+        if not self._expired(entry):
+            with self.lock:
+                self._remove(key)
+                self._insert(key, entry)
+        return entry
+
+    def _insert(self, key, entry):
+        self.entries[key] = entry
+        self.size += len(entry["value"])
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted["value"])
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry["value"])
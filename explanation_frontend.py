@@ -1,126 +1,25 @@
+import datetime
 import logging
+import uuid
 import streamlit as st
 from streamlit.components.v1 import html
-import requests
-import json
-from util import include_css, get_random_element, feedback_messages, feedback_icons
-from code_editor import code_editor
-import pandas as pd
-from decouple import config
-import pymongo
+from util import include_css, read_static_file, get_random_element, feedback_messages, feedback_icons
+from batch import parse_questions, rows_to_csv, rows_to_parquet
+from dataset_view import page_count, dataset_window, parse_triples, dataset_file_name, deferred_dataset, gzip_jsonl
+from jobs import JobQueueFull, FAILED, CANCELLED, QUEUED, RUNNING
+from explanation_backend import (
+    FEEDBACK_BAD, FEEDBACK_GOOD, QANARY_PIPELINE_URL, GITHUB_REPO, JOB_POLL_INTERVAL, DEBUG_PANEL, WARMUP, WARMUP_OWNER, DATASET_PAGE_LINES, DATASET_WINDOW_MAX_BYTES,
+    explanation_configurations_dict, explanation_configurations, gptModels_dic, gptModels, concrete_models, MODEL_KEY, SHOTS_KEY,
+    BATCH_STAGE, ANALYTICS_DIMENSIONS, EXAMPLE_QUESTIONS_SOURCE, UPLOAD_SOURCE, PIPELINE_STAGE, TEMPLATE_STAGE, EXPLANATION_STAGES, STAGE_ICONS, GPT_MODEL_HELP,
+    get_job_manager, get_metrics, get_feedback_writer, get_feedback_analytics, get_payload_store, get_warmup_scheduler, get_component_catalog, get_graph_inspector, request_components_list, convert_component_dir_to_list,
+    store_explanations, load_explanation, explanation_bundle, load_run,
+    explanations_for_models, explanations_by_component, run_batch_job
+)
 
 st.set_page_config(layout="wide")
-include_css(st, ["css/style_github_ribbon.css"])
-include_css(st, ["css/custom.css"])
-
-### Qanary components for pre-defined configurations
-NED_DBPEDIA = "NED-DBpediaSpotlight"
-KG2KG = "KG2KG-TranslateAnnotationsOfInstanceToDBpediaOrWikidata"
-QB_BIRTHDATA = "QB-BirthDataWikidata"
-QB_SINA = "SINA"
-QB_QANSWER = "QAnswerQueryBuilderAndQueryCandidateFetcher"
-QB_PLATYPUS = "PlatypusQueryBuilder"
-QE_SPARQLEXECUTER = "QE-SparqlQueryExecutedAutomaticallyOnWikidataOrDBpedia"
-QBE_QANSWER = "QAnswerQueryBuilderAndExecutor"
-FEEDBACK_BAD = 0
-FEEDBACK_GOOD = 1
-
-QANARY_PIPELINE_URL = config('QANARY_PIPELINE_URL')
-QANARY_EXPLANATION_SERVICE_URL = config('QANARY_EXPLANATION_SERVICE_URL')
-QANARY_PIPELINE_COMPONENTS = config('QANARY_PIPELINE_COMPONENTS')
-GITHUB_REPO = config('GITHUB_REPO')
-FEEDBACK_URL = config('FEEDBACK_URL')
-MONGO_USER = config('MONGO_USER')
-MONGO_PASSWORD = config('MONGO_PASSWORD')
-MONGO_AUTHSOURCE = config('MONGO_AUTHSOURCE')
-
-### Pre-defined configurations
-explanation_configurations_dict = {
-    "Configuration 1": {
-        "components": [NED_DBPEDIA, KG2KG, QB_BIRTHDATA, QE_SPARQLEXECUTER],
-        "exampleQuestions": [
-            "What is the birth date of Albert Einstein?",
-            "When was Albert Einstein born?",
-            "What is the birth date of Jesus Christ?",
-        ]
-    },
-#    "Configuration 2": {
-#        "components": [NED_DBPEDIA, KG2KG, QB_BIRTHDATA, QE_SPARQLEXECUTER],
-#        "exampleQuestions": ""
-#    },
-#    "Configuration 3": {
-#        "components": [],
-#        "exampleQuestions": ""
-#    }
-}
-explanation_configurations = explanation_configurations_dict.keys()
-explanation_configurations_captions = [
-    "Komponenten: " + NED_DBPEDIA + ", " + KG2KG + ", " + QB_BIRTHDATA + ", " + QE_SPARQLEXECUTER#,
-#    "", 
-#    ""
-]
-
-### Constants
-GPT3_5_TURBO = "GPT-3.5 (from OpenAI)"
-GPT3_5_MODEL = "GPT_3_5"
-GPT3_5_CONCRETE = "Concrete models: gpt-3.5-turbo-instruct / gpt-3.5-turbo-16k"
-GPT4_CONCRETE = "Concrete model: gpt-4-0613"
-CONCRETE_MODEL = "concrete_model"
-GPT4 = "GPT-4 (from OpenAI)"
-GPT4_MODEL = "GPT_4"
-MODEL_KEY = "model"
-SHOTS_KEY = "shots"
-SHOT = "-shot"
-ZEROSHOT = "0"
-ONESHOT = "1"  # "One-shot"
-TWOSHOT = "2"
-THREESHOT = "3"
-GPT_MODEL_HELP = "The examples for the prompts are generated randomly by executing several QA processes with Qanary. The selection of the Annotation-Type and Component for these examples are automated to reduce complexity."
-
-### MODEL MAPPINGS
-GPT_3_5_ZERO_SHOT = GPT3_5_TURBO + ", " + ZEROSHOT + SHOT
-GPT3_5_ONE_SHOT = GPT3_5_TURBO + ", " + ONESHOT + SHOT
-GPT3_5_TWO_SHOT = GPT3_5_TURBO + ", " + TWOSHOT + SHOT
-GPT3_5_THREE_SHOT = GPT3_5_TURBO + "," + THREESHOT + SHOT
-GPT4_ZERO_SHOT = GPT4 + ", " + ZEROSHOT + SHOT
-GPT4_ONE_SHOT = GPT4 + ", " + ONESHOT + SHOT + ":star:"
-
-### Selectable GPT models
-gptModels_dic = {
-    GPT_3_5_ZERO_SHOT: {
-        MODEL_KEY: GPT3_5_MODEL,
-        SHOTS_KEY: 0,
-        CONCRETE_MODEL: GPT3_5_CONCRETE
-    },    
-    GPT3_5_ONE_SHOT: {
-        MODEL_KEY: GPT3_5_MODEL,
-        SHOTS_KEY: 1,
-        CONCRETE_MODEL: GPT3_5_CONCRETE
-    },
-    GPT3_5_TWO_SHOT: {
-        MODEL_KEY: GPT3_5_MODEL,
-        SHOTS_KEY: 2,
-        CONCRETE_MODEL: GPT3_5_CONCRETE
-    },
-    GPT3_5_THREE_SHOT: {
-        MODEL_KEY: GPT3_5_MODEL,
-        SHOTS_KEY: 3,
-        CONCRETE_MODEL: GPT3_5_CONCRETE
-    },
-    GPT4_ZERO_SHOT: {
-        MODEL_KEY: GPT4_MODEL,
-        SHOTS_KEY: 0,
-        CONCRETE_MODEL: GPT4_CONCRETE
-    },
-    GPT4_ONE_SHOT: {
-        MODEL_KEY: GPT4_MODEL,
-        SHOTS_KEY: 1,
-        CONCRETE_MODEL: GPT4_CONCRETE
-    }
-
-}
-gptModels = gptModels_dic.keys()
-concrete_models = [value[CONCRETE_MODEL] for value in gptModels_dic.values()]
+include_css(st, ["css/style_github_ribbon.css", "css/custom.css"])
+if WARMUP:
+    get_warmup_scheduler()
 
 ### Initialize sessions states
 if'pipeline_finished' not in st.session_state:
@@ -139,71 +38,21 @@ if 'selected_configuration' not in st.session_state:
     st.session_state.selected_configuration = {}
 if "showPreconfigured" not in st.session_state:
     st.session_state.showPreconfigured = True;
-
-mongo_client = pymongo.MongoClient(FEEDBACK_URL,
-    username=MONGO_USER,
-    password=MONGO_PASSWORD,
-    authSource=MONGO_AUTHSOURCE,
-)
-explanationsDb = mongo_client["explanations"]
-explanationsCol = explanationsDb["explanation"]
+if 'modelComparison' not in st.session_state:
+    st.session_state.modelComparison = {}
+if 'active_job' not in st.session_state:
+    st.session_state.active_job = None
+if 'batch_job' not in st.session_state:
+    st.session_state.batch_job = None
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+PERMALINK_PARAMS = ["graph", "components", "model", "shots"]
 
 ###### FUNCTIONS 
 
-# Fetches the available components from the associated Qanary pipeline
-@st.cache_data
-def request_components_list():
-    try:
-        response = requests.get(QANARY_PIPELINE_COMPONENTS, headers={"Accept":"application/json"}) # Auslagern der URL
-        data = json.loads(response.text)
-        components = []
-        for key in data:
-            components.append(key["name"])
-        return components
-    except Exception as e:
-        raise Exception("Error while fetching the components: " + str(e))
-
-# Executes the Qanary pipeline with the passed components, the gptModel attr is passed to check whether it must be executed or can be taken from the cache
-@st.cache_data
-def execute_qanary_pipeline(question, components, gptModel):
-    component_list = ""
-    for component in components:
-        component_list += "&componentlist[]=" + component
-    custom_pipeline_url = f"{QANARY_PIPELINE_URL}/questionanswering?textquestion=" + question + component_list
-    try:
-        response = requests.post(custom_pipeline_url, {})
-        return response
-    except Exception as e:
-        st.toast("The qanary pipeline threw an error. Please try again later or select another configuration.")
-        return e
-
-# Fetches the explanations for the input data
-@st.cache_data
-def input_data_explanation(json):
-    input_explanation_url = f"{QANARY_EXPLANATION_SERVICE_URL}/composedexplanations/inputdata"
-    response = requests.post(input_explanation_url, json, headers={"Accept":"application/json","Content-Type":"application/json"})
-    if(200 <= response.status_code < 300):
-        return response.text
-    else:
-        raise Exception("Error while fetching the input data explanations: " + response.text)
-
-# Fetches the explanations for the output data
-@st.cache_data
-def output_data_explanation(json):
-    output_explanation_url = f"{QANARY_EXPLANATION_SERVICE_URL}/composedexplanations/outputdata"
-    response = requests.post(output_explanation_url, json, headers={"Accept":"application/json","Content-Type":"application/json"})
-    if(response.status_code != 200):
-        raise Exception("Error while fetching the output data explanations: " + response.text)
-    elif(200 <= response.status_code < 300):
-        return response.text
-
-# Helper function to convert the dict to a array of components # TODO: Needed!?
-def convert_component_dir_to_list(componentDir):
-    component_list = []
-    for component in componentDir:
-        component_list.append(component)
-    return component_list
-
 # Switches view when configuration switch is invoked, therefore, some session states have to be set to the default value
 def switch_view():
     st.session_state.explanations_generated = False
@@ -212,92 +61,245 @@ def switch_view():
     st.session_state.showPreconfigured = not st.session_state.showPreconfigured
     st.session_state.process_active = False
 
-# Outsourced method to create a new dict
-def createExplanationDict(input, output):
-    return {
-                "input_data": {
-                "rulebased": input["templatebased"],
-                "generative": input["generative"].lstrip("\n"),
-                "dataset": input["dataset"],
-                "prompt": input["prompt"]
-            },
-            "output_data": {
-                "rulebased": output["templatebased"],
-                "generative": output["generative"].lstrip("\n"),
-                "dataset" : output["dataset"],
-                "prompt": output["prompt"]
-            }
-    }
-
-# wrapper function, handles the request for explanations
+# wrapper function, submits the request for explanations as a background job, its progress is shown by show_job_progress
+# A single GPT model is fetched component by component, so the first component can be shown before the others are fetched
 def request_explanations(question, gptModel):
     st.session_state.explanations_generated = False
+    st.session_state.pipeline_finished = False
     st.session_state.process_active = True
+    st.session_state.modelComparison = {}
+    st.query_params.clear()
     components = convert_component_dir_to_list(st.session_state.selected_configuration["components"])
+    compare = st.session_state.get("compare_models", False)
+    models = list(gptModels) if compare else [gptModel]
     try:
-        qa_process_information = execute_qanary_pipeline(question, components, gptModel).json()
-        st.session_state.pipeline_finished = True
-        graph = qa_process_information["outGraph"]
-        json_data = json.dumps({
-        "graphUri": graph,
-        "generativeExplanationRequest": {
-            "shots": gptModels_dic[gptModel][SHOTS_KEY], #Rename gpt models dict as it contains the shots value
-            "gptModel": gptModels_dic[gptModel][MODEL_KEY],
-            "qanaryComponents": components
-        }})
-        
-        input_data_explanations = json.loads(input_data_explanation(json_data))
-        output_data_explanations = json.loads(output_data_explanation(json_data))
-
-        currentQaProcessExplanations = {
-            "components": {},
-            "meta_information": {
-                "graphUri": graph,
-                "questionUri": qa_process_information["question"]
-            }
-        }
-
-        for component in components:
-            input = input_data_explanations["explanationItems"][component]
-            output = output_data_explanations["explanationItems"][component]
-            currentQaProcessExplanations["components"][component] = createExplanationDict(input, output)
-
-        st.session_state.currentQaProcessExplanations = currentQaProcessExplanations
-        st.session_state.componentsSelection = currentQaProcessExplanations["components"].keys()
-        st.session_state.explanations_generated = True
-    except Exception as e:
-        logging.error("Error while executing the Qanary pipeline: " + str(e))
-        st.toast("Error while executing the explanation workflow with error: " + str(e))
-        st.session_state.pipeline_finished = False
-        st.cache_data.clear()
+        if compare:
+            job = get_job_manager().submit(question, EXPLANATION_STAGES, lambda job: explanations_for_models(question, components, models, job), owner=st.session_state.session_id)
+        else:
+            job = get_job_manager().submit(question, [PIPELINE_STAGE, TEMPLATE_STAGE] + components, lambda job: explanations_by_component(question, components, gptModel, job), owner=st.session_state.session_id)
+        st.session_state.active_job = {"id": job.id, "gptModel": gptModel, "compare": compare, "components": components}
+    except JobQueueFull as e:
+        st.toast(str(e))
+        st.session_state.process_active = False
+
+# The partial result of a job that ended without a result stays shown, but its components without generative explanations
+# won't get them anymore and are shown as failed
+def mark_unfinished_failed():
+    explanations = st.session_state.currentQaProcessExplanations
+    if st.session_state.pipeline_finished and explanations.get("components"):
+        st.session_state.currentQaProcessExplanations = {**explanations, "failed": [component for component in explanations["components"] if component not in explanations["generated"]]}
+
+# Takes over the result of a finished job into the session state
+def apply_job_result(job, gptModel, compare, components):
+    st.session_state.process_active = False
+    if job.state == CANCELLED:
+        mark_unfinished_failed()
+        st.toast("The explanation workflow was cancelled.")
+        return
+    if job.state == FAILED:
+        mark_unfinished_failed()
+        logging.error("Error while executing the Qanary pipeline: " + str(job.error))
+        st.toast("Error while executing the explanation workflow with error: " + str(job.error))
+        return
+    if compare:
+        explanations, explanation_errors = job.result
+    else:
+        explanation, component_errors = job.result
+        for component in component_errors:
+            st.toast(f"The explanations of {component} couldn't be fetched.")
+        explanations, explanation_errors = {gptModel: explanation}, {}
+    for model in explanation_errors:
+        st.toast(f"The explanations for {model} couldn't be fetched.")
+    if gptModel not in explanations:
+        st.toast(f"Error while executing the explanation workflow with error: The explanations for {gptModel} couldn't be fetched")
+        return
+    st.session_state.pipeline_finished = True
+    if compare:
+        st.session_state.modelComparison = {model: store_explanations(explanation)["components"] for model, explanation in explanations.items()}
+    currentQaProcessExplanations = store_explanations(explanations[gptModel], st.session_state.currentQaProcessExplanations, failed=component_errors if not compare else ())
+    st.session_state.currentQaProcessExplanations = currentQaProcessExplanations
+    # all components stay selectable, so the selection isn't reset when the last component arrives
+    st.session_state.componentsSelection = components if not compare else list(currentQaProcessExplanations["components"].keys())
+    st.session_state.explanations_generated = True
+    st.session_state.shown_gptModel = gptModel
+    # only complete runs are cached and can be linked
+    if compare or not component_errors:
+        set_permalink(currentQaProcessExplanations["meta_information"]["graphUri"], components, gptModel)
+
+# Links the shown run in the URL of the page, see open_permalink
+def set_permalink(graph, components, gptModel):
+    st.query_params.from_dict({
+        "graph": graph,
+        "components": ",".join(components),
+        "model": gptModels_dic[gptModel][MODEL_KEY],
+        "shots": gptModels_dic[gptModel][SHOTS_KEY]
+    })
+
+# Shows the run linked by the query parameters of the first request of a session, it is read from the explanation cache
+# (persisted if EXPLANATION_CACHE_PATH is set) and the backends aren't called
+def open_permalink():
+    st.session_state.permalink_checked = True
+    params = st.query_params
+    if not all(name in params for name in PERMALINK_PARAMS):
+        return
+    components = params["components"].split(",")
+    gptModel = next((label for label, model in gptModels_dic.items() if model[MODEL_KEY] == params["model"] and str(model[SHOTS_KEY]) == params["shots"]), None)
+    run = load_run(params["graph"], components, params["model"], gptModels_dic[gptModel][SHOTS_KEY]) if gptModel else None
+    if run is None:
+        st.query_params.clear()
+        st.toast("The linked explanations aren't available anymore, please send the question again.")
+        return
+    question, explanation = run
+    st.session_state.currentQaProcessExplanations = store_explanations(explanation)
+    st.session_state.componentsSelection = components
+    st.session_state.pipeline_finished = True
+    st.session_state.explanations_generated = True
+    st.session_state.shown_gptModel = gptModel
+    st.session_state.text_question = question
+    st.session_state.gpt_model = gptModel
+    configuration = next((name for name, value in explanation_configurations_dict.items() if convert_component_dir_to_list(value["components"]) == components), None)
+    if configuration is not None:
+        st.session_state.configuration = configuration
+    else:
+        st.session_state.showPreconfigured = False
+        st.session_state.compSelectionIndividual = components
+
+# 0: not fetched yet, 1: template-based explanations only, 2: template-based and generative explanations
+def component_state(explanations, component):
+    if component not in explanations.get("components", {}):
+        return 0
+    return 2 if component in explanations["generated"] else 1
+
+# Shows what a running job has already fetched: the meta information of the QA process, the template-based explanations
+# and the finished components, returns whether the app has to be rerun as the shown state changed
+def apply_partial_result(job, components):
+    partial = job.partial_snapshot()
+    if "meta_information" not in partial:
+        return False
+    selected = st.session_state.selected_component
+    shown = (st.session_state.pipeline_finished, st.session_state.explanations_generated, component_state(st.session_state.currentQaProcessExplanations, selected),
+             selected in st.session_state.currentQaProcessExplanations.get("failed", []))
+    explanations = store_explanations({"components": partial.get("components", {}), "meta_information": partial["meta_information"]}, st.session_state.currentQaProcessExplanations,
+                                      failed=partial.get("failed", []))
+    st.session_state.currentQaProcessExplanations = explanations
+    st.session_state.componentsSelection = components
+    st.session_state.pipeline_finished = True
+    st.session_state.explanations_generated = bool(explanations["components"])
+    return shown != (True, bool(explanations["components"]), component_state(explanations, selected), selected in explanations["failed"])
+
+def cancel_active_job():
+    if st.session_state.active_job:
+        get_job_manager().cancel(st.session_state.active_job["id"])
+
+# Takes over the (partial) result of the active job into the session state, returns whether the shown state changed
+def update_active_job():
+    active_job = st.session_state.active_job
+    job = get_job_manager().get(active_job["id"]) if active_job else None
+    if job is None:
+        st.session_state.active_job = None
+        st.session_state.process_active = False
+        return True
+    if job.finished:
+        st.session_state.active_job = None
+        apply_job_result(job, active_job["gptModel"], active_job["compare"], active_job["components"])
+        job.release()
+        return True
+    return not active_job["compare"] and apply_partial_result(job, active_job["components"])
+
+# Whether the active job is still going to fetch the generative explanations of a component
+def generative_pending(component):
+    if component in st.session_state.currentQaProcessExplanations.get("failed", []):
+        return False
+    job = get_job_manager().get(st.session_state.active_job["id"]) if st.session_state.active_job else None
+    return job is not None and not job.finished and dict(job.stage_progress()).get(component) in (QUEUED, RUNNING)
+
+# Polls the state of the active job, reruns the whole app if something new can be shown
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_job_progress():
+    if update_active_job():
+        st.rerun()
+    job = get_job_manager().get(st.session_state.active_job["id"])
+    with st.status(f"Processing: {job.label}", expanded=True):
+        for stage, state, seconds in job.stage_timeline():
+            st.write(f"{STAGE_ICONS[state]} {stage}" + (f" ({seconds:.1f} s)" if seconds is not None else ""))
+        st.button("Cancel", key="cancel_job", on_click=cancel_active_job)
+
+# Lists the jobs of this session and the load of the shared worker pool
+def show_job_queue():
+    manager = get_job_manager()
+    jobs = manager.list_jobs(owner=st.session_state.session_id)
+    with st.expander(f"Jobs ({manager.count('running')} running, {manager.count('queued')} queued)"):
+        if not jobs:
+            st.caption("No questions were sent yet.")
+        for job in reversed(jobs):
+            label, action = st.columns([0.8, 0.2])
+            label.write(f"{STAGE_ICONS[job.state]} {job.label}")
+            if not job.finished:
+                action.button(":no_entry_sign:", key="cancel_job_" + job.id, help="Cancel", on_click=manager.cancel, args=(job.id,))
 
 ##### definitions for configurations
 
-def showExplanationContainer(component, lang, plainKey, datasetTitle):
-    generative = (component["generative"]).strip("\n")
+# Fragments rerun on their own: a feedback click only rebuilds its buttons and switching the component
+# only rebuilds the explanations, the sidebar and the example questions aren't sent again
+# Fragments keep their arguments per session, so they get a reference into the payload store instead of the payload
+@st.fragment
+def showExplanationContainer(ref, datatype, lang, plainKey, datasetTitle):
+    with get_metrics().timed("stage", stage="render", datatype=plainKey):
+        renderExplanationContainer(ref, datatype, lang, plainKey, datasetTitle)
+
+def renderExplanationContainer(ref, datatype, lang, plainKey, datasetTitle):
+    component = load_explanation(ref)[datatype]
+    generative = (component["generative"]).strip("\n") if component["generative"] is not None else None
     template = (component["rulebased"]).strip("\n")
     with st.container(border=False):
         with st.expander(datasetTitle):
-            code_editor(component["dataset"],lang=lang, theme="default", options={"wrap": True})
+            show_dataset(ref, datatype, "dataset", lang, plainKey+"dataset", triples=lang == "turtle")
         with st.expander("Prompt"):
-            code_editor(component["prompt"], lang="turtle", theme="default", options={"wrap": True})
+            show_dataset(ref, datatype, "prompt", "turtle", plainKey+"prompt")
         templateCol, generativeCol = st.columns([0.5,0.5])
         with templateCol:
             st.markdown(f"""<h3>Template</h3>""", unsafe_allow_html=True)
             st.markdown(f"""<div style="margin-bottom: 25px;">{template}</div>""", unsafe_allow_html=True)
-            placeholder1, col1, col2, placeholder2 = st.columns(4)
-            with col1:
-                feedback_button(plainKey+"template"+"correct",":white_check_mark:", "template", template, plainKey, FEEDBACK_GOOD)
-            with col2:
-                feedback_button(plainKey+"template"+"wrong",":x:", "template", template, plainKey, FEEDBACK_BAD)
+            feedback_controls(plainKey, "template", template)
         with generativeCol:
             st.markdown(f"""<h3>Generative</h3>""", unsafe_allow_html=True)
-            st.markdown(f"""<div style="margin-bottom: 25px;">{generative}</div>""", unsafe_allow_html=True)
-            placeholder1, col1, col2, placeholder2 = st.columns(4)
-            with col1:
-                feedback_button(plainKey+"generative"+"correct",":white_check_mark:", "generative", generative, plainKey, FEEDBACK_GOOD)
-            with col2:
-                feedback_button(plainKey+"generative"+"wrong",":x:", "generative", generative, plainKey, FEEDBACK_BAD)
+            if generative is None and generative_pending(st.session_state.selected_component):
+                st.status("The GPT model is generating the explanation ...", state="running")
+            elif generative is None:
+                st.warning("The generative explanation is unavailable, send the question again to retry.", icon=":material/error:")
+            else:
+                st.markdown(f"""<div style="margin-bottom: 25px;">{generative}</div>""", unsafe_allow_html=True)
+                feedback_controls(plainKey, "generative", generative)
+
+# Shows one page of a dataset, the browser receives at most DATASET_PAGE_LINES lines and DATASET_WINDOW_MAX_BYTES of it
+# The complete dataset is only generated when it is downloaded
+@st.fragment
+def show_dataset(ref, explanationDatatype, field, lang, datatype, triples=False):
+    from code_editor import code_editor # imported on first use, it is only needed once explanations are shown
+    text = load_explanation(ref)[explanationDatatype][field]
+    key = datatype + st.session_state.selected_component
+    lines = text.splitlines()
+    pages = page_count(len(lines), DATASET_PAGE_LINES)
+    if st.session_state.get(key+"page", 1) > pages:
+        st.session_state[key+"page"] = 1
+    page = st.number_input("Page", min_value=1, max_value=pages, key=key+"page") if pages > 1 else 1
+    window, start, end = dataset_window(lines, page, DATASET_PAGE_LINES, DATASET_WINDOW_MAX_BYTES)
+    if triples and st.toggle("Table", key=key+"table"):
+        st.dataframe(parse_triples(window), hide_index=True)
+    else:
+        code_editor("\n".join(window), lang=lang, theme="default", options={"wrap": True})
+    caption, download = st.columns([0.8, 0.2])
+    caption.caption(f"Lines {start + 1 if window else 0}–{end} of {len(lines)}")
+    download.download_button("Download", data=deferred_dataset(load_explanation, ref, explanationDatatype, field), file_name=dataset_file_name(st.session_state.selected_component, datatype, lang),
+        mime="text/plain", key=key+"download", on_click="ignore")
+
+@st.fragment
+def feedback_controls(plainKey, type, explanation):
+    placeholder1, col1, col2, placeholder2 = st.columns(4)
+    with col1:
+        feedback_button(plainKey+type+"correct",":white_check_mark:", type, explanation, plainKey, FEEDBACK_GOOD)
+    with col2:
+        feedback_button(plainKey+type+"wrong",":x:", type, explanation, plainKey, FEEDBACK_BAD)
 
 def feedback_button(key, icon, type, explanation, datatype, feedback):
     if st.button(icon, key=key, type="secondary"):
@@ -315,11 +317,11 @@ def send_feedback(explanation, explanation_type, datatype, feedback):
             "shots": st.session_state.selected_gptModel["shots"],
             "feedback": feedback
         }
-    try: 
-        response = explanationsCol.insert_one(json)
-    except Exception as e:
+    with get_metrics().timed("stage", stage="feedback_enqueue"):
+        submitted = get_feedback_writer().submit(json)
+    if not submitted:
         st.toast("Feedback wasn't sent. Sorry for the circumstances.")
-        logging.error("Feedback wasn't sent: " + str(e))
+        logging.error("Feedback wasn't sent: the feedback buffer is full")
         st.error("Feedback wasn't sent. Sorry for the circumstances.")
 
 def show_meta_data():
@@ -332,18 +334,126 @@ def show_meta_data():
             st.markdown(f"<p><b>Graph:</b> {st.session_state.currentQaProcessExplanations['meta_information']['graphUri']}</p>", unsafe_allow_html=True)
         with sparqlEndpoint:
             st.write(f"**SPARQL endpoint**: <span class='plainLink'>{QANARY_PIPELINE_URL}/sparql</span>", unsafe_allow_html=True)
-        st.session_state.selected_component = containerPipelineAndComponentsRadio.radio('', st.session_state["componentsSelection"], horizontal=True, index=0)
+        if st.session_state.explanations_generated and not st.session_state.active_job:
+            explanations, gptModel = st.session_state.currentQaProcessExplanations, st.session_state.get("shown_gptModel")
+            bundle, permalink = containerPipelineAndComponentsRadio.columns([1, 2])
+            bundle.download_button("Download bundle", data=lambda: gzip_jsonl(explanation_bundle(explanations, gptModel)), file_name="explanations.jsonl.gz",
+                                   mime="application/gzip", on_click="ignore", help="All datasets, prompts and explanations of this run as gzip-compressed JSON lines")
+            if "graph" in st.query_params:
+                permalink.caption("The URL of this page links to these explanations.")
+        if not st.session_state.active_job:
+            show_graph_inspector(st.session_state.currentQaProcessExplanations['meta_information']['graphUri'])
+
+# Lists the annotations of the run's graph by component and type with bounded queries, nothing is queried until it is opened
+# A further page is only loaded on request, the pages that were already shown are read from the graph cache
+@st.fragment
+def show_graph_inspector(graph):
+    if not st.toggle("Inspect graph", key="graph_inspector", help="Lists the annotations of the graph of this QA process by component and annotation type."):
+        return
+    inspector = get_graph_inspector()
+    try:
+        summary = inspector.summary(graph)
+    except Exception as e:
+        st.error("The graph couldn't be queried: " + str(e))
+        return
+    if not summary:
+        st.info("The graph doesn't contain any annotations.")
+        return
+    st.dataframe(summary, hide_index=True)
+    index = st.selectbox("Annotations", range(len(summary)), key="graph_inspector_selection",
+                         format_func=lambda i: f"{summary[i]['component']} · {summary[i]['type']} ({summary[i]['annotations']})")
+    selection = (graph, summary[index]["component"], summary[index]["type"])
+    if st.session_state.get("graph_inspector_pages", {}).get("selection") != selection:
+        st.session_state.graph_inspector_pages = {"selection": selection, "cursors": [None]}
+    pages = st.session_state.graph_inspector_pages
+    rows = []
+    try:
+        for cursor in pages["cursors"]:
+            page = inspector.annotations(*selection, after=cursor)
+            rows += page["rows"]
+    except Exception as e:
+        st.error("The annotations couldn't be queried: " + str(e))
+        return
+    st.dataframe(rows, hide_index=True)
+    if page["next"]:
+        st.button("Load more", key="graph_inspector_more", on_click=lambda: pages["cursors"].append(page["next"]))
+
+# The component selector and the explanations of the selected component
+@st.fragment
+def show_component_explanations():
+    st.session_state.selected_component = st.radio('Component', st.session_state["componentsSelection"], horizontal=True, index=0, label_visibility="collapsed")
+    st.divider()
+    show_explanations()
+
+# Moves a shown component whose generative explanations aren't fetched yet to the front of the prefetch queue
+def prioritize_component(component):
+    job = get_job_manager().get(st.session_state.active_job["id"]) if st.session_state.active_job else None
+    if job is not None and job.queue is not None:
+        job.queue.prioritize(component)
+    return job
+
+# Placeholder for a component that isn't fetched yet
+def show_component_placeholder(component):
+    if prioritize_component(component) is None:
+        st.write(f"The explanations of {component} couldn't be fetched.")
+        return
+    st.info(f"The explanations of {component} are being fetched, they are shown as soon as they are ready.", icon=":material/hourglass_top:")
 
 def show_explanations():
-        if st.session_state.selected_configuration["components"]:
+        if st.session_state.selected_component not in st.session_state["currentQaProcessExplanations"]["components"]:
+            show_component_placeholder(st.session_state.selected_component)
+        elif st.session_state.selected_configuration["components"]:
+            if component_state(st.session_state["currentQaProcessExplanations"], st.session_state.selected_component) < 2:
+                prioritize_component(st.session_state.selected_component)
             st.header("Input data explanations")
-            showExplanationContainer(st.session_state["currentQaProcessExplanations"]["components"][st.session_state.selected_component]["input_data"], "sparql", "input","SPARQL query")
+            showExplanationContainer(st.session_state["currentQaProcessExplanations"]["components"][st.session_state.selected_component], "input_data", "sparql", "input","SPARQL query")
             st.markdown("""<div class="custom-divider"></div>""",unsafe_allow_html=True)
             st.header("Output data explanations")
-            showExplanationContainer(st.session_state["currentQaProcessExplanations"]["components"][st.session_state.selected_component]["output_data"], "turtle", "output", "RDF Triples")
+            showExplanationContainer(st.session_state["currentQaProcessExplanations"]["components"][st.session_state.selected_component], "output_data", "turtle", "output", "RDF Triples")
+            if st.session_state.modelComparison:
+                st.markdown("""<div class="custom-divider"></div>""",unsafe_allow_html=True)
+                st.header("Generative explanations by GPT model")
+                show_model_comparison(st.session_state.selected_component)
         else:
             st.write("You haven't selected a configuration or individual components")
 
+# Shows the generative explanations of all compared GPT models side by side for the selected component
+def show_model_comparison(component):
+    for datatype, title in [("input_data", "Input data"), ("output_data", "Output data")]:
+        st.subheader(title)
+        columns = st.columns(len(st.session_state.modelComparison))
+        for column, (gptModel, explanations) in zip(columns, st.session_state.modelComparison.items()):
+            with column:
+                st.markdown(f"**{gptModel}**")
+                st.markdown(f"""<div style="margin-bottom: 25px;">{load_explanation(explanations[component])[datatype]["generative"].strip()}</div>""", unsafe_allow_html=True)
+
+# Shows the latency summary of this process, enabled with DEBUG_PANEL
+def show_debug_panel():
+    with st.expander("Debug: latencies"):
+        metrics = get_metrics()
+        st.caption("Estimated percentiles are the upper bounds of the histogram buckets.")
+        st.dataframe(metrics.summary(), hide_index=True)
+        st.dataframe(metrics.counter_rows(), hide_index=True)
+        st.caption("Explanation payloads shared by all sessions")
+        st.dataframe([get_payload_store().stats()], hide_index=True)
+        st.caption("Component catalog")
+        st.dataframe([get_component_catalog().status()], hide_index=True)
+    if WARMUP:
+        show_warmup_progress()
+
+# Progress and failures of the last cache warm-up round
+def show_warmup_progress():
+    jobs = get_job_manager().list_jobs(owner=WARMUP_OWNER)
+    with st.expander("Debug: cache warm-up"):
+        if not jobs:
+            st.caption("The cache warm-up hasn't started yet.")
+            return
+        job = jobs[-1]
+        st.progress(job.completed / job.total if job.total else 0.0, text=f"{STAGE_ICONS[job.state]} {job.completed} of {job.total} example questions warmed up")
+        if job.error is not None:
+            st.error(str(job.error))
+        st.dataframe(job.items_snapshot(), hide_index=True)
+
 def exampleQuestion(key, question): 
     button, text = st.columns([0.04,0.96])
     with button:
@@ -352,23 +462,118 @@ def exampleQuestion(key, question):
     with text:
         st.write(question)
 
+##### Batch evaluation
+
+def start_batch(questions, components, models):
+    st.session_state.batch_results = []
+    try:
+        job = get_job_manager().submit(f"{BATCH_STAGE}: {len(questions)} questions", [BATCH_STAGE], lambda job: run_batch_job(job, questions, components, models), owner=st.session_state.session_id)
+        st.session_state.batch_job = job.id
+    except JobQueueFull as e:
+        st.toast(str(e))
+
+def cancel_batch():
+    if st.session_state.batch_job:
+        get_job_manager().cancel(st.session_state.batch_job)
+
+# Shows the progress and the rows of the running batch job, the rows are kept in the session once it is finished
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_batch_progress():
+    job = get_job_manager().get(st.session_state.batch_job) if st.session_state.batch_job else None
+    if job is None:
+        st.session_state.batch_job = None
+        return
+    if job.finished:
+        st.session_state.batch_job = None
+        st.session_state.batch_results = job.items_snapshot()
+        job.release()
+        if job.state == FAILED:
+            st.toast("The batch evaluation failed with error: " + str(job.error))
+        elif job.state == CANCELLED:
+            st.toast("The batch evaluation was cancelled, the finished questions are kept.")
+        st.rerun()
+    st.progress(job.completed / job.total if job.total else 0.0, text=f"{job.completed} of {job.total} questions finished")
+    st.button("Cancel", key="cancel_batch", on_click=cancel_batch)
+    st.dataframe(job.items_snapshot(), hide_index=True)
+
+def batch_evaluation():
+    st.subheader("Batch evaluation", help="Runs a set of questions through the Qanary pipeline and the explanation service and exports the explanations of every component.")
+    configuration = st.selectbox("Configuration", options=explanation_configurations, key="batch_configuration")
+    components = convert_component_dir_to_list(explanation_configurations_dict[configuration]["components"])
+    models = st.multiselect("GPT models", options=gptModels, default=[list(gptModels)[0]], key="batch_models")
+    source = st.radio("Questions", options=[EXAMPLE_QUESTIONS_SOURCE, UPLOAD_SOURCE], horizontal=True, key="batch_source")
+    questions = []
+    if source == UPLOAD_SOURCE:
+        uploaded = st.file_uploader("CSV with a 'question' column or JSONL with a 'question' key", type=["csv", "jsonl", "ndjson"], key="batch_file")
+        if uploaded is not None:
+            try:
+                questions = parse_questions(uploaded.name, uploaded.getvalue())
+            except Exception as e:
+                st.error("The file couldn't be read: " + str(e))
+    else:
+        questions = explanation_configurations_dict[configuration]["exampleQuestions"]
+    st.caption(f"{len(questions)} questions, {len(questions) * len(models)} explanation requests")
+    st.button("Run batch", on_click=start_batch, args=(questions, components, models), disabled=not questions or not models or st.session_state.batch_job is not None)
+
+    if st.session_state.batch_job:
+        show_batch_progress()
+    elif st.session_state.batch_results:
+        rows = st.session_state.batch_results
+        st.dataframe(rows, hide_index=True)
+        csvColumn, parquetColumn, _ = st.columns([0.2, 0.2, 0.6])
+        with csvColumn:
+            st.download_button("Download CSV", data=lambda: rows_to_csv(rows), file_name="explanations.csv", mime="text/csv", on_click="ignore")
+        with parquetColumn:
+            st.download_button("Download Parquet", data=lambda: rows_to_parquet(rows), file_name="explanations.parquet", mime="application/vnd.apache.parquet", on_click="ignore")
+
+##### Feedback analytics
+
+# Approval rates of the feedback per selected dimensions and day, read from the feedback summary
+def feedback_analytics():
+    st.subheader("Feedback analytics", help="Share of the feedback that marked an explanation as correct, per component, explanation type, data, GPT model and shots.")
+    groupColumn, daysColumn = st.columns([0.8, 0.2])
+    group_by = groupColumn.multiselect("Group by", options=list(ANALYTICS_DIMENSIONS), default=["component", "explanation_type"], format_func=ANALYTICS_DIMENSIONS.get, key="analytics_group_by")
+    days = daysColumn.number_input("Last days", min_value=1, value=30, key="analytics_days")
+    since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+    try:
+        analytics = get_feedback_analytics()
+        rows = analytics.approval_rates(group_by, since)
+        daily = analytics.approval_rates(["day"] + group_by, since)
+    except Exception as e:
+        logging.error("Error while loading the feedback analytics: " + str(e))
+        st.error("The feedback analytics couldn't be loaded: " + str(e))
+        return
+    if not rows:
+        st.caption("There is no feedback in this period yet.")
+        return
+    st.dataframe(rows, hide_index=True, column_config={"approval_rate": st.column_config.ProgressColumn("Approval rate", min_value=0.0, max_value=1.0, format="percent")})
+    import pandas as pd # imported on first use like in the exports
+    chart = pd.DataFrame(daily)
+    chart["group"] = chart[group_by].astype(str).agg(" / ".join, axis=1) if group_by else "All feedback"
+    st.line_chart(chart.pivot_table(index="day", columns="group", values="approval_rate"), y_label="Approval rate")
+
 ##### Configured
 def pre_configured():
     if st.session_state.pipeline_finished:
         show_meta_data()
-        st.divider()
     if st.session_state.explanations_generated:
-        show_explanations()
+        show_component_explanations()
 
 ##### Not configured
 def not_pre_configured():
-    components = request_components_list()
-    componentsNames = convert_component_dir_to_list(components)
+    get_metrics().increment("cache_lookups", cache="components")
+    components = {component["name"]: component for component in request_components_list()}
     st.session_state.selected_configuration = {"components":{}}
+    # components that were removed from the pipeline since the last run can't stay selected
+    if "compSelectionIndividual" in st.session_state:
+        st.session_state.compSelectionIndividual = [component for component in st.session_state.compSelectionIndividual if component in components]
 
     st.subheader("Select components for the Qanary pipeline execution")
 
-    st.session_state.selected_configuration["components"] = st.multiselect(label="Select your components in the correct order", label_visibility="hidden",options=componentsNames, key="compSelectionIndividual", placeholder="Choose your desired components")
+    st.session_state.selected_configuration["components"] = st.multiselect(label="Select your components in the correct order", label_visibility="hidden",options=list(components), key="compSelectionIndividual", placeholder="Choose your desired components")
+    if st.session_state.selected_configuration["components"]:
+        with st.expander("Component details"):
+            st.dataframe([components[component] for component in st.session_state.selected_configuration["components"]], hide_index=True)
 
     pre_configured()
 
@@ -376,43 +581,64 @@ def not_pre_configured():
 
 st.header('Qanary Explanation Demo')
 
+if "permalink_checked" not in st.session_state:
+    open_permalink()
+
 with st.sidebar:
     if st.session_state.showPreconfigured:
         st.subheader("Default configurations", help="Select a pre-defined configuration to start the Qanary pipeline with.")
-        configuration = st.radio(label='Select a configuration:',options=explanation_configurations, index=0, label_visibility="collapsed")
+        configuration = st.radio(label='Select a configuration:',options=explanation_configurations, key="configuration", label_visibility="collapsed")
         st.session_state.selected_configuration = explanation_configurations_dict[configuration] # Make it a session state
         configButton = st.button("Change configuration", on_click=lambda: switch_view())
     st.subheader('GPT Model', help="Select a GPT model to generate the generative explanation. Please note that an explanation with more shots will take longer to generate.")
-    gptModel = st.radio('What GPT model should create the generative explanation?', label_visibility="collapsed", options=gptModels, index=0, help=GPT_MODEL_HELP, captions=concrete_models)
+    gptModel = st.radio('What GPT model should create the generative explanation?', label_visibility="collapsed", options=gptModels, key="gpt_model", help=GPT_MODEL_HELP, captions=concrete_models)
     st.session_state.selected_gptModel = gptModels_dic[gptModel]
+    st.toggle("Batch evaluation", key="batch_mode", help="Runs a set of questions with one configuration and several GPT models and exports the results.")
+    st.toggle("Feedback analytics", key="analytics_mode", help="Shows the approval rates of the feedback over time.")
+    st.checkbox("Compare all GPT models", key="compare_models", help="Generates the explanations of the same QA process with every GPT model and shows the generative explanations side by side. The Qanary pipeline is only executed once.")
     if not st.session_state.showPreconfigured:
         configButton = st.button("Change configuration", on_click=lambda: switch_view())
+    show_job_queue()
+    if DEBUG_PANEL:
+        show_debug_panel()
 
-header_column, button_column = st.columns(2)
+if st.session_state.get("analytics_mode", False):
+    feedback_analytics()
+elif st.session_state.get("batch_mode", False):
+    batch_evaluation()
+else:
+    # a full run shows the current state of the active job right away, show_job_progress only reruns the app between full runs
+    if st.session_state.active_job:
+        update_active_job()
 
-with header_column:
-    st.subheader("Enter a question")
+    header_column, button_column = st.columns(2)
 
-question, submit_question = st.columns([5, 1])
+    with header_column:
+        st.subheader("Enter a question")
 
-with question:
-    placeholder = st.empty()
-with submit_question:
-    st.button('Send', on_click=lambda: request_explanations(text_question, gptModel))
+    question, submit_question = st.columns([5, 1])
 
-if st.session_state.showPreconfigured:    
-    with st.expander("Example questions"):
-        for question in st.session_state.selected_configuration["exampleQuestions"]:
-            exampleQuestion(question, question)
+    with question:
+        placeholder = st.empty()
+    with submit_question:
+        st.button('Send', on_click=lambda: request_explanations(text_question, gptModel), disabled=st.session_state.active_job is not None)
 
-text_question = placeholder.text_input(key="text_question", label='Your question', value="When was Albert Einstein born?", label_visibility="collapsed")
+    if st.session_state.showPreconfigured:    
+        with st.expander("Example questions"):
+            for question in st.session_state.selected_configuration["exampleQuestions"]:
+                exampleQuestion(question, question)
 
-# Select whether showPreconfigured is True or False
+    text_question = placeholder.text_input(key="text_question", label='Your question', value="When was Albert Einstein born?", label_visibility="collapsed")
 
-if st.session_state.showPreconfigured:
-    pre_configured()
-elif not st.session_state.showPreconfigured:
-    not_pre_configured()
+    if st.session_state.active_job:
+        show_job_progress()
+
+    # Select whether showPreconfigured is True or False
+
+    if st.session_state.showPreconfigured:
+        pre_configured()
+    elif not st.session_state.showPreconfigured:
+        not_pre_configured()
 
 ### Additional HTML and JS
 
@@ -423,9 +649,7 @@ Brought to you by the [<img style="height:3ex;border:0" src="https://avatars.git
 See our [GitHub team page](http://wse.technology/) for more projects and tools.
 """, unsafe_allow_html=True)
 
-with open("js/change_menu.js", "r") as f:
-    javascript = f.read()
-    html(f"<script style='display:none'>{javascript}</script>")
+html(f"<script style='display:none'>{read_static_file('js/change_menu.js')}</script>")
 
 html("""
 <script>
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+# Writes feedback documents in batches on a background thread, a click only enqueues its document
+# Batches that can't be written while MongoDB is unavailable are spooled to a local file and retried later
+# on_documents_written receives the documents that were inserted, e.g. to update aggregates, its errors don't affect the feedback
+# Every document is written with the time of the insert attempt (written_at, seconds since the epoch), unlike its _id, which is
+# taken when it is submitted, it is renewed when a spooled document is written again
+class FeedbackWriter:
+    def __init__(self, collection, batch_size=50, flush_interval=1.0, max_buffer=1000, spool_path=None, retry_interval=5.0, enqueue_timeout=0.05, on_batch_written=None, on_documents_written=None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.retry_interval = retry_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.on_batch_written = on_batch_written
+        self.on_documents_written = on_documents_written
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self.spool_lock = threading.Lock()
+        self.unavailable_until = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self.thread.start()
+
+    # Enqueues a document, if the buffer stays full for enqueue_timeout the document is spooled instead
+    # Returns False only if the document could neither be enqueued nor spooled
+    def submit(self, document):
+        document = dict(document)
+        document.setdefault("_id", ObjectId())
+        try:
+            self.buffer.put(document, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            return self._spool([document])
+
+    # Writes everything that is buffered and stops the background thread
+    def close(self, timeout=10):
+        self.stopped.set()
+        self.thread.join(timeout)
+
+    def pending(self):
+        return self.buffer.qsize()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif time.monotonic() >= self.unavailable_until:
+                self._replay_spool()
+        batch = self._drain()
+        if batch:
+            self._write(batch)
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stopped.is_set():
+                break
+            try:
+                batch.append(self.buffer.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.buffer.get_nowait())
+            except queue.Empty:
+                return batch
+
+    # Returns whether the batch was written, failed documents are spooled
+    def _write(self, batch):
+        if time.monotonic() < self.unavailable_until:
+            self._spool(batch)
+            return False
+        written_at = time.time()
+        documents = [{**document, "written_at": written_at} for document in batch]
+        try:
+            start = time.perf_counter()
+            self.collection.insert_many(documents, ordered=False)
+            if self.on_batch_written is not None:
+                self.on_batch_written(time.perf_counter() - start, len(batch))
+            self._written(documents)
+            return True
+        except BulkWriteError as e:
+            # documents of a retried batch may already exist
+            errors = {error["index"]: error.get("code") for error in e.details.get("writeErrors", [])}
+            failed = {index for index, code in errors.items() if code != DUPLICATE_KEY_ERROR}
+            if failed:
+                self._spool([batch[index] for index in sorted(failed)])
+            self._written([document for index, document in enumerate(documents) if index not in errors])
+            return not failed
+        except Exception as e:
+            logging.error("Feedback couldn't be written, retrying in %s seconds: %s", self.retry_interval, e)
+            self.unavailable_until = time.monotonic() + self.retry_interval
+            self._spool(batch)
+            return False
+
+    def _written(self, documents):
+        if self.on_documents_written is None or not documents:
+            return
+        try:
+            self.on_documents_written(documents)
+        except Exception as e:
+            logging.error("Handling the written feedback failed: %s", e)
+
+    def _spool(self, documents):
+        if not self.spool_path:
+            logging.error("Feedback was dropped as no spool file is configured: %s documents", len(documents))
+            return False
+        with self.spool_lock:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for document in documents:
+                    f.write(json.dumps({**document, "_id": str(document["_id"])}) + "\n")
+        return True
+
+    def _replay_spool(self):
+        if not self.spool_path:
+            return
+        with self.spool_lock:
+            if not os.path.exists(self.spool_path):
+                return
+            replay_path = self.spool_path + ".replay"
+            os.replace(self.spool_path, replay_path)
+        with open(replay_path, encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        for document in documents:
+            document["_id"] = ObjectId(document["_id"])
+        # batches that fail again are spooled to a new spool file
+        for start in range(0, len(documents), self.batch_size):
+            self._write(documents[start:start + self.batch_size])
+        os.remove(replay_path)
@@ -0,0 +1,124 @@
+import logging
+import time
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+DIMENSIONS = ["component", "explanation_type", "datatype", "gpt_model", "shots"]
+SUMMARY_KEY = ["day"] + DIMENSIONS
+BACKFILL_MARKER = "backfill"
+
+
+# Day (UTC) on which a feedback document was submitted, taken from its ObjectId
+def feedback_day(document):
+    return document["_id"].generation_time.strftime("%Y-%m-%d")
+
+
+# Approval rates of the feedback, read from a summary collection with one document per day and combination of the DIMENSIONS
+# (counts of all and of the good feedback), so a query never reads the feedback documents themselves
+# The summary is updated with every written batch of feedback (record), feedback that was written before the summary existed
+# is added once by backfill into separate counts (backfill_total, backfill_good), so a backfill can run again without counting twice
+# Which feedback is backfilled is decided by a marker document {_id: "backfill"} in the summary that the first replica inserts:
+# feedback written (written_at, set by the FeedbackWriter on insert) before its boundary is only counted by the backfill,
+# later feedback only by record; the backfill starts grace_period seconds after the boundary, so that inserts that were
+# already in flight at the boundary have finished (inserts that fail are spooled and get a new written_at)
+# A replica backfills after moving the marker from pending to running, a running claim older than lease seconds is taken over
+class FeedbackAnalytics:
+    def __init__(self, feedback, summary, grace_period=300, lease=600, clock=time.time):
+        self.feedback = feedback
+        self.summary = summary
+        self.grace_period = grace_period
+        self.lease = lease
+        self.clock = clock
+        self.until = None
+
+    # Creates the indexes and backfills the summary, unless the grace period hasn't passed yet or another replica has a current
+    # claim on the backfill; returns whether the backfill is done, by this or another replica
+    def prepare(self):
+        try:
+            self.ensure_indexes()
+            until = self.boundary()
+            now = self.clock()
+            if now < until + self.grace_period:
+                return False
+            claimed = self.summary.update_one(
+                {"_id": BACKFILL_MARKER, "$or": [{"state": "pending"}, {"state": "running", "claimed_at": {"$lt": now - self.lease}}]},
+                {"$set": {"state": "running", "claimed_at": now}})
+            if claimed.modified_count == 1:
+                self.backfill(until)
+                self.summary.update_one({"_id": BACKFILL_MARKER}, {"$set": {"state": "done"}})
+                return True
+            return self.summary.find_one({"_id": BACKFILL_MARKER})["state"] == "done"
+        except Exception as e:
+            logging.error("The feedback summary couldn't be prepared: %s", e)
+            return False
+
+    # Runs prepare until the backfill is done, e.g. during the grace period, while MongoDB is unavailable or another replica backfills,
+    # the retry interval doubles after every attempt up to max_retry_interval
+    def prepare_until_done(self, retry_interval=5.0, max_retry_interval=300.0, sleep=time.sleep):
+        while not self.prepare():
+            sleep(retry_interval)
+            retry_interval = min(retry_interval * 2, max_retry_interval)
+
+    def ensure_indexes(self):
+        self.feedback.create_index([(dimension, ASCENDING) for dimension in DIMENSIONS] + [("_id", ASCENDING)], name="feedback_dimensions")
+        self.summary.create_index([(field, ASCENDING) for field in SUMMARY_KEY], name="summary_key", unique=True)
+
+    # The boundary of the backfill from the marker, which is inserted with the current time if no replica has inserted it yet
+    def boundary(self):
+        if self.until is None:
+            try:
+                self.summary.insert_one({"_id": BACKFILL_MARKER, "until": self.clock(), "state": "pending"})
+            except DuplicateKeyError:
+                pass
+            self.until = self.summary.find_one({"_id": BACKFILL_MARKER})["until"]
+        return self.until
+
+    # Adds the written feedback documents to the summary, one upsert per day and combination; documents written before the
+    # boundary are left to the backfill
+    def record(self, documents):
+        until = self.boundary()
+        counts = {}
+        for document in documents:
+            if document["written_at"] < until:
+                continue
+            key = (feedback_day(document),) + tuple(document.get(dimension) for dimension in DIMENSIONS)
+            total, good = counts.get(key, (0, 0))
+            counts[key] = (total + 1, good + (1 if document.get("feedback") == 1 else 0))
+        if counts:
+            self.summary.bulk_write([
+                UpdateOne(dict(zip(SUMMARY_KEY, key)), {"$inc": {"total": total, "good": good}}, upsert=True)
+                for key, (total, good) in counts.items()
+            ], ordered=False)
+
+    # Sets the backfilled counts of the feedback written before until in the summary with one aggregation in MongoDB,
+    # feedback without written_at was written before the summary existed
+    def backfill(self, until):
+        self.feedback.aggregate([
+            {"$match": {"$or": [{"written_at": {"$lt": until}}, {"written_at": {"$exists": False}}]}},
+            {"$group": {
+                "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$_id"}}}, **{dimension: "$" + dimension for dimension in DIMENSIONS}},
+                "total": {"$sum": 1},
+                "good": {"$sum": {"$cond": [{"$eq": ["$feedback", 1]}, 1, 0]}}
+            }},
+            {"$replaceWith": {"$mergeObjects": ["$_id", {"backfill_total": "$total", "backfill_good": "$good"}]}},
+            {"$merge": {
+                "into": self.summary.name,
+                "on": SUMMARY_KEY,
+                "whenMatched": [{"$set": {"backfill_total": "$$new.backfill_total", "backfill_good": "$$new.backfill_good"}}],
+                "whenNotMatched": "insert"
+            }}
+        ])
+
+    # Rows with the approval rate per combination of the group_by dimensions (and/or "day") since the passed day (YYYY-MM-DD),
+    # the backfill marker has no day
+    def approval_rates(self, group_by, since=None):
+        rows = {}
+        for document in self.summary.find({"day": {"$gte": since} if since else {"$exists": True}}, {"_id": 0}):
+            key = tuple(document.get(field) for field in group_by)
+            row = rows.setdefault(key, {**dict(zip(group_by, key)), "feedback": 0, "good": 0})
+            row["feedback"] += document.get("total", 0) + document.get("backfill_total", 0)
+            row["good"] += document.get("good", 0) + document.get("backfill_good", 0)
+        for row in rows.values():
+            row["approval_rate"] = row["good"] / row["feedback"] if row["feedback"] else None
+        return sorted(rows.values(), key=lambda row: tuple(str(row[field]) for field in group_by))
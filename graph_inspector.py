@@ -0,0 +1,86 @@
+import json
+
+from jobs import SingleFlight
+
+OA = "http://www.w3.org/ns/openannotation/core/"
+IRI_FORBIDDEN = set('<>"{}|^`\\ \n\t')
+
+
+class GraphInspectorError(Exception):
+    pass
+
+
+def iri(value):
+    if not value or IRI_FORBIDDEN & set(value):
+        raise GraphInspectorError(f"{value!r} is no valid IRI")
+    return f"<{value}>"
+
+
+# Number of annotations per component (oa:annotatedBy) and annotation type in a graph, bounded by limit rows
+def summary_query(graph, limit):
+    return f"""PREFIX oa: <{OA}>
+SELECT ?component ?type (COUNT(DISTINCT ?annotation) AS ?annotations) WHERE {{
+  GRAPH {iri(graph)} {{ ?annotation oa:annotatedBy ?component ; a ?type . }}
+}}
+GROUP BY ?component ?type
+ORDER BY ?component ?type
+LIMIT {int(limit)}"""
+
+
+# All triples of the next limit annotations of a component and type, ordered by IRI; keyset paging starts after the IRI after,
+# so a page doesn't get slower with its position like with OFFSET
+def page_query(graph, component, annotation_type, after, limit):
+    keyset = f"FILTER(STR(?annotation) > {json.dumps(after)})" if after else ""
+    return f"""PREFIX oa: <{OA}>
+SELECT ?annotation ?property ?value WHERE {{
+  {{
+    SELECT DISTINCT ?annotation WHERE {{
+      GRAPH {iri(graph)} {{ ?annotation oa:annotatedBy {iri(component)} ; a {iri(annotation_type)} . }}
+      FILTER(isIRI(?annotation)) {keyset}
+    }}
+    ORDER BY STR(?annotation)
+    LIMIT {int(limit)}
+  }}
+  GRAPH {iri(graph)} {{ ?annotation ?property ?value . }}
+}}
+ORDER BY STR(?annotation) ?property"""
+
+
+def binding_rows(results, variables):
+    return [{variable: binding[variable]["value"] for variable in variables if variable in binding} for binding in results["results"]["bindings"]]
+
+
+# Bounded, cached queries for the annotations of a QA process graph on the Qanary SPARQL endpoint
+# A graph doesn't change after its QA process, so results are cached per graph and query without invalidation (besides the
+# cache's own LRU and TTL); concurrent sessions asking for the same page share one query
+class GraphInspector:
+    def __init__(self, query, cache, page_size=50, summary_limit=1000):
+        self.query = query
+        self.cache = cache
+        self.page_size = page_size
+        self.summary_limit = summary_limit
+        self.calls = SingleFlight()
+
+    # Rows with component, type and the number of annotations
+    def summary(self, graph):
+        def run():
+            rows = binding_rows(self.query(summary_query(graph, self.summary_limit)), ["component", "type", "annotations"])
+            return [{**row, "annotations": int(row["annotations"])} for row in rows]
+        return self._cached(["summary", graph, self.summary_limit], run)
+
+    # One page: rows with annotation, property and value and the IRI the next page starts after (None on the last page)
+    def annotations(self, graph, component, annotation_type, after=None):
+        def run():
+            rows = binding_rows(self.query(page_query(graph, component, annotation_type, after, self.page_size)), ["annotation", "property", "value"])
+            annotations = list(dict.fromkeys(row["annotation"] for row in rows))
+            return {"rows": rows, "next": annotations[-1] if len(annotations) == self.page_size else None}
+        return self._cached(["annotations", graph, component, annotation_type, after, self.page_size], run)
+
+    def _cached(self, key, run):
+        key = json.dumps(key)
+        result = self.cache.get(key)
+        if result is None:
+            result, shared = self.calls.do(key, run)
+            if not shared:
+                self.cache.put(key, result)
+        return result
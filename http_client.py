@@ -0,0 +1,111 @@
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 60)
+RETRY_STATUS_CODES = [502, 503, 504]
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# Counts consecutive failures of one backend and rejects calls for reset_timeout seconds once the threshold is reached
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    # Closed circuits allow every call, open ones allow a single trial call after reset_timeout (half-open)
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                self.opened_at = self.clock()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+# Shared HTTP client for the Qanary backends: pooled keep-alive connections, per-endpoint timeouts,
+# retries with backoff for idempotent calls and one circuit breaker per backend host
+# max_concurrent limits the requests in flight per endpoint for the whole process, however many jobs and workers send them;
+# further requests wait for a free slot
+class BackendClient:
+    def __init__(self, pool_size=10, retries=3, backoff_factor=0.5, timeouts=None, failure_threshold=5, reset_timeout=30, max_concurrent=None):
+        self.timeouts = timeouts or {}
+        self.slots = {endpoint: threading.BoundedSemaphore(limit) for endpoint, limit in (max_concurrent or {}).items() if limit > 0}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, endpoint, url, **kwargs):
+        return self.request("GET", endpoint, url, **kwargs)
+
+    def post(self, endpoint, url, data=None, **kwargs):
+        return self.request("POST", endpoint, url, data=data, **kwargs)
+
+    # Sends a request to the named endpoint, fails fast with CircuitOpenError while its backend is considered down
+    def request(self, method, endpoint, url, **kwargs):
+        backend = urlsplit(url).netloc
+        breaker = self.breaker(backend)
+        if not breaker.allow():
+            raise CircuitOpenError(f"The backend {backend} is unavailable, the request to {endpoint} was not sent")
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, DEFAULT_TIMEOUT))
+        try:
+            with self.slots.get(endpoint) or nullcontext():
+                response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def breaker(self, backend):
+        with self.breakers_lock:
+            if backend not in self.breakers:
+                self.breakers[backend] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[backend]
+
+    def close(self):
+        self.session.close()
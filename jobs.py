@@ -0,0 +1,251 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# One submitted unit of work with per-stage progress, the work function reports progress through the job
+class Job:
+    def __init__(self, job_id, label, stages, owner=None):
+        self.id = job_id
+        self.label = label
+        self.owner = owner
+        self.stages = OrderedDict((stage, QUEUED) for stage in stages)
+        self.pending_parts = {}
+        self.stage_started = {}
+        self.stage_finished = {}
+        self.items = []
+        self.completed = 0
+        self.total = 0
+        self.partial = {}
+        self.queue = None
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+    # A stage may consist of several parts running in parallel, it is finished once every part is finished
+    def start_stage(self, stage, parts=1):
+        self.check_cancelled()
+        with self.lock:
+            self.stages[stage] = RUNNING
+            self.pending_parts[stage] = parts
+            self.stage_started[stage] = time.time()
+
+    # A failed part marks the whole stage as failed
+    def finish_stage(self, stage, state=DONE):
+        with self.lock:
+            self.pending_parts[stage] = self.pending_parts.get(stage, 1) - 1
+            if state == FAILED:
+                self.stages[stage] = FAILED
+            elif self.pending_parts[stage] <= 0 and self.stages[stage] in (QUEUED, RUNNING):
+                self.stages[stage] = state
+            if self.stages[stage] in FINISHED_STATES:
+                self.stage_finished.setdefault(stage, time.time())
+
+    # Raises JobCancelled if the job was cancelled, work functions call it between their stages
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"The job {self.label} was cancelled")
+
+    # Partial results of jobs that produce many items (e.g. a batch evaluation), readable while the job runs
+    def add_items(self, items, completed=1):
+        with self.lock:
+            self.items.extend(items)
+            self.completed += completed
+
+    def items_snapshot(self):
+        with self.lock:
+            return list(self.items)
+
+    # Named partial results (e.g. the explanations of each finished component), readable while the job runs
+    def set_partial(self, key, value):
+        with self.lock:
+            self.partial[key] = value
+
+    def partial_snapshot(self):
+        with self.lock:
+            return dict(self.partial)
+
+    # Drops the result, partial results and items once a session has taken them over, a finished job stays in the
+    # history of its JobManager and would otherwise keep its payloads until it is forgotten
+    def release(self):
+        with self.lock:
+            self.result = None
+            self.partial = {}
+            self.items = []
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def stage_progress(self):
+        with self.lock:
+            return list(self.stages.items())
+
+    # (stage, state, seconds) of every stage, seconds is the duration so far of a running stage and None for a stage that didn't start
+    def stage_timeline(self):
+        now = time.time()
+        with self.lock:
+            return [(stage, state, self.stage_finished.get(stage, now) - self.stage_started[stage] if stage in self.stage_started else None)
+                    for stage, state in self.stages.items()]
+
+    def _finish(self, state, result=None, error=None):
+        with self.lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            if state != DONE:
+                for stage, stage_state in self.stages.items():
+                    if stage_state in (QUEUED, RUNNING):
+                        self.stages[stage] = state
+                        if stage in self.stage_started:
+                            self.stage_finished.setdefault(stage, self.finished_at)
+
+
+# Runs jobs on a bounded worker pool, max_workers is the global concurrency limit for the backends
+# and max_queued the number of jobs that may wait for a free worker
+class JobManager:
+    def __init__(self, max_workers=4, max_queued=32, max_history=100):
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    # Enqueues fn(job), raises JobQueueFull if too many jobs are already waiting
+    def submit(self, label, stages, fn, owner=None):
+        with self.lock:
+            if self.count(QUEUED) >= self.max_queued:
+                raise JobQueueFull("Too many questions are waiting to be processed, please try again later")
+            job = Job(str(next(self.ids)), label, stages, owner)
+            self.jobs[job.id] = job
+            self._forget_finished()
+        job.future = self.executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def list_jobs(self, owner=None):
+        return [job for job in list(self.jobs.values()) if owner is None or job.owner == owner]
+
+    def count(self, state):
+        return sum(1 for job in list(self.jobs.values()) if job.state == state)
+
+    def shutdown(self):
+        for job in self.list_jobs():
+            job.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _run(self, job, fn):
+        if job.cancelled:
+            job._finish(CANCELLED)
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            job._finish(DONE, result=fn(job))
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(FAILED, error=e)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_history)]:
+            del self.jobs[job_id]
+
+
+# Work items of a job in the order they are processed, a session can move an item to the front while the job runs
+class PrefetchQueue:
+    def __init__(self, items):
+        self.items = list(items)
+        self.lock = threading.Lock()
+
+    # Returns the next item or None if every item was taken
+    def pop(self):
+        with self.lock:
+            return self.items.pop(0) if self.items else None
+
+    # Moves item to the front, returns False if it was already taken
+    def prioritize(self, item):
+        with self.lock:
+            if item not in self.items:
+                return False
+            self.items.remove(item)
+            self.items.insert(0, item)
+            return True
+
+    def remaining(self):
+        with self.lock:
+            return list(self.items)
+
+
+# Coalesces concurrent calls with the same key, the first caller runs fn and later callers wait for its result
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    # Returns the result of fn and whether it was shared from another caller instead of computed by this one
+    def do(self, key, fn):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PREFIX = "qanary_frontend_"
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in pairs]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    # Estimates a quantile from the buckets, returns the upper bound of the bucket that contains it
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float("inf")
+
+
+# Process-wide latency histograms, payload size histograms and counters with Prometheus text rendering
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(_label_key(labels))
+            if histogram is None:
+                histogram = series[_label_key(labels)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[_label_key(labels)] = series.get(_label_key(labels), 0) + amount
+
+    # Observes the duration of the block in the histogram <name>_seconds
+    @contextmanager
+    def timed(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name + "_seconds", time.perf_counter() - start, **labels)
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{METRICS_PREFIX}{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{METRICS_PREFIX}{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+                    lines.append(f"{METRICS_PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{METRICS_PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{METRICS_PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # Rows for the debug panel: one row per histogram series with count, mean and estimated p50/p95
+    def summary(self):
+        rows = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                for labels, histogram in sorted(series.items()):
+                    rows.append({
+                        "metric": name,
+                        "labels": ", ".join(f"{key}={value}" for key, value in labels),
+                        "count": histogram.count,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                    })
+        return rows
+
+    def counter_rows(self):
+        with self.lock:
+            return [{"metric": name, "labels": ", ".join(f"{key}={value}" for key, value in labels), "value": value}
+                    for name, series in sorted(self.counters.items()) for labels, value in sorted(series.items())]
+
+    def write_file(self, path):
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(temporary_path, path)
+
+
+# Serves the registry as Prometheus text on http://<address>:<port>/metrics
+def start_metrics_server(registry, port, address="0.0.0.0"):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Writes the registry to path every interval seconds, e.g. for the node exporter textfile collector
+def start_metrics_file_exporter(registry, path, interval=15):
+    stopped = threading.Event()
+
+    def export():
+        while not stopped.wait(interval):
+            registry.write_file(path)
+
+    threading.Thread(target=export, name="metrics-file-exporter", daemon=True).start()
+    return stopped
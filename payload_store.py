@@ -0,0 +1,69 @@
+import hashlib
+import json
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+
+
+# Reference to one stored payload, sessions keep these instead of the payload itself
+# The stored (and possibly compressed) bytes live as long as any session holds the reference
+class PayloadRef:
+    __slots__ = ("key", "digest", "data", "compressed", "size", "__weakref__")
+
+    def __init__(self, key, digest, data, compressed, size):
+        self.key = key
+        self.digest = digest
+        self.data = data
+        self.compressed = compressed
+        self.size = size
+
+    def __repr__(self):
+        return f"PayloadRef({self.key!r}, {self.digest[:12]}, {len(self.data)} of {self.size} bytes)"
+
+
+# Process-wide content-addressed store for explanation payloads: identical payloads of the same key (e.g. graphUri/component)
+# are stored once, payloads of at least compress_threshold bytes are compressed and an entry is reclaimed as soon as
+# no session refers to it anymore; the last max_decoded decoded payloads are kept, so reruns don't decode them again
+class PayloadStore:
+    def __init__(self, compress_threshold=16 * 1024, compress_level=1, max_decoded=8):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.max_decoded = max_decoded
+        self.refs = weakref.WeakValueDictionary()
+        self.decoded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, key, value):
+        data = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(key.encode("utf-8") + b"\0" + data).hexdigest()
+        with self.lock:
+            ref = self.refs.get(digest)
+            if ref is None:
+                compressed = len(data) >= self.compress_threshold
+                ref = PayloadRef(key, digest, zlib.compress(data, self.compress_level) if compressed else data, compressed, len(data))
+                self.refs[digest] = ref
+            return ref
+
+    # The decoded payload is shared by all sessions and must not be modified
+    def load(self, ref):
+        with self.lock:
+            value = self.decoded.get(ref.digest)
+            if value is not None:
+                self.decoded.move_to_end(ref.digest)
+                return value
+        value = json.loads(zlib.decompress(ref.data) if ref.compressed else ref.data)
+        with self.lock:
+            self.decoded[ref.digest] = value
+            while len(self.decoded) > self.max_decoded:
+                self.decoded.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self.refs)
+
+    # Number of entries, stored bytes and uncompressed bytes of all referenced payloads
+    def stats(self):
+        with self.lock:
+            refs = list(self.refs.values())
+        return {"entries": len(refs), "stored_bytes": sum(len(ref.data) for ref in refs), "payload_bytes": sum(ref.size for ref in refs)}
@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+# Cache and lock backend shared by all replicas of the app: values are strings stored with their creation time,
+# locks are held by a token and expire after their ttl, so a crashed replica doesn't block the others
+class SharedCache(ABC):
+    # (value, created_at) of an entry that hasn't expired, otherwise None
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    # Stores an entry until created_at + ttl
+    @abstractmethod
+    def set(self, key, value, created_at, ttl):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    # Takes the lock name for token if it is free or expired, returns whether it was taken
+    @abstractmethod
+    def acquire(self, name, token, ttl):
+        ...
+
+    # Frees the lock name if it is still held by token
+    @abstractmethod
+    def release(self, name, token):
+        ...
+
+    # Holds the lock name while the block runs, waits at most timeout seconds for it; yields whether it is held, so a caller
+    # can go on without it instead of waiting forever for a replica that is stuck
+    @contextmanager
+    def lock(self, name, ttl=60, timeout=60, poll_interval=0.1, sleep=time.sleep):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        acquired = self.acquire(name, token, ttl)
+        while not acquired and time.monotonic() < deadline:
+            sleep(poll_interval)
+            acquired = self.acquire(name, token, ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(name, token)
+
+    def close(self):
+        pass
+
+
+# Shared cache in an SQLite file, for replicas on one host or with a shared volume (local disks, not NFS)
+# WAL allows reads while another process writes; a lock is taken in an immediate transaction, so exactly one process gets it
+class SqliteSharedCache(SharedCache):
+    def __init__(self, path, clock=time.time, busy_timeout=10.0):
+        self.clock = clock
+        self.mutex = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self.prune()
+
+    def get(self, key):
+        with self.mutex:
+            row = self.db.execute("SELECT value, created_at FROM entries WHERE key = ? AND expires_at > ?", (key, self.clock())).fetchone()
+        return tuple(row) if row is not None else None
+
+    def set(self, key, value, created_at, ttl):
+        with self.mutex:
+            self.db.execute("INSERT OR REPLACE INTO entries (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)", (key, value, created_at, created_at + ttl))
+        self.prune()
+
+    def delete(self, key):
+        with self.mutex:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self.mutex:
+            self.db.execute("DELETE FROM entries")
+
+    def prune(self):
+        with self.mutex:
+            self.db.execute("DELETE FROM entries WHERE expires_at <= ?", (self.clock(),))
+
+    def acquire(self, name, token, ttl):
+        with self.mutex:
+            now = self.clock()
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+                acquired = self.db.execute("INSERT OR IGNORE INTO locks (name, token, expires_at) VALUES (?, ?, ?)", (name, token, now + ttl)).rowcount == 1
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return acquired
+
+    def release(self, name, token):
+        with self.mutex:
+            self.db.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+    def close(self):
+        with self.mutex:
+            self.db.close()
+
+
+# Shared cache on a Redis-compatible server (Redis, Valkey, KeyDB, ...) through a redis-py compatible client
+# Entries expire on the server, a lock is a key set with NX and released by a script that checks the token
+class RedisSharedCache(SharedCache):
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, client, prefix="qanary-explainability:", clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + "entry:" + key)
+        if raw is None:
+            return None
+        created_at, value = json.loads(raw)
+        return value, created_at
+
+    def set(self, key, value, created_at, ttl):
+        remaining = int((created_at + ttl - self.clock()) * 1000)
+        if remaining > 0:
+            self.client.set(self.prefix + "entry:" + key, json.dumps([created_at, value]), px=remaining)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + "entry:" + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "entry:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def acquire(self, name, token, ttl):
+        return bool(self.client.set(self.prefix + "lock:" + name, token, nx=True, px=max(1, int(ttl * 1000))))
+
+    def release(self, name, token):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.prefix + "lock:" + name, token)
+
+    def close(self):
+        self.client.close()
+
+
+# Creates the shared cache of a URL: sqlite:///path/to/file (relative: sqlite:///file) or redis://[:password@]host:port/db
+# (rediss:// for TLS), the redis package is only needed for the latter
+def create_shared_cache(url):
+    if url.startswith("sqlite:///"):
+        return SqliteSharedCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("A shared cache on Redis needs the redis package (pip install redis)") from e
+        return RedisSharedCache(redis.Redis.from_url(url, decode_responses=True))
+    raise ValueError(f"Unsupported shared cache URL: {url}")
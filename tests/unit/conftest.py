@@ -0,0 +1,16 @@
+"""Fixtures shared by the unit tests."""
+import pytest
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+# A clock for the time-dependent classes (clock=...), tests move it forward by changing clock.now
+@pytest.fixture
+def clock():
+    return FakeClock()
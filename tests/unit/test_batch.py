@@ -0,0 +1,86 @@
+"""Unit tests for batch.py — batch evaluation helpers."""
+import json
+import threading
+
+import batch
+
+
+def test_parse_questions_from_csv_with_question_column():
+    content = "id,Question\n1,When was Albert Einstein born?\n2, What is the birth date of Jesus Christ? \n3,\n".encode("utf-8-sig")
+    assert batch.parse_questions("questions.csv", content) == [
+        "When was Albert Einstein born?",
+        "What is the birth date of Jesus Christ?",
+    ]
+
+
+def test_parse_questions_from_csv_without_header_uses_first_column():
+    assert batch.parse_questions("q.csv", b"When was Albert Einstein born?,x\nWho is Ada?\n") == [
+        "When was Albert Einstein born?",
+        "Who is Ada?",
+    ]
+
+
+def test_parse_questions_from_jsonl():
+    content = "\n".join([json.dumps({"question": "When was Albert Einstein born?"}), "", json.dumps("Who is Ada?")])
+    assert batch.parse_questions("q.jsonl", content.encode()) == ["When was Albert Einstein born?", "Who is Ada?"]
+
+
+def test_explanation_rows_flatten_components():
+    explanation = {"rulebased": "t", "generative": "g", "dataset": "d", "prompt": "p"}
+    explanations = {
+        "components": {"NED": {"input_data": explanation, "output_data": explanation}, "QB": {"input_data": explanation, "output_data": explanation}},
+        "meta_information": {"graphUri": "urn:graph", "questionUri": "urn:question"},
+    }
+    rows = batch.explanation_rows("q", "GPT-4, 1-shot", "GPT_4", 1, explanations)
+    assert [row["component"] for row in rows] == ["NED", "QB"]
+    assert rows[0]["graph"] == "urn:graph"
+    assert rows[0]["input_data_generative"] == "g"
+    assert rows[0]["output_data_prompt"] == "p"
+    assert rows[0]["error"] == ""
+
+
+def test_run_batch_reports_results_and_errors_with_bounded_concurrency():
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+    results = {}
+
+    def run(question):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            if question == "bad":
+                raise ValueError("pipeline down")
+            return question.upper()
+        finally:
+            with lock:
+                running[0] -= 1
+
+    def on_result(question, result, error):
+        results[question] = (result, str(error) if error else None)
+
+    batch.run_batch(["a", "b", "bad", "c"], run, max_workers=2, on_result=on_result)
+    assert results == {"a": ("A", None), "b": ("B", None), "c": ("C", None), "bad": (None, "pipeline down")}
+    assert peak[0] <= 2
+
+
+def test_run_batch_skips_questions_once_stopped():
+    started = []
+    finished = []
+    batch.run_batch(["a", "b", "c"], lambda question: started.append(question), max_workers=1, stop=lambda: len(started) >= 1,
+                    on_result=lambda question, result, error: finished.append(question))
+    assert started == ["a"]
+    assert finished == ["a"]
+
+
+def test_rows_export_to_csv_and_parquet():
+    import io
+
+    import pandas as pd
+
+    rows = [{"question": "q", "component": "NED", "error": ""}, {"question": "q", "gpt_model": "GPT-4", "error": "down"}]
+    csv = batch.rows_to_csv(rows)
+    assert csv.splitlines()[0] == "question,component,error,gpt_model"
+    frame = pd.read_parquet(io.BytesIO(batch.rows_to_parquet(rows)))
+    assert list(frame["error"]) == ["", "down"]
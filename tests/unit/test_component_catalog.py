@@ -0,0 +1,81 @@
+"""Unit tests for component_catalog.py — conditional refreshes, keeping the last good list and the background refresh."""
+import json
+import time
+
+import pytest
+import requests
+
+from component_catalog import ComponentCatalog
+
+
+def _response(status_code, components=None, etag=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(components).encode("utf-8") if components is not None else b""
+    if etag:
+        response.headers["ETag"] = etag
+    return response
+
+
+class _Pipeline:
+    def __init__(self, components):
+        self.components = components
+        self.requests = []
+        self.error = None
+
+    def fetch(self, headers):
+        self.requests.append(headers)
+        if self.error is not None:
+            raise self.error
+        etag = f'"{len(self.components)}"'
+        if headers.get("If-None-Match") == etag:
+            return _response(304)
+        return _response(200, self.components, etag)
+
+
+def test_catalog_keeps_metadata_and_sends_conditional_requests():
+    pipeline = _Pipeline([{"name": "NED", "url": "http://ned"}, {"name": "QB"}])
+    results = []
+    catalog = ComponentCatalog(pipeline.fetch, refresh_interval=0, on_refresh=results.append)
+    assert catalog.names() == ["NED", "QB"]
+    assert catalog.components()[0]["url"] == "http://ned"
+    assert not catalog.refresh()
+    assert pipeline.requests == [{}, {"If-None-Match": '"2"'}]
+    pipeline.components = pipeline.components + [{"name": "QE"}]
+    assert catalog.refresh()
+    assert catalog.names() == ["NED", "QB", "QE"]
+    assert results == ["modified", "not_modified", "modified"]
+
+
+def test_catalog_keeps_the_last_good_list_while_the_pipeline_is_unreachable():
+    pipeline = _Pipeline([{"name": "NED"}])
+    catalog = ComponentCatalog(pipeline.fetch, refresh_interval=0)
+    catalog.components()
+    pipeline.error = requests.ConnectionError("unreachable")
+    assert not catalog.refresh()
+    assert catalog.names() == ["NED"]
+    assert "unreachable" in catalog.status()["last_error"]
+
+
+def test_first_fetch_error_is_raised_and_retried():
+    pipeline = _Pipeline([{"name": "NED"}])
+    pipeline.error = requests.ConnectionError("unreachable")
+    catalog = ComponentCatalog(pipeline.fetch, refresh_interval=0)
+    with pytest.raises(requests.ConnectionError):
+        catalog.components()
+    pipeline.error = None
+    assert catalog.names() == ["NED"]
+
+
+def test_catalog_refreshes_in_the_background():
+    pipeline = _Pipeline([{"name": "NED"}])
+    catalog = ComponentCatalog(pipeline.fetch, refresh_interval=0.01).start()
+    try:
+        catalog.components()
+        pipeline.components = [{"name": "NED"}, {"name": "QB"}]
+        deadline = time.monotonic() + 5
+        while catalog.names() != ["NED", "QB"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        catalog.stop()
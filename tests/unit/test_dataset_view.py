@@ -0,0 +1,57 @@
+"""Unit tests for dataset_view.py — paging, size-bounded windows, triple rows and the download streams."""
+import gzip
+import json
+
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+import dataset_view
+
+LINES = [f"<urn:s:{i}> <http://www.w3.org/ns/oa#hasTarget> \"annotation {i}\" ." for i in range(25)]
+
+
+def test_pages_cover_all_lines():
+    assert dataset_view.page_count(0, 10) == 1
+    assert dataset_view.page_count(25, 10) == 3
+    window, start, end = dataset_view.dataset_window(LINES, 3, 10, 64 * 1024)
+    assert (start, end) == (20, 25) and window == LINES[20:]
+
+
+def test_window_is_bounded_by_bytes_but_keeps_one_line():
+    window, start, end = dataset_view.dataset_window(LINES, 1, 10, 2 * len(LINES[0]) + 2)
+    assert window == LINES[:2] and (start, end) == (0, 2)
+    window, _, end = dataset_view.dataset_window(["x" * 100], 1, 10, 10)
+    assert window == ["x" * 10 + " …"] and end == 1
+
+
+def test_parse_triples_skips_lines_that_are_no_statement():
+    rows = dataset_view.parse_triples(["@prefix oa: <http://www.w3.org/ns/oa#> .", LINES[0], "_:b0 a <urn:Class> ."])
+    assert rows == [
+        {"subject": "<urn:s:0>", "predicate": "<http://www.w3.org/ns/oa#hasTarget>", "object": "\"annotation 0\""},
+        {"subject": "_:b0", "predicate": "a", "object": "<urn:Class>"},
+    ]
+
+
+def test_deferred_dataset_is_a_valid_download():
+    text = "\n".join(LINES) + " ä"
+    loads = []
+
+    def load(ref):
+        loads.append(ref)
+        return {"input_data": {"dataset": text}}
+
+    data = dataset_view.deferred_dataset(load, "ref", "input_data", "dataset")
+    assert loads == []
+    assert convert_data_to_bytes_and_infer_mime(data(), ValueError()) == (text.encode("utf-8"), "text/plain")
+    assert loads == ["ref"]
+
+
+def test_gzip_jsonl_bundle_is_a_valid_download():
+    records = [{"component": f"C{i}", "dataset": LINES} for i in range(100)]
+    data, mime = convert_data_to_bytes_and_infer_mime(dataset_view.gzip_jsonl(iter(records)), ValueError())
+    assert mime == "application/octet-stream"
+    assert [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines()] == records
+
+
+def test_dataset_file_name_uses_the_language_extension():
+    assert dataset_view.dataset_file_name("NED", "inputdataset", "sparql") == "NED-inputdataset.rq"
+    assert dataset_view.dataset_file_name("NED", "outputdataset", "turtle") == "NED-outputdataset.ttl"
@@ -0,0 +1,280 @@
+"""Unit tests for explanation_backend.py — the explanation workflow with stubbed backends and caches."""
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+BACKEND_ENV = {
+    "QANARY_PIPELINE_URL": "http://qanary",
+    "QANARY_EXPLANATION_SERVICE_URL": "http://explanations",
+    "QANARY_PIPELINE_COMPONENTS": "http://qanary/components",
+    "GITHUB_REPO": "https://github.com/WSE-research/qanary-explainability-frontend",
+    "FEEDBACK_URL": "mongodb://localhost:27017",
+    "MONGO_USER": "test",
+    "MONGO_PASSWORD": "test",
+    "MONGO_AUTHSOURCE": "admin",
+}
+for name, value in BACKEND_ENV.items():
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+
+import explanation_backend as backend  # noqa: E402
+from explanation_cache import ExplanationCache  # noqa: E402
+from jobs import CANCELLED, DONE, FAILED, Job, JobManager, SingleFlight  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+from payload_store import PayloadStore  # noqa: E402
+from shared_cache import SqliteSharedCache  # noqa: E402
+
+COMPONENTS = ["NED", "QB"]
+GPT_MODELS = list(backend.gptModels)
+
+
+def _component_explanation(component, generative="generative"):
+    return {datatype: {"rulebased": f"{component} template", "generative": generative, "dataset": "dataset", "prompt": "prompt"}
+            for datatype in ["input_data", "output_data"]}
+
+
+def _explanation(components=COMPONENTS, graph="urn:graph"):
+    return {"components": {component: _component_explanation(component) for component in components},
+            "meta_information": {"graphUri": graph, "questionUri": "urn:question"}}
+
+
+def _templates(components):
+    return {component: _component_explanation(component, generative=None) for component in components}
+
+
+# The shared resources of a process, shared=True puts the caches on a shared SQLite cache like with SHARED_CACHE_URL
+@pytest.fixture
+def resources(monkeypatch, tmp_path, clock):
+    def create(shared=False):
+        shared_cache = SqliteSharedCache(str(tmp_path / "shared.sqlite"), clock=clock) if shared else None
+        created = {
+            "shared": shared_cache,
+            "explanations": ExplanationCache(ttl=60, clock=clock, shared=shared_cache),
+            "pipeline": ExplanationCache(ttl=60, clock=clock, shared=shared_cache),
+            "metrics": MetricsRegistry(),
+            "clock": clock,
+        }
+        monkeypatch.setattr(backend, "get_shared_cache", lambda: shared_cache)
+        monkeypatch.setattr(backend, "get_explanation_cache", lambda: created["explanations"])
+        monkeypatch.setattr(backend, "get_pipeline_cache", lambda: created["pipeline"])
+        monkeypatch.setattr(backend, "get_single_flight", lambda single_flight=SingleFlight(): single_flight)
+        monkeypatch.setattr(backend, "get_metrics", lambda: created["metrics"])
+        return created
+    return create
+
+
+# Stubs of the Qanary pipeline and the explanation service, the graph of a question is urn:graph:<question>
+# A question, component or GPT model in failing makes its requests fail
+@pytest.fixture
+def backends(monkeypatch):
+    stubs = SimpleNamespace(pipeline=[], explanations=[], failing=set())
+
+    def execute_qanary_pipeline(question, components):
+        stubs.pipeline.append(question)
+        if question in stubs.failing:
+            raise RuntimeError(f"pipeline failed for {question}")
+        return {"outGraph": f"urn:graph:{question}", "question": f"urn:question:{question}"}
+
+    def fetch_explanations(graph, components, gptModel, job=None):
+        stubs.explanations.append((graph, gptModel))
+        failed = stubs.failing & {gptModel, *components}
+        if failed:
+            raise RuntimeError(f"explanations failed for {', '.join(sorted(failed))}")
+        return {component: _component_explanation(component) for component in components}
+
+    monkeypatch.setattr(backend, "execute_qanary_pipeline", execute_qanary_pipeline)
+    monkeypatch.setattr(backend, "fetch_explanations", fetch_explanations)
+    monkeypatch.setattr(backend, "fetch_template_explanations", lambda graph, components: _templates(components))
+    return stubs
+
+
+def test_compute_once_takes_over_a_cached_entry_but_not_when_refreshing(resources):
+    created = resources(shared=True)
+    cache, clock = created["explanations"], created["clock"]
+    cache.put("key", "old")
+    clock.now += 55
+    computed = []
+
+    def compute():
+        computed.append(True)
+        cache.put("key", "new")
+        return "new"
+
+    assert backend.compute_once(cache, "key", compute) == ("old", True)
+    assert computed == []
+    assert backend.compute_once(cache, "key", compute, refresh=True) == ("new", False)
+    assert computed == [True]
+    assert cache.ttl_remaining("key") == 60
+
+
+def test_cancelled_batch_job_ends_as_cancelled(monkeypatch):
+    manager = JobManager(max_workers=1)
+    submitted = threading.Event()
+    jobs = []
+    asked = []
+
+    def explanations_for_models(question, components, models):
+        submitted.wait(5)
+        asked.append(question)
+        manager.cancel(jobs[0].id)
+        return {models[0]: _explanation()}, {}
+
+    monkeypatch.setattr(backend, "BATCH_WORKERS", 1)
+    monkeypatch.setattr(backend, "explanations_for_models", explanations_for_models)
+    jobs.append(manager.submit("batch", [backend.BATCH_STAGE], lambda job: backend.run_batch_job(job, ["q1", "q2", "q3"], COMPONENTS, GPT_MODELS[:1])))
+    submitted.set()
+    jobs[0].future.result(5)
+    assert jobs[0].state == CANCELLED and jobs[0].error is None
+    assert asked == ["q1"]
+    assert {item["question"] for item in jobs[0].items_snapshot()} == {"q1"}
+    manager.shutdown()
+
+
+def test_failed_components_keep_their_template_based_explanations(resources, backends):
+    resources()
+    backends.failing.add("QB")
+    job = Job("1", "question", [backend.PIPELINE_STAGE, backend.TEMPLATE_STAGE] + COMPONENTS)
+    explanation, errors = backend.fetch_explanations_by_component("question", COMPONENTS, GPT_MODELS[0], job)
+    assert list(errors) == ["QB"]
+    assert explanation["components"] == {"NED": _component_explanation("NED"), "QB": _templates(["QB"])["QB"]}
+    assert explanation["components"] == job.partial_snapshot()["components"]
+    assert job.stages["QB"] == FAILED and job.partial_snapshot()["failed"] == ["QB"]
+
+
+def test_pipeline_runs_are_cached_but_failures_are_not(resources, backends):
+    resources()
+    job = Job("1", "question", [backend.PIPELINE_STAGE])
+    for _ in range(2):
+        assert backend.run_pipeline("q1", COMPONENTS, job)["outGraph"] == "urn:graph:q1"
+    assert backends.pipeline == ["q1"] and job.stages[backend.PIPELINE_STAGE] == DONE
+    backends.failing.add("q2")
+    job = Job("2", "question", [backend.PIPELINE_STAGE])
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            backend.run_pipeline("q2", COMPONENTS, job)
+    assert backends.pipeline == ["q1", "q2", "q2"] and job.stages[backend.PIPELINE_STAGE] == FAILED
+
+
+def test_explanations_for_models_are_fetched_once_per_model(resources, backends):
+    resources()
+    backends.failing.add(GPT_MODELS[1])
+    explanations, errors = backend.fetch_explanations_for_models("q1", COMPONENTS, GPT_MODELS[:2])
+    assert list(explanations) == [GPT_MODELS[0]] and list(errors) == [GPT_MODELS[1]]
+    assert explanations[GPT_MODELS[0]]["components"] == _explanation()["components"]
+    assert explanations[GPT_MODELS[0]]["meta_information"] == {"graphUri": "urn:graph:q1", "questionUri": "urn:question:q1"}
+    assert backends.pipeline == ["q1"] and len(backends.explanations) == 2
+
+    backends.failing.clear()
+    explanations, errors = backend.fetch_explanations_for_models("q1", COMPONENTS, GPT_MODELS[:2])
+    assert list(explanations) == GPT_MODELS[:2] and errors == {}
+    assert backends.pipeline == ["q1"] and [model for _, model in backends.explanations[2:]] == [GPT_MODELS[1]]
+
+    backend.fetch_explanations_for_models("q1", COMPONENTS, GPT_MODELS[:1], refresh=True)
+    assert len(backends.explanations) == 4
+
+
+def test_a_failed_refresh_keeps_the_cached_explanation(resources, backends):
+    created = resources(shared=True)
+    explanations, _ = backend.fetch_explanations_for_models("q1", COMPONENTS, GPT_MODELS[:1])
+    created["clock"].now += 50
+    backends.failing.add(GPT_MODELS[0])
+    _, errors = backend.fetch_explanations_for_models("q1", COMPONENTS, GPT_MODELS[:1], refresh=True)
+    assert list(errors) == GPT_MODELS[:1]
+    model, shots = backend.gptModels_dic[GPT_MODELS[0]][backend.MODEL_KEY], backend.gptModels_dic[GPT_MODELS[0]][backend.SHOTS_KEY]
+    assert created["explanations"].get(backend.explanation_cache_key("q1", COMPONENTS, model, shots)) == explanations[GPT_MODELS[0]]
+    assert created["shared"].get(backend.explanation_cache_key("q1", COMPONENTS, model, shots)) is not None
+
+
+def test_explanations_by_component_are_cached_as_a_run(resources, backends):
+    resources()
+    stages = [backend.PIPELINE_STAGE, backend.TEMPLATE_STAGE] + COMPONENTS
+    explanation, errors = backend.fetch_explanations_by_component("q1", COMPONENTS, GPT_MODELS[0], Job("1", "q1", stages))
+    assert errors == {} and list(explanation["components"]) == COMPONENTS
+    model, shots = backend.gptModels_dic[GPT_MODELS[0]][backend.MODEL_KEY], backend.gptModels_dic[GPT_MODELS[0]][backend.SHOTS_KEY]
+    assert backend.load_run("urn:graph:q1", COMPONENTS, model, shots) == ("q1", explanation)
+
+    job = Job("2", "q1", stages)
+    assert backend.fetch_explanations_by_component("q1", COMPONENTS, GPT_MODELS[0], job) == (explanation, {})
+    assert len(backends.explanations) == len(COMPONENTS) and backends.pipeline == ["q1"]
+    assert {state for _, state in job.stage_progress()} == {DONE}
+
+
+def test_a_run_is_only_loaded_while_it_is_the_cached_run_of_its_question(resources):
+    resources()
+    explanation = _explanation()
+    backend.cache_run("question", COMPONENTS, "GPT_4", 1, explanation)
+    assert backend.load_run("urn:graph", COMPONENTS, "GPT_4", 1) == ("question", explanation)
+    assert backend.load_run("urn:graph", COMPONENTS, "GPT_4", 0) is None
+    assert backend.load_run("urn:graph", COMPONENTS[:1], "GPT_4", 1) is None
+    backend.cache_run("question", COMPONENTS, "GPT_4", 1, _explanation(graph="urn:graph:2"))
+    assert backend.load_run("urn:graph", COMPONENTS, "GPT_4", 1) is None
+    assert backend.load_run("urn:graph:2", COMPONENTS, "GPT_4", 1)[0] == "question"
+
+
+def test_stored_explanations_keep_the_references_of_unchanged_components(monkeypatch):
+    monkeypatch.setattr(backend, "get_payload_store", lambda store=PayloadStore(): store)
+    meta_information = {"graphUri": "urn:graph", "questionUri": "urn:question"}
+    templates = backend.store_explanations({"components": _templates(COMPONENTS), "meta_information": meta_information})
+    assert templates["generated"] == [] and templates["meta_information"] == meta_information
+    partial = {"components": {"NED": _component_explanation("NED"), "QB": _templates(["QB"])["QB"]}, "meta_information": meta_information}
+    stored = backend.store_explanations(partial, templates)
+    assert stored["generated"] == ["NED"]
+    assert stored["components"]["QB"] is templates["components"]["QB"]
+    assert stored["components"]["NED"] is not templates["components"]["NED"]
+    assert backend.load_explanation(stored["components"]["NED"]) == _component_explanation("NED")
+    other = backend.store_explanations({**partial, "meta_information": {**meta_information, "graphUri": "urn:graph:2"}}, stored)
+    assert other["components"]["QB"] is not stored["components"]["QB"]
+    assert stored["failed"] == [] and backend.store_explanations(partial, stored, failed=["NED", "QB"])["failed"] == ["QB"]
+
+
+def test_batch_job_adds_rows_of_explanations_and_failed_models(resources, backends, monkeypatch):
+    resources()
+    monkeypatch.setattr(backend, "BATCH_WORKERS", 2)
+    backends.failing.update({"q2", GPT_MODELS[1]})
+    job = Job("1", "batch", [backend.BATCH_STAGE])
+    rows = backend.run_batch_job(job, ["q1", "q2"], COMPONENTS, GPT_MODELS[:2])
+    assert job.total == 2 and job.completed == 2 and job.stages[backend.BATCH_STAGE] == DONE
+    q1 = [row for row in rows if row["question"] == "q1"]
+    assert [(row["gpt_model"], row.get("component"), bool(row["error"])) for row in q1] == [
+        (GPT_MODELS[0], "NED", False), (GPT_MODELS[0], "QB", False), (GPT_MODELS[1], None, True)]
+    assert [(row["gpt_model"], "pipeline failed" in row["error"]) for row in rows if row["question"] == "q2"] == [
+        (GPT_MODELS[0], True), (GPT_MODELS[1], True)]
+
+
+def test_warmup_refreshes_entries_that_expire_within_the_margin(resources, backends, monkeypatch):
+    created = resources(shared=True)
+    clock, cache = created["clock"], created["explanations"]
+    monkeypatch.setattr(backend, "explanation_configurations_dict", {"Configuration": {"components": COMPONENTS, "exampleQuestions": ["q1", "q2"]}})
+    monkeypatch.setattr(backend, "WARMUP_WORKERS", 1)
+    model, shots = backend.gptModels_dic[GPT_MODELS[0]][backend.MODEL_KEY], backend.gptModels_dic[GPT_MODELS[0]][backend.SHOTS_KEY]
+    backend.cache_run("q2", COMPONENTS, model, shots, _explanation(graph="urn:graph:q2"))
+    clock.now += 55
+    backend.cache_run("q1", COMPONENTS, model, shots, _explanation(graph="urn:graph:q1"))
+    backends.failing.add(GPT_MODELS[1])
+
+    job = Job("1", "warm-up", [backend.WARMUP_STAGE])
+    items = backend.run_warmup_job(job, ["Configuration"], GPT_MODELS[:2], refresh_margin=10)
+    assert [(item["question"], item["fetched"], item["fresh"], item["failed"]) for item in items] == [
+        ("q1", 0, 1, GPT_MODELS[1]), ("q2", 1, 0, GPT_MODELS[1])]
+    # the entry of q2 with 5 s left is fetched again, although it is still cached in the shared cache
+    assert sorted(backends.explanations) == [("urn:graph:q1", GPT_MODELS[1]), ("urn:graph:q2", GPT_MODELS[0]), ("urn:graph:q2", GPT_MODELS[1])]
+    assert cache.ttl_remaining(backend.explanation_cache_key("q2", COMPONENTS, model, shots)) == 60
+    assert job.stages[backend.WARMUP_STAGE] == FAILED
+
+
+def test_template_explanations_are_requested_for_the_passed_components(resources, monkeypatch):
+    resources()
+    requests = []
+
+    def explanation_service(json_data):
+        requests.append(json.loads(json_data))
+        return json.dumps({"explanationItems": {component: {"dataset": "dataset", "templatebased": f"{component} template", "prompt": "prompt"}
+                                                for component in COMPONENTS + ["QE"]}})
+
+    monkeypatch.setattr(backend, "input_data_explanation", explanation_service)
+    monkeypatch.setattr(backend, "output_data_explanation", explanation_service)
+    templates = backend.fetch_template_explanations("urn:graph", COMPONENTS)
+    assert requests == [{"graphUri": "urn:graph", "qanaryComponents": COMPONENTS}] * 2
+    assert list(templates) == COMPONENTS and templates["NED"]["input_data"]["generative"] is None
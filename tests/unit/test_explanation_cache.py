@@ -0,0 +1,92 @@
+"""Unit tests for explanation_cache.py — bounded, persistent explanation cache."""
+import explanation_cache
+
+
+def _key(question):
+    return explanation_cache.explanation_cache_key(question, ["NED", "QB"], "GPT_4", 1)
+
+
+def test_cache_key_depends_on_component_order_model_and_shots():
+    key = explanation_cache.explanation_cache_key("q", ["NED", "QB"], "GPT_4", 1)
+    assert key == explanation_cache.explanation_cache_key("q", ("NED", "QB"), "GPT_4", 1)
+    assert key != explanation_cache.explanation_cache_key("q", ["QB", "NED"], "GPT_4", 1)
+    assert key != explanation_cache.explanation_cache_key("q", ["NED", "QB"], "GPT_3_5", 1)
+    assert key != explanation_cache.explanation_cache_key("q", ["NED", "QB"], "GPT_4", 0)
+    assert key != explanation_cache.explanation_cache_key("q", ["NED", "QB"], "GPT_4", 1, component="NED")
+    assert explanation_cache.explanation_cache_key("q", ["NED", "QB"], "GPT_4", 1, component="NED") != explanation_cache.explanation_cache_key("q", ["NED"], "GPT_4", 1, component="NED")
+
+
+def test_cache_returns_copies_and_counts_hits_and_misses():
+    cache = explanation_cache.ExplanationCache()
+    assert cache.get(_key("a")) is None
+    cache.put(_key("a"), {"components": {"NED": {}}})
+    value = cache.get(_key("a"))
+    value["components"].clear()
+    assert cache.get(_key("a")) == {"components": {"NED": {}}}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = explanation_cache.ExplanationCache(max_entries=2)
+    cache.put(_key("a"), 1)
+    cache.put(_key("b"), 2)
+    cache.get(_key("a"))
+    cache.put(_key("c"), 3)
+    assert cache.get(_key("b")) is None
+    assert cache.get(_key("a")) == 1
+    assert cache.get(_key("c")) == 3
+
+
+def test_cache_respects_memory_cap():
+    cache = explanation_cache.ExplanationCache(max_bytes=20)
+    cache.put(_key("a"), "x" * 10)
+    cache.put(_key("b"), "y" * 10)
+    assert len(cache) == 1
+    assert cache.size <= 20
+    cache.put(_key("c"), "z" * 100)
+    assert cache.get(_key("c")) is None
+    assert cache.get(_key("b")) == "y" * 10
+
+
+def test_cache_expires_entries_after_ttl(clock):
+    cache = explanation_cache.ExplanationCache(ttl=60, clock=clock)
+    cache.put(_key("a"), 1)
+    clock.now += 61
+    assert cache.get(_key("a")) is None
+    assert len(cache) == 0
+
+
+def test_cache_reports_remaining_ttl_without_counting_a_lookup(clock):
+    cache = explanation_cache.ExplanationCache(ttl=60, clock=clock)
+    assert cache.ttl_remaining(_key("a")) is None
+    cache.put(_key("a"), 1)
+    clock.now += 45
+    assert cache.ttl_remaining(_key("a")) == 15
+    clock.now += 16
+    assert cache.ttl_remaining(_key("a")) is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_cache_invalidates_single_key():
+    cache = explanation_cache.ExplanationCache()
+    cache.put(_key("a"), 1)
+    cache.put(_key("b"), 2)
+    cache.invalidate(_key("a"))
+    assert cache.get(_key("a")) is None
+    assert cache.get(_key("b")) == 2
+
+
+def test_cache_persists_entries_across_instances(tmp_path, clock):
+    path = str(tmp_path / "explanations.sqlite")
+    cache = explanation_cache.ExplanationCache(path=path, ttl=60, clock=clock)
+    cache.put(_key("a"), {"graphUri": "urn:graph"})
+    cache.put(_key("b"), 2)
+    cache.invalidate(_key("b"))
+
+    restarted = explanation_cache.ExplanationCache(path=path, ttl=60, clock=clock)
+    assert restarted.get(_key("a")) == {"graphUri": "urn:graph"}
+    assert restarted.get(_key("b")) is None
+
+    clock.now += 61
+    expired = explanation_cache.ExplanationCache(path=path, ttl=60, clock=clock)
+    assert expired.get(_key("a")) is None
@@ -0,0 +1,143 @@
+"""Unit tests for feedback.py — batched background feedback writer."""
+import json
+import time
+
+from pymongo.errors import BulkWriteError
+
+import feedback
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.batches = []
+        self.available = True
+
+    def insert_many(self, documents, ordered=True):
+        if not self.available:
+            raise ConnectionError("mongo down")
+        self.batches.append(len(documents))
+        errors = []
+        for index, document in enumerate(documents):
+            if document["_id"] in self.documents:
+                errors.append({"index": index, "code": feedback.DUPLICATE_KEY_ERROR})
+            else:
+                self.documents[document["_id"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _document(i):
+    return {"graph": "urn:graph", "component": "NED", "feedback": i % 2}
+
+
+def test_writer_inserts_documents_in_batches():
+    collection = _FakeCollection()
+    writer = feedback.FeedbackWriter(collection, batch_size=10, flush_interval=0.2)
+    for i in range(25):
+        assert writer.submit(_document(i))
+    assert _wait_for(lambda: len(collection.documents) == 25)
+    writer.close()
+    assert max(collection.batches) <= 10
+    assert len(collection.batches) < 25
+
+
+def test_close_flushes_buffered_documents():
+    collection = _FakeCollection()
+    writer = feedback.FeedbackWriter(collection, batch_size=100, flush_interval=60)
+    for i in range(5):
+        writer.submit(_document(i))
+    writer.close()
+    assert len(collection.documents) == 5
+
+
+def test_unavailable_mongo_spools_and_replays(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    collection = _FakeCollection()
+    collection.available = False
+    writer = feedback.FeedbackWriter(collection, batch_size=10, flush_interval=0.05, spool_path=str(spool), retry_interval=0.2)
+    for i in range(3):
+        writer.submit(_document(i))
+    # the documents may be spooled in more than one batch
+    assert _wait_for(lambda: spool.exists() and len(spool.read_text().splitlines()) == 3)
+    assert [json.loads(line)["feedback"] for line in spool.read_text().splitlines()] == [0, 1, 0]
+
+    collection.available = True
+    assert _wait_for(lambda: len(collection.documents) == 3)
+    assert _wait_for(lambda: not spool.exists())
+    writer.close()
+
+
+def test_full_buffer_applies_backpressure_by_spooling(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    collection = _FakeCollection()
+    writer = feedback.FeedbackWriter(collection, max_buffer=1, flush_interval=60, spool_path=str(spool), enqueue_timeout=0)
+    writer.stopped.set()
+    writer.thread.join()
+    assert writer.submit(_document(1))
+    assert writer.submit(_document(2))
+    assert writer.pending() == 1
+    assert len(spool.read_text().splitlines()) == 1
+
+
+def test_full_buffer_without_spool_reports_failure():
+    writer = feedback.FeedbackWriter(_FakeCollection(), max_buffer=1, enqueue_timeout=0)
+    writer.stopped.set()
+    writer.thread.join()
+    assert writer.submit(_document(1))
+    assert not writer.submit(_document(2))
+
+
+def test_retried_documents_are_not_duplicated():
+    collection = _FakeCollection()
+    writer = feedback.FeedbackWriter(collection, flush_interval=60)
+    writer.stopped.set()
+    writer.thread.join()
+    batch = [{**_document(1), "_id": "a"}, {**_document(2), "_id": "b"}]
+    assert writer._write(batch[:1])
+    assert writer._write(batch)
+    assert sorted(collection.documents) == ["a", "b"]
+
+
+def test_only_inserted_documents_are_handed_on():
+    collection = _FakeCollection()
+    written = []
+
+    def fail_once(documents):
+        written.append([document["_id"] for document in documents])
+        if len(written) == 1:
+            raise RuntimeError("summary unavailable")
+
+    writer = feedback.FeedbackWriter(collection, flush_interval=60, on_documents_written=fail_once)
+    writer.stopped.set()
+    writer.thread.join()
+    batch = [{**_document(1), "_id": "a"}, {**_document(2), "_id": "b"}]
+    assert writer._write(batch[:1])
+    assert writer._write(batch)
+    assert written == [["a"], ["b"]]
+
+
+def test_documents_are_written_with_the_time_of_the_insert(tmp_path):
+    collection = _FakeCollection()
+    collection.available = False
+    spool = tmp_path / "spool.jsonl"
+    writer = feedback.FeedbackWriter(collection, flush_interval=60, spool_path=str(spool), retry_interval=0)
+    writer.stopped.set()
+    writer.thread.join()
+    assert writer.submit(_document(1))
+    assert not writer._write(writer._drain())
+    assert "written_at" not in json.loads(spool.read_text())
+    collection.available = True
+    replayed_at = time.time()
+    writer._replay_spool()
+    (document,) = collection.documents.values()
+    assert document["written_at"] >= replayed_at
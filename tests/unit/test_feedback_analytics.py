@@ -0,0 +1,175 @@
+"""Unit tests for feedback_analytics.py — incremental summary, backfill and approval rates."""
+import datetime
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from feedback_analytics import SUMMARY_KEY, FeedbackAnalytics, feedback_day
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$lt" in condition and not (field in document and document[field] < condition["$lt"]):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class _SummaryCollection:
+    name = "feedback_summary"
+
+    def __init__(self):
+        self.documents = []
+        self.indexes = []
+        self.queries = []
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def insert_one(self, document):
+        if any(existing.get("_id") == document["_id"] for existing in self.documents):
+            raise DuplicateKeyError("duplicate _id")
+        self.documents.append(dict(document))
+
+    def find_one(self, query):
+        return next((dict(document) for document in self.documents if _matches(document, query)), None)
+
+    def update_one(self, query, update):
+        document = next((document for document in self.documents if _matches(document, query)), None)
+        if document is not None:
+            document.update(update["$set"])
+        return SimpleNamespace(modified_count=int(document is not None))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            document = next((document for document in self.documents if _matches(document, operation._filter)), None)
+            if document is None:
+                document = {**operation._filter, "total": 0, "good": 0}
+                self.documents.append(document)
+            for field, amount in operation._doc["$inc"].items():
+                document[field] += amount
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        since = query["day"].get("$gte", "")
+        return [dict(document) for document in self.documents if "day" in document and document["day"] >= since]
+
+
+class _FeedbackCollection(_SummaryCollection):
+    name = "explanation"
+
+    def __init__(self, count=0, failures=0):
+        super().__init__()
+        self.count = count
+        self.failures = failures
+        self.pipelines = []
+
+    def create_index(self, keys, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("MongoDB is unavailable")
+        super().create_index(keys, **kwargs)
+
+    def estimated_document_count(self):
+        return self.count
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+
+
+def _feedback(day, component, explanation_type, feedback, written_at=2000.0):
+    return {"_id": ObjectId.from_datetime(datetime.datetime(2024, 5, day, 12, tzinfo=datetime.timezone.utc)), "component": component,
+            "explanation_type": explanation_type, "datatype": "input", "gpt_model": "GPT_4", "shots": 1, "feedback": feedback, "written_at": written_at}
+
+
+def _summary_rows(summary):
+    return sorted((document["day"], document["explanation_type"], document["total"], document["good"]) for document in summary.documents if "day" in document)
+
+
+def test_written_feedback_is_counted_per_day_and_combination():
+    summary = _SummaryCollection()
+    summary.insert_one({"_id": "backfill", "until": 1000.0, "state": "done"})
+    analytics = FeedbackAnalytics(_FeedbackCollection(), summary)
+    analytics.record([_feedback(1, "NED", "template", 1), _feedback(1, "NED", "template", 0), _feedback(2, "NED", "generative", 1)])
+    analytics.record([_feedback(1, "NED", "template", 1)])
+    assert feedback_day(_feedback(2, "NED", "template", 1)) == "2024-05-02"
+    assert _summary_rows(summary) == [("2024-05-01", "template", 3, 2), ("2024-05-02", "generative", 1, 1)]
+
+
+def test_approval_rates_are_grouped_and_read_from_the_summary_only():
+    feedback, summary = _FeedbackCollection(), _SummaryCollection()
+    summary.insert_one({"_id": "backfill", "until": 1000.0, "state": "done"})
+    analytics = FeedbackAnalytics(feedback, summary)
+    analytics.record([_feedback(1, "NED", "template", 1), _feedback(2, "NED", "template", 0), _feedback(2, "QB", "generative", 1)])
+    summary.documents.append({"day": "2024-04-30", "component": "QB", "explanation_type": "generative", "backfill_total": 3, "backfill_good": 0})
+    assert analytics.approval_rates(["component"]) == [
+        {"component": "NED", "feedback": 2, "good": 1, "approval_rate": 0.5},
+        {"component": "QB", "feedback": 4, "good": 1, "approval_rate": 0.25},
+    ]
+    assert [row["day"] for row in analytics.approval_rates(["day"], since="2024-05-02")] == ["2024-05-02"]
+    assert summary.queries[-1] == {"day": {"$gte": "2024-05-02"}}
+    assert feedback.queries == []
+
+
+def test_prepare_creates_indexes_and_only_one_replica_backfills(clock):
+    feedback, summary = _FeedbackCollection(count=3), _SummaryCollection()
+    first, second = FeedbackAnalytics(feedback, summary, clock=clock), FeedbackAnalytics(feedback, summary, clock=clock)
+    assert not first.prepare() and feedback.pipelines == []
+    clock.now += 300
+    first.prepare()
+    second.prepare()
+    assert [options["name"] for _, options in feedback.indexes[:1] + summary.indexes[:1]] == ["feedback_dimensions", "summary_key"]
+    assert summary.indexes[0][1]["unique"]
+    marker = summary.find_one({"_id": "backfill"})
+    assert marker["state"] == "done" and second.until == first.until == marker["until"]
+    assert len(feedback.pipelines) == 1
+    pipeline = feedback.pipelines[0]
+    assert pipeline[0] == {"$match": {"$or": [{"written_at": {"$lt": 1000.0}}, {"written_at": {"$exists": False}}]}}
+    assert pipeline[-1]["$merge"]["on"] == SUMMARY_KEY
+    # the backfill sets its own counts, so running it again doesn't count the feedback twice
+    assert pipeline[-1]["$merge"]["whenMatched"] == [{"$set": {"backfill_total": "$$new.backfill_total", "backfill_good": "$$new.backfill_good"}}]
+
+
+def test_prepare_is_retried_with_backoff_until_mongodb_is_available():
+    feedback, summary = _FeedbackCollection(failures=3), _SummaryCollection()
+    sleeps = []
+    FeedbackAnalytics(feedback, summary, grace_period=0).prepare_until_done(sleep=sleeps.append)
+    assert sleeps == [5.0, 10.0, 20.0]
+    assert summary.find_one({"_id": "backfill"})["state"] == "done" and len(feedback.pipelines) == 1
+
+
+def test_a_stale_backfill_claim_is_taken_over(clock):
+    feedback, summary = _FeedbackCollection(), _SummaryCollection()
+    crashed, other = FeedbackAnalytics(feedback, summary, grace_period=0, clock=clock), FeedbackAnalytics(feedback, summary, grace_period=0, clock=clock)
+
+    def unavailable(pipeline):
+        raise ConnectionError("MongoDB is unavailable")
+
+    feedback.aggregate = unavailable
+    assert not crashed.prepare()
+    del feedback.aggregate
+    clock.now += 599
+    assert not other.prepare() and feedback.pipelines == []
+    clock.now += 2
+    assert other.prepare() and len(feedback.pipelines) == 1
+    assert summary.find_one({"_id": "backfill"})["state"] == "done"
+
+
+def test_feedback_is_recorded_only_if_it_was_written_after_the_backfill_boundary(clock):
+    summary = _SummaryCollection()
+    analytics = FeedbackAnalytics(_FeedbackCollection(), summary, clock=clock)
+    # the first written feedback sets the boundary; feedback submitted before it but written after it (e.g. replayed from the
+    # spool) is recorded, feedback written before it is left to the backfill
+    analytics.record([_feedback(1, "NED", "template", 1, written_at=clock.now)])
+    analytics.record([_feedback(1, "NED", "template", 1, written_at=clock.now - 1), _feedback(1, "NED", "template", 0, written_at=clock.now + 5)])
+    assert summary.find_one({"_id": "backfill"}) == {"_id": "backfill", "until": 1000.0, "state": "pending"}
+    assert _summary_rows(summary) == [("2024-05-01", "template", 2, 1)]
@@ -0,0 +1,61 @@
+"""Unit tests for graph_inspector.py — bounded queries, keyset paging and the per-graph result cache."""
+import pytest
+
+from explanation_cache import ExplanationCache
+from graph_inspector import GraphInspector, GraphInspectorError, page_query, summary_query
+
+GRAPH = "urn:graph:1"
+COMPONENT = "urn:qanary:NED-DBpediaSpotlight"
+TYPE = "http://www.wdaqua.eu/qa#AnnotationOfInstance"
+
+
+def _results(rows):
+    return {"results": {"bindings": [{name: {"type": "literal", "value": value} for name, value in row.items()} for row in rows]}}
+
+
+class _Endpoint:
+    def __init__(self, annotations):
+        self.annotations = annotations
+        self.queries = []
+
+    def query(self, sparql):
+        self.queries.append(sparql)
+        if "COUNT" in sparql:
+            return _results([{"component": COMPONENT, "type": TYPE, "annotations": str(len(self.annotations))}])
+        after = sparql.split('> "')[1].split('"')[0] if '> "' in sparql else ""
+        limit = int(sparql.split("LIMIT ")[1].split()[0])
+        page = [annotation for annotation in self.annotations if annotation > after][:limit]
+        return _results([{"annotation": annotation, "property": prop, "value": "v"} for annotation in page for prop in ("oa:hasBody", "oa:hasTarget")])
+
+
+def test_queries_are_bounded_and_reject_invalid_iris():
+    assert summary_query(GRAPH, 10).rstrip().endswith("LIMIT 10")
+    assert "FILTER(STR(?annotation) >" not in page_query(GRAPH, COMPONENT, TYPE, None, 5)
+    assert 'FILTER(STR(?annotation) > "urn:a:\\"x")' in page_query(GRAPH, COMPONENT, TYPE, 'urn:a:"x', 5)
+    with pytest.raises(GraphInspectorError):
+        page_query("urn:g> } DROP ALL {", COMPONENT, TYPE, None, 5)
+
+
+def test_annotations_are_paged_by_keyset():
+    endpoint = _Endpoint([f"urn:a:{i}" for i in range(5)])
+    inspector = GraphInspector(endpoint.query, ExplanationCache(), page_size=2)
+    assert inspector.summary(GRAPH) == [{"component": COMPONENT, "type": TYPE, "annotations": 5}]
+    pages, cursor = [], None
+    while True:
+        page = inspector.annotations(GRAPH, COMPONENT, TYPE, after=cursor)
+        pages.append(sorted({row["annotation"] for row in page["rows"]}))
+        cursor = page["next"]
+        if cursor is None:
+            break
+    assert pages == [["urn:a:0", "urn:a:1"], ["urn:a:2", "urn:a:3"], ["urn:a:4"]]
+    assert len(page["rows"]) == 2
+
+
+def test_results_are_cached_per_graph():
+    endpoint = _Endpoint(["urn:a:0"])
+    inspector = GraphInspector(endpoint.query, ExplanationCache(), page_size=2)
+    for _ in range(3):
+        inspector.summary(GRAPH)
+        inspector.annotations(GRAPH, COMPONENT, TYPE)
+    inspector.summary("urn:graph:2")
+    assert len(endpoint.queries) == 3
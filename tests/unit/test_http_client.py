@@ -0,0 +1,108 @@
+"""Unit tests for http_client.py — pooled backend client and circuit breaker."""
+import threading
+import time
+
+import pytest
+import requests
+
+import http_client
+
+
+def _response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def test_circuit_breaker_opens_after_threshold_and_half_opens_after_reset(clock):
+    breaker = http_client.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_client_applies_endpoint_timeouts(monkeypatch):
+    client = http_client.BackendClient(timeouts={"pipeline": (1, 2)})
+    seen = {}
+
+    def fake_request(method, url, **kwargs):
+        seen[url] = kwargs["timeout"]
+        return _response(200)
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    client.post("pipeline", "http://qanary/questionanswering")
+    client.get("components", "http://qanary/components")
+    assert seen["http://qanary/questionanswering"] == (1, 2)
+    assert seen["http://qanary/components"] == http_client.DEFAULT_TIMEOUT
+
+
+def test_client_fails_fast_while_backend_is_down(monkeypatch):
+    client = http_client.BackendClient(failure_threshold=2, reset_timeout=60)
+    calls = []
+
+    def failing_request(method, url, **kwargs):
+        calls.append(url)
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(client.session, "request", failing_request)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.get("components", "http://qanary/components")
+    with pytest.raises(http_client.CircuitOpenError):
+        client.post("pipeline", "http://qanary/questionanswering")
+    assert len(calls) == 2
+
+    # other backends have their own breaker
+    monkeypatch.setattr(client.session, "request", lambda method, url, **kwargs: _response(200))
+    assert client.post("explanations", "http://explanations/composedexplanations/inputdata").status_code == 200
+
+
+def test_client_counts_server_errors_as_failures(monkeypatch):
+    client = http_client.BackendClient(failure_threshold=1)
+    monkeypatch.setattr(client.session, "request", lambda method, url, **kwargs: _response(503))
+    assert client.get("components", "http://qanary/components").status_code == 503
+    assert client.breaker("qanary").is_open
+
+
+def test_client_retries_only_idempotent_methods():
+    client = http_client.BackendClient(pool_size=4, retries=2)
+    adapter = client.session.get_adapter("http://qanary")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert "GET" in adapter.max_retries.allowed_methods
+
+
+def test_client_limits_concurrent_requests_per_endpoint(monkeypatch):
+    client = http_client.BackendClient(max_concurrent={"explanations": 2, "pipeline": 0})
+    lock = threading.Lock()
+    in_flight = {"explanations": 0, "pipeline": 0}
+    peak = {"explanations": 0, "pipeline": 0}
+
+    def slow_request(method, url, **kwargs):
+        endpoint = url.rsplit("/", 1)[1]
+        with lock:
+            in_flight[endpoint] += 1
+            peak[endpoint] = max(peak[endpoint], in_flight[endpoint])
+        time.sleep(0.05)
+        with lock:
+            in_flight[endpoint] -= 1
+        return _response(200)
+
+    monkeypatch.setattr(client.session, "request", slow_request)
+    threads = [threading.Thread(target=client.post, args=(endpoint, f"http://qanary/{endpoint}")) for endpoint in ["explanations", "pipeline"] for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak == {"explanations": 2, "pipeline": 6}
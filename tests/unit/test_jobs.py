@@ -0,0 +1,201 @@
+"""Unit tests for jobs.py — background job execution with per-stage progress."""
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+def _wait(job):
+    job.future.result(timeout=5)
+
+
+def test_job_runs_in_background_and_reports_stages():
+    manager = jobs.JobManager(max_workers=1)
+
+    def work(job):
+        job.start_stage("pipeline")
+        job.finish_stage("pipeline")
+        job.start_stage("explanations", parts=2)
+        job.finish_stage("explanations")
+        assert dict(job.stage_progress())["explanations"] == jobs.RUNNING
+        job.finish_stage("explanations")
+        return 42
+
+    job = manager.submit("question", ["pipeline", "explanations"], work, owner="session")
+    _wait(job)
+    assert job.state == jobs.DONE
+    assert job.result == 42
+    assert job.stage_progress() == [("pipeline", jobs.DONE), ("explanations", jobs.DONE)]
+    assert manager.list_jobs(owner="session") == [job]
+    assert manager.list_jobs(owner="other") == []
+
+
+def test_failed_part_marks_stage_and_job_as_failed():
+    manager = jobs.JobManager(max_workers=1)
+
+    def work(job):
+        job.start_stage("explanations", parts=2)
+        job.finish_stage("explanations", jobs.FAILED)
+        job.finish_stage("explanations")
+        raise ValueError("explanation service down")
+
+    job = manager.submit("question", ["explanations", "render"], work)
+    _wait(job)
+    assert job.state == jobs.FAILED
+    assert str(job.error) == "explanation service down"
+    assert job.stage_progress() == [("explanations", jobs.FAILED), ("render", jobs.FAILED)]
+
+
+def test_running_job_is_cancelled_at_next_stage():
+    manager = jobs.JobManager(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def work(job):
+        job.start_stage("pipeline")
+        started.set()
+        release.wait(5)
+        job.finish_stage("pipeline")
+        job.start_stage("explanations")
+        return "unreachable"
+
+    job = manager.submit("question", ["pipeline", "explanations"], work)
+    started.wait(5)
+    manager.cancel(job.id)
+    release.set()
+    _wait(job)
+    assert job.state == jobs.CANCELLED
+    assert job.result is None
+    assert job.stage_progress() == [("pipeline", jobs.DONE), ("explanations", jobs.CANCELLED)]
+
+
+def test_queued_job_is_cancelled_without_running():
+    manager = jobs.JobManager(max_workers=1)
+    release = threading.Event()
+    ran = []
+    blocker = manager.submit("blocker", [], lambda job: release.wait(5))
+    queued = manager.submit("queued", [], lambda job: ran.append(job))
+    queued.cancel()
+    release.set()
+    _wait(blocker)
+    assert queued.state == jobs.CANCELLED
+    assert ran == []
+
+
+def test_submit_rejects_jobs_when_queue_is_full():
+    manager = jobs.JobManager(max_workers=1, max_queued=1)
+    release = threading.Event()
+    started = threading.Event()
+    manager.submit("running", [], lambda job: (started.set(), release.wait(5)))
+    started.wait(5)
+    manager.submit("waiting", [], lambda job: None)
+    with pytest.raises(jobs.JobQueueFull):
+        manager.submit("rejected", [], lambda job: None)
+    assert manager.count(jobs.RUNNING) == 1
+    assert manager.count(jobs.QUEUED) == 1
+    release.set()
+    manager.shutdown()
+
+
+def test_finished_jobs_are_forgotten_beyond_history():
+    manager = jobs.JobManager(max_workers=1, max_history=2)
+    for i in range(4):
+        _wait(manager.submit(str(i), [], lambda job: None))
+    manager.submit("last", [], lambda job: None)
+    assert len(manager.list_jobs()) <= 3
+    assert manager.list_jobs()[-1].label == "last"
+
+
+def test_stage_timeline_reports_durations_of_started_stages():
+    job = jobs.Job("1", "q", ["pipeline", "explanations"])
+    job.start_stage("pipeline")
+    time.sleep(0.02)
+    job.finish_stage("pipeline")
+    finished = job.stage_timeline()[0][2]
+    time.sleep(0.02)
+    (pipeline, state, seconds), explanations = job.stage_timeline()
+    assert (pipeline, state) == ("pipeline", jobs.DONE) and seconds == finished >= 0.02
+    assert explanations == ("explanations", jobs.QUEUED, None)
+
+
+def test_prefetch_queue_moves_prioritized_items_to_the_front():
+    queue = jobs.PrefetchQueue(["NED", "KG2KG", "QB", "QE"])
+    assert queue.pop() == "NED"
+    assert queue.prioritize("QE")
+    assert not queue.prioritize("NED")
+    assert [queue.pop() for _ in range(4)] == ["QE", "KG2KG", "QB", None]
+
+
+def test_partial_results_are_readable_while_the_job_runs():
+    release = threading.Event()
+
+    def work(job):
+        job.set_partial("NED", {"explanation": 1})
+        release.wait(5)
+        return "done"
+
+    job = jobs.JobManager(max_workers=1).submit("q", [], work)
+    deadline = time.time() + 5
+    while "NED" not in job.partial_snapshot() and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.partial_snapshot() == {"NED": {"explanation": 1}} and not job.finished
+    release.set()
+    _wait(job)
+    assert job.result == "done"
+
+
+def test_released_job_keeps_its_state_but_not_its_payloads():
+    def work(job):
+        job.start_stage("explanations")
+        job.set_partial("components", {"NED": {"explanation": 1}})
+        job.add_items([{"question": "q"}])
+        job.finish_stage("explanations")
+        return {"components": {"NED": {"explanation": 1}}}
+
+    manager = jobs.JobManager(max_workers=1)
+    job = manager.submit("q", ["explanations"], work)
+    _wait(job)
+    job.release()
+    assert job.result is None and job.partial_snapshot() == {} and job.items_snapshot() == []
+    assert job.state == jobs.DONE and job.stage_progress() == [("explanations", jobs.DONE)] and job.completed == 1
+    assert manager.get(job.id) is job
+
+
+def test_single_flight_coalesces_concurrent_calls_with_the_same_key():
+    flight = jobs.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"graphUri": "urn:graph"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # give the other threads time to join the call that is in flight
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(result == {"graphUri": "urn:graph"} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    flight = jobs.SingleFlight()
+
+    def fail():
+        raise ValueError("pipeline down")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 1) == (1, False)
@@ -0,0 +1,64 @@
+"""Unit tests for metrics.py — latency histograms and Prometheus exposition."""
+import requests
+
+import metrics
+
+
+def test_timed_observes_duration_with_labels():
+    registry = metrics.MetricsRegistry()
+    with registry.timed("stage", stage="pipeline", components="NED,QB"):
+        pass
+    rows = registry.summary()
+    assert len(rows) == 1
+    assert rows[0]["metric"] == "stage_seconds"
+    assert rows[0]["labels"] == "components=NED,QB, stage=pipeline"
+    assert rows[0]["count"] == 1
+
+
+def test_histogram_quantiles_use_bucket_upper_bounds():
+    histogram = metrics.Histogram((1, 5, 10))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 0.7, 3, 20):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1
+    assert histogram.quantile(0.75) == 5
+    assert histogram.quantile(0.99) == float("inf")
+
+
+def test_render_prometheus_text_format():
+    registry = metrics.MetricsRegistry()
+    registry.observe("stage_seconds", 0.2, buckets=(0.1, 1), stage="input_explanations", model="GPT_4", shots=1)
+    registry.increment("cache_lookups", cache="explanations")
+    registry.increment("cache_lookups", cache="explanations")
+    text = registry.render_prometheus()
+    assert "# TYPE qanary_frontend_cache_lookups counter" in text
+    assert 'qanary_frontend_cache_lookups{cache="explanations"} 2' in text
+    assert "# TYPE qanary_frontend_stage_seconds histogram" in text
+    assert 'qanary_frontend_stage_seconds_bucket{model="GPT_4",shots="1",stage="input_explanations",le="0.1"} 0' in text
+    assert 'qanary_frontend_stage_seconds_bucket{model="GPT_4",shots="1",stage="input_explanations",le="1"} 1' in text
+    assert 'qanary_frontend_stage_seconds_bucket{model="GPT_4",shots="1",stage="input_explanations",le="+Inf"} 1' in text
+    assert 'qanary_frontend_stage_seconds_count{model="GPT_4",shots="1",stage="input_explanations"} 1' in text
+
+
+def test_label_values_are_escaped():
+    registry = metrics.MetricsRegistry()
+    registry.increment("errors", reason='say "hi"\n')
+    assert 'qanary_frontend_errors{reason="say \\"hi\\"\\n"} 1' in registry.render_prometheus()
+
+
+def test_metrics_server_and_file_exporter(tmp_path):
+    registry = metrics.MetricsRegistry()
+    registry.increment("cache_misses", cache="pipeline")
+    server = metrics.start_metrics_server(registry, 0, address="127.0.0.1")
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        response = requests.get(base + "/metrics", timeout=5)
+        assert response.status_code == 200
+        assert 'qanary_frontend_cache_misses{cache="pipeline"} 1' in response.text
+        assert requests.get(base + "/other", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+
+    path = tmp_path / "metrics.prom"
+    registry.write_file(str(path))
+    assert path.read_text() == registry.render_prometheus()
@@ -0,0 +1,42 @@
+"""Unit tests for payload_store.py — deduplication, compression, decoded payloads and reclaiming unreferenced entries."""
+import gc
+
+from payload_store import PayloadStore
+
+EXPLANATION = {"input_data": {"rulebased": "t", "generative": "g", "dataset": "x" * 1000, "prompt": "p"}}
+
+
+def test_identical_payloads_of_a_key_are_stored_once():
+    store = PayloadStore()
+    first = store.put("urn:graph/Component", EXPLANATION)
+    second = store.put("urn:graph/Component", {**EXPLANATION})
+    other = store.put("urn:other/Component", EXPLANATION)
+    assert first is second and first is not other
+    assert len(store) == 2
+
+
+def test_large_payloads_are_compressed():
+    store = PayloadStore(compress_threshold=512)
+    large = store.put("a", EXPLANATION)
+    small = store.put("b", {"generative": "g"})
+    assert large.compressed and len(large.data) < large.size
+    assert not small.compressed
+    assert store.load(large) == EXPLANATION and store.load(small) == {"generative": "g"}
+
+
+def test_loaded_payloads_are_kept_up_to_max_decoded():
+    store = PayloadStore(max_decoded=1)
+    first = store.put("a", {"n": 1})
+    second = store.put("b", {"n": 2})
+    assert store.load(first) is store.load(first)
+    store.load(second)
+    assert list(store.decoded) == [second.digest]
+
+
+def test_entries_are_reclaimed_when_no_reference_is_left():
+    store = PayloadStore(compress_threshold=512)
+    ref = store.put("a", EXPLANATION)
+    assert store.stats() == {"entries": 1, "stored_bytes": len(ref.data), "payload_bytes": ref.size}
+    del ref
+    gc.collect()
+    assert len(store) == 0 and store.stats()["entries"] == 0
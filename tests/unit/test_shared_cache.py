@@ -0,0 +1,141 @@
+"""Unit tests for shared_cache.py — the SQLite and Redis backends, expiring locks and one computation across processes."""
+import fnmatch
+import multiprocessing
+import time
+
+import pytest
+
+from explanation_cache import ExplanationCache
+from shared_cache import RedisSharedCache, SharedCache, SqliteSharedCache, create_shared_cache
+
+
+class _Redis:
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if value is not None and expires_at <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def set(self, key, value, px=None, nx=False):
+        if nx and self._live(key) is not None:
+            return None
+        self.data[key] = (value, self.clock() + px / 1000)
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+    def eval(self, script, numkeys, key, token):
+        if self._live(key) == token:
+            self.delete(key)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def replicas(request, tmp_path, clock):
+    if request.param == "sqlite":
+        path = str(tmp_path / "shared.sqlite")
+        return clock, SqliteSharedCache(path, clock=clock), SqliteSharedCache(path, clock=clock)
+    server = _Redis(clock)
+    return clock, RedisSharedCache(server, clock=clock), RedisSharedCache(server, clock=clock)
+
+
+def test_entries_are_shared_and_expire(replicas):
+    clock, first, second = replicas
+    first.set("a", '{"graphUri": "urn:g"}', clock.now, 60)
+    assert second.get("a") == ('{"graphUri": "urn:g"}', clock.now)
+    second.delete("a")
+    assert first.get("a") is None
+    first.set("b", "1", clock.now, 60)
+    clock.now += 61
+    assert second.get("b") is None
+
+
+def test_lock_is_held_by_one_replica_until_released_or_expired(replicas):
+    clock, first, second = replicas
+    assert first.acquire("key", "t1", ttl=30)
+    assert not second.acquire("key", "t2", ttl=30)
+    second.release("key", "t2")
+    assert not second.acquire("key", "t2", ttl=30)
+    first.release("key", "t1")
+    assert second.acquire("key", "t2", ttl=30)
+    clock.now += 31
+    assert first.acquire("key", "t1", ttl=30)
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class GetOnly(SharedCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        GetOnly()
+
+
+def test_lock_gives_up_after_the_timeout(tmp_path):
+    cache = SqliteSharedCache(str(tmp_path / "shared.sqlite"))
+    assert cache.acquire("key", "other", ttl=60)
+    with cache.lock("key", timeout=0.05, poll_interval=0.01) as acquired:
+        assert not acquired
+    with pytest.raises(ValueError):
+        create_shared_cache("memcached://localhost")
+
+
+def test_explanation_caches_of_two_replicas_share_entries(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    first = ExplanationCache(ttl=60, shared=SqliteSharedCache(path))
+    second = ExplanationCache(ttl=60, shared=create_shared_cache(f"sqlite:///{path}"))
+    first.put("question", {"graphUri": "urn:g"})
+    assert second.get("question") == {"graphUri": "urn:g"}
+    second.invalidate("question")
+    assert first.get("question") == {"graphUri": "urn:g"}
+    first.entries.clear()
+    assert first.get("question") is None
+
+
+def test_an_expired_local_copy_doesnt_remove_a_fresh_shared_entry(tmp_path, clock):
+    path = str(tmp_path / "shared.sqlite")
+    first = ExplanationCache(ttl=10, clock=clock, shared=SqliteSharedCache(path, clock=clock))
+    second = ExplanationCache(ttl=10, clock=clock, shared=SqliteSharedCache(path, clock=clock))
+    first.put("k", "old")
+    assert second.get("k") == "old"
+    clock.now += 9
+    first.put("k", "new")
+    clock.now += 2
+    assert second.get("k") == "new"
+    assert second.shared.get("k") is not None
+
+
+def _replica(path, computations):
+    cache = SqliteSharedCache(path)
+    with cache.lock("question", timeout=30, poll_interval=0.01):
+        if cache.get("question") is None:
+            with computations.get_lock():
+                computations.value += 1
+            time.sleep(0.2)
+            cache.set("question", "explanation", time.time(), 60)
+
+
+def test_only_one_process_computes_an_entry(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    SqliteSharedCache(path).close()
+    context = multiprocessing.get_context("fork")
+    computations = context.Value("i", 0)
+    processes = [context.Process(target=_replica, args=(path, computations)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    assert computations.value == 1
@@ -0,0 +1,66 @@
+"""Unit tests for traffic_archive.py — recording backend traffic into a compressed archive and replaying it."""
+import gzip
+import json
+
+import pytest
+import requests
+
+from traffic_archive import RecordingClient, ReplayClient, ReplayMiss, request_key
+
+
+class _Backend:
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, endpoint, url, **kwargs):
+        self.calls += 1
+        if url.endswith("/down"):
+            raise requests.ConnectionError("down")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"call": self.calls, "body": kwargs.get("data")}).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.headers["X-Other"] = "not recorded"
+        return response
+
+    def close(self):
+        pass
+
+
+def test_request_key_ignores_the_host_but_not_the_body():
+    assert request_key("GET", "http://qanary:8080/components") == request_key("GET", "https://localhost/components")
+    assert request_key("post", "http://e/inputdata", '{"graphUri": "urn:g"}') == request_key("POST", "http://e/inputdata", '{"graphUri": "urn:g"}')
+    assert request_key("POST", "http://e/inputdata", '{"graphUri": "urn:g"}') != request_key("POST", "http://e/inputdata", '{"graphUri": "urn:h"}')
+    assert request_key("POST", "http://q/questionanswering", {}) == request_key("POST", "http://q/questionanswering")
+
+
+def test_recorded_traffic_is_replayed_in_order(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    recorder = RecordingClient(_Backend(), path)
+    recorder.get("components", "http://q/components", headers={"If-None-Match": '"1"'})
+    recorder.post("explanations", "http://e/inputdata", '{"graphUri": "urn:g"}')
+    recorder.post("explanations", "http://e/inputdata", '{"graphUri": "urn:g"}')
+    with pytest.raises(requests.ConnectionError):
+        recorder.get("components", "http://q/down")
+    recorder.close()
+    with gzip.open(path, "rt") as file:
+        assert len(file.readlines()) == 4
+
+    delays = []
+    replay = ReplayClient(path, latency_scale=0.5, sleep=delays.append)
+    assert len(replay) == 4
+    components = replay.get("components", "http://q/components")
+    assert components.json()["call"] == 1
+    assert dict(components.headers) == {"Content-Type": "application/json"}
+    assert [replay.post("explanations", "http://e/inputdata", '{"graphUri": "urn:g"}').json()["call"] for _ in range(3)] == [2, 3, 3]
+    with pytest.raises(requests.ConnectionError, match="down"):
+        replay.get("components", "http://q/down")
+    assert len(delays) == 5 and all(delay >= 0 for delay in delays)
+
+
+def test_replay_fails_for_requests_that_were_not_recorded(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    RecordingClient(_Backend(), path).close()
+    replay = ReplayClient(path, latency_scale=0)
+    with pytest.raises(ReplayMiss):
+        replay.post("pipeline", "http://q/questionanswering?textquestion=Who")
@@ -1,4 +1,6 @@
 """Unit tests for util.py — the importable logic of the explanation frontend."""
+import threading
+
 import util
 
 
@@ -32,3 +34,32 @@ def test_feedback_collections_are_non_empty():
     assert len(util.feedback_messages) > 0
     assert len(util.feedback_icons) > 0
     assert all(isinstance(m, str) for m in util.feedback_messages)
+
+
+def test_run_concurrently_collects_results_and_errors_per_key():
+    def fail():
+        raise ValueError("boom")
+
+    results, errors = util.run_concurrently({"input": lambda: 1, "output": fail})
+    assert results == {"input": 1}
+    assert list(errors) == ["output"]
+    assert str(errors["output"]) == "boom"
+
+
+def test_run_concurrently_runs_tasks_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+    results, errors = util.run_concurrently({"a": barrier.wait, "b": barrier.wait}, max_workers=2)
+    assert errors == {}
+    assert set(results) == {"a", "b"}
+
+
+def test_run_concurrently_without_tasks():
+    assert util.run_concurrently({}) == ({}, {})
+
+
+def test_read_static_file_reads_each_file_once(tmp_path):
+    asset = tmp_path / "change_menu.js"
+    asset.write_text("console.log(1)", encoding="utf-8")
+    assert util.read_static_file(str(asset)) == "console.log(1)"
+    asset.write_text("console.log(2)", encoding="utf-8")
+    assert util.read_static_file(str(asset)) == "console.log(1)"
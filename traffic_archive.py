@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+RECORDED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+
+class ReplayMiss(Exception):
+    pass
+
+
+# Key of a backend request in the archive: method, path and query of the URL and body; the host isn't part of it, so traffic recorded
+# against one deployment can be replayed with other backend URLs, neither are headers (e.g. of conditional requests)
+def request_key(method, url, data=None):
+    if not data:
+        data = ""
+    elif isinstance(data, (dict, list)):
+        data = json.dumps(data, sort_keys=True)
+    elif isinstance(data, bytes):
+        data = data.decode("utf-8")
+    parts = urlsplit(url)
+    return hashlib.sha256(json.dumps([method.upper(), parts.path, parts.query, data]).encode("utf-8")).hexdigest()
+
+
+# Wraps a BackendClient and appends every request with its response (or error) and duration to a gzip-compressed JSONL archive
+class RecordingClient:
+    def __init__(self, client, path):
+        self.client = client
+        self.file = gzip.open(path, "at", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def get(self, endpoint, url, **kwargs):
+        return self.request("GET", endpoint, url, **kwargs)
+
+    def post(self, endpoint, url, data=None, **kwargs):
+        return self.request("POST", endpoint, url, data=data, **kwargs)
+
+    def request(self, method, endpoint, url, **kwargs):
+        record = {"key": request_key(method, url, kwargs.get("data")), "endpoint": endpoint, "method": method, "url": url}
+        start = time.perf_counter()
+        try:
+            response = self.client.request(method, endpoint, url, **kwargs)
+        except Exception as e:
+            self._write({**record, "seconds": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"})
+            raise
+        self._write({
+            **record,
+            "seconds": time.perf_counter() - start,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            "text": response.text
+        })
+        return response
+
+    # Every record is flushed, so the archive is readable while the process is still recording
+    def _write(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        self.client.close()
+
+
+# Serves the responses of an archive instead of the backends, after the recorded duration times latency_scale (0: right away)
+# A key that was recorded several times is answered with its responses in the recorded order, the last one is repeated
+class ReplayClient:
+    def __init__(self, path, latency_scale=1.0, sleep=time.sleep):
+        self.latency_scale = latency_scale
+        self.sleep = sleep
+        self.records = defaultdict(list)
+        self.served = defaultdict(int)
+        self.lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record["key"]].append(record)
+
+    def get(self, endpoint, url, **kwargs):
+        return self.request("GET", endpoint, url, **kwargs)
+
+    def post(self, endpoint, url, data=None, **kwargs):
+        return self.request("POST", endpoint, url, data=data, **kwargs)
+
+    def request(self, method, endpoint, url, **kwargs):
+        key = request_key(method, url, kwargs.get("data"))
+        with self.lock:
+            records = self.records.get(key)
+            if not records:
+                raise ReplayMiss(f"The {method} request to {endpoint} ({url}) wasn't recorded")
+            record = records[min(self.served[key], len(records) - 1)]
+            self.served[key] += 1
+        if self.latency_scale > 0:
+            self.sleep(record["seconds"] * self.latency_scale)
+        if "error" in record:
+            raise requests.ConnectionError(record["error"])
+        response = requests.Response()
+        response.status_code = record["status"]
+        response._content = record["text"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers.update(record["headers"])
+        response.url = url
+        return response
+
+    def __len__(self):
+        return sum(len(records) for records in self.records.values())
+
+    def close(self):
+        pass
@@ -1,15 +1,38 @@
+import functools
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Static assets are read once per process
+@functools.lru_cache(maxsize=None)
+def read_static_file(filename):
+    with open(filename) as f:
+        return f.read()
 
 def include_css(st, filenames):
     content = ""
     for filename in filenames:
-        with open(filename) as f:
-            content += f.read()
+        content += read_static_file(filename)
     st.markdown(f"<style>{content}</style>", unsafe_allow_html=True)
 
 def get_random_element(elements):
     return elements[random.randint(0, len(elements) - 1)]
 
+# Runs the passed callables on a bounded thread pool and returns their results and errors by key
+def run_concurrently(tasks, max_workers=2):
+    results = {}
+    errors = {}
+    if not tasks:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as executor:
+        futures = {executor.submit(task): key for key, task in tasks.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+    return results, errors
+
 feedback_messages = [
     "Hey, thanks a bunch for your help!",
     "You rock! Thanks for your feedback.",